@@ -1,165 +1,1004 @@
 import os
+import sqlite3
+import time
+import threading
+from contextlib import contextmanager
+from datetime import date, timedelta
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 from pytrends.request import TrendReq
 import numpy as np
-import matplotlib.pyplot as plt
-from typing import List, Dict, Any
-import time
+from typing import List, Dict, Any, Tuple, Optional, Callable, Iterator
+from trends_cache import TrendsCache
+from rate_limiter import AdaptiveRateLimiter, RetryQueue
+from trends_store import TrendsStore
+from chart_renderer import CHART_MODES, regional_chart_jobs, render_charts
+from trend_analytics import stack_time_series, summarize_insights
+from anomaly_detection import anomaly_state_path, detect_breakouts
+from series_stitching import DAILY_TIMEFRAME_DAYS, date_range_timeframe, overlap_scale, stitch
+from instrumentation import metrics, record_response
+from progress_journal import ProgressJournal, run_key
+from compact_series import CompactInsights
+
+# Google Trends accepts at most five keywords per payload
+MAX_PAYLOAD_KEYWORDS = 5
+
+# File name of the response cache inside the output directory
+CACHE_FILENAME = 'trends_cache.sqlite'
+
+# Directory of the columnar time series store inside the output directory
+STORE_DIRNAME = 'trends_store'
+
+# Store timeframe key of the continuous daily history built by incremental runs
+HISTORY_TIMEFRAME = 'history'
+
+# Days of stored history re-fetched by incremental runs to align the new window
+INCREMENTAL_OVERLAP_DAYS = 7
+
+# Directory of the progress journal of an unfinished comprehensive report
+PROGRESS_DIRNAME = 'report_progress'
+
+
+def plan_keyword_batches(keywords: List[str], 
+                         batch_size: int, 
+                         anchor_keyword: str = None) -> Tuple[Optional[str], List[Tuple[str, ...]]]:
+    """
+    Split keywords into payload batches that all share one anchor keyword
+    
+    :param keywords: List of keywords to fetch
+    :param batch_size: Maximum number of keywords per payload, anchor included
+    :param anchor_keyword: Keyword shared by every batch (defaults to the first keyword)
+    :return: Anchor keyword and the batches of the remaining keywords
+    """
+    keywords = list(dict.fromkeys(keywords))
+    if not keywords:
+        return None, []
+    
+    anchor = anchor_keyword or keywords[0]
+    others = [keyword for keyword in keywords if keyword != anchor]
+    per_batch = max(1, min(batch_size, MAX_PAYLOAD_KEYWORDS) - 1)
+    batches = [tuple(others[i:i + per_batch]) for i in range(0, len(others), per_batch)] or [()]
+    return anchor, batches
+
+
+def region_keywords(anchor: str,
+                    batch: Tuple[str, ...],
+                    batches: List[Tuple[str, ...]],
+                    keywords: List[str]) -> List[str]:
+    """
+    Keywords of a batch whose regions are fetched
+    
+    The anchor is in every payload, but its regions are only fetched once,
+    with the first batch, and only if it was requested itself.
+    
+    :param anchor: Anchor keyword
+    :param batch: Keywords of the batch, anchor excluded
+    :param batches: Every batch in plan order
+    :param keywords: Keywords that were requested
+    :return: Keywords to fetch interest by region for
+    """
+    if batches and batch == batches[0] and anchor in keywords:
+        return [anchor] + list(batch)
+    return list(batch)
+
+
+def split_batch_frames(kw_list: List[str], 
+                       anchor: str, 
+                       keywords: List[str],
+                       interest_by_region: pd.DataFrame, 
+                       interest_over_time: pd.DataFrame,
+                       reference: Dict[str, float]) -> Dict[str, Tuple[pd.DataFrame, pd.DataFrame]]:
+    """
+    Split the frames of a batched payload into per-keyword frames
+    
+    Interest over time is rescaled so the batch's anchor matches the anchor
+    of the first batch seen, whose total is kept in ``reference``. Regional
+    scores are taken as they are: each keyword's column comes from a payload
+    of its own (see fetch_payload_frames), so it is that keyword's interest
+    per region rather than its share of the batch. The anchor's regions are
+    only fetched with the first batch; other batches leave them empty.
+    
+    :param kw_list: Keywords of the payload, anchor first
+    :param anchor: Anchor keyword
+    :param keywords: Keywords that were requested (the anchor may not be one)
+    :param interest_by_region: Per-keyword interest by region columns side by side
+    :param interest_over_time: Combined interest over time frame
+    :param reference: Shared dict holding the reference anchor total
+    :return: Mapping of keyword to (interest_by_region, interest_over_time)
+    """
+    # Rescale the batch so its anchor matches the reference anchor
+    scale = 1.0
+    if not interest_over_time.empty:
+        anchor_total = interest_over_time[anchor].sum()
+        if anchor_total > 0:
+            reference.setdefault('total', anchor_total)
+            scale = reference['total'] / anchor_total
+        else:
+            print(f"Anchor '{anchor}' has no interest in batch {kw_list}; scores left unscaled")
+    
+    frames = {}
+    for keyword in kw_list:
+        if keyword == anchor and anchor not in keywords:
+            continue
+        
+        region_frame = interest_by_region[[keyword]] if keyword in interest_by_region.columns else pd.DataFrame()
+        if interest_over_time.empty:
+            time_frame = interest_over_time
+        else:
+            time_frame = interest_over_time[[keyword]] * scale
+            time_frame['isPartial'] = interest_over_time['isPartial']
+        
+        frames[keyword] = (region_frame, time_frame)
+    
+    return frames
+
+
+def combine_region_frames(region_frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Put single-keyword interest by region frames side by side
+    
+    :param region_frames: interest_by_region frames, one keyword each
+    :return: Frame indexed by region with one column per keyword
+    """
+    region_frames = [frame for frame in region_frames if not frame.empty]
+    if not region_frames:
+        return pd.DataFrame()
+    if len(region_frames) == 1:
+        return region_frames[0]
+    return pd.concat(region_frames, axis=1)
+
+
+def read_cache(cache: TrendsCache, endpoint: str, payload: Dict[str, Any]) -> Optional[Any]:
+    """
+    Look up a cached response, treating a cache error as a miss
+    
+    :param cache: Response cache
+    :param endpoint: pytrends method name
+    :param payload: Payload parameters
+    :return: Cached response, or None
+    """
+    try:
+        return cache.get(endpoint, payload)
+    except sqlite3.Error as e:
+        metrics.increment('cache_errors', endpoint=endpoint)
+        print(f"Could not read the cache for {endpoint}: {e}")
+        return None
+
+
+def write_cache(cache: TrendsCache, endpoint: str, payload: Dict[str, Any], frame: Any):
+    """
+    Cache a response; a cache error only costs the cached copy, never the response
+    
+    :param cache: Response cache
+    :param endpoint: pytrends method name
+    :param payload: Payload parameters
+    :param frame: Response to cache
+    """
+    try:
+        cache.set(endpoint, payload, frame)
+    except sqlite3.Error as e:
+        metrics.increment('cache_errors', endpoint=endpoint)
+        print(f"Could not cache the {endpoint} response: {e}")
+
+
+def combine_top_keywords(top_keywords_list: List[pd.DataFrame], output_dir: str) -> pd.DataFrame:
+    """
+    Combine per-region trending searches and save them to top_keywords.csv
+    
+    :param top_keywords_list: Trending searches frames in region order
+    :param output_dir: Directory to save output files
+    :return: DataFrame with top keywords
+    """
+    # Combine results from all regions
+    if top_keywords_list:
+        top_keywords_df = pd.concat(top_keywords_list, ignore_index=True)
+        
+        # Save to CSV
+        output_path = os.path.join(output_dir, 'top_keywords.csv')
+        top_keywords_df.to_csv(output_path, index=False)
+        metrics.increment('bytes_written', os.path.getsize(output_path), kind='csv')
+        
+        return top_keywords_df
+    
+    return pd.DataFrame()
+
+
+def build_demographic_insights(fetched: Dict[str, Tuple[pd.DataFrame, pd.DataFrame]],
+                               compact: bool = False) -> Dict[str, Any]:
+    """
+    Turn fetched frames into demographic insights
+    
+    :param fetched: Mapping of keyword to (interest_by_region, interest_over_time)
+    :param compact: Pack the insights into shared arrays (CompactInsights) instead
+                    of keeping two DataFrames per keyword
+    :return: Dictionary of demographic insights
+    """
+    if compact:
+        return CompactInsights.from_frames(fetched)
+    
+    demographic_insights = {}
+    
+    for keyword, (interest_by_region, interest_over_time) in fetched.items():
+        try:
+            # Analyze top regions
+            top_regions = interest_by_region.nlargest(10, keyword)
+            
+            # Store insights
+            demographic_insights[keyword] = {
+                'top_regions': top_regions,
+                'time_series': interest_over_time
+            }
+        
+        except Exception as e:
+            print(f"Error analyzing demographics for {keyword}: {e}")
+            # Continue with other keywords even if one fails
+            continue
+    
+    return demographic_insights
+
+
+def write_summary_report(demographic_insights: Dict[str, Any], output_dir: str) -> pd.DataFrame:
+    """
+    Summarize demographic insights into trends_summary_report.csv
+    
+    :param demographic_insights: Dictionary of demographic insights
+    :param output_dir: Directory to save output files
+    :return: Summary DataFrame
+    """
+    # Compute every keyword's metrics in one pass over the stacked series
+    with metrics.span('summary'):
+        summary = summarize_insights(demographic_insights)
+    
+    report_df = pd.DataFrame({
+        'Keyword': summary.index,
+        'Top Regions': [', '.join(map(str, regions)) for regions in summary['top_regions']],
+        'Peak Interest': summary['peak'].fillna(0).to_numpy(),
+        'Latest Interest': summary['latest'].to_numpy(),
+        'Mean Interest': summary['mean'].round(2).to_numpy(),
+        'Momentum': summary['momentum'].round(2).to_numpy(),
+        'Z-Score': summary['z_score'].round(2).to_numpy()
+    })
+    
+    # Save summary report
+    output_path = os.path.join(output_dir, 'trends_summary_report.csv')
+    report_df.to_csv(output_path, index=False)
+    metrics.increment('bytes_written', os.path.getsize(output_path), kind='csv')
+    
+    return report_df
+
+
+def write_breakouts(demographic_insights: Dict[str, Any], 
+                    output_dir: str, 
+                    timeframe: str = None) -> pd.DataFrame:
+    """
+    Score the new points of every keyword and save ranked breakouts to trends_breakouts.csv
+    
+    Detector state is kept next to the reports, one file per timeframe, so
+    each run only scores dates it has not seen before on the same scale.
+    Partial points are left out, so a date is only scored once its value is
+    final.
+    
+    :param demographic_insights: Dictionary of demographic insights
+    :param output_dir: Directory to save output files
+    :param timeframe: Google Trends timeframe of the series
+    :return: Breakouts DataFrame, highest score first
+    """
+    with metrics.span('breakout_detection'):
+        breakouts = detect_breakouts(
+            stack_time_series(demographic_insights, complete_only=True),
+            anomaly_state_path(output_dir, timeframe)
+        )
+    
+    output_path = os.path.join(output_dir, 'trends_breakouts.csv')
+    breakouts.to_csv(output_path, index=False)
+    metrics.increment('bytes_written', os.path.getsize(output_path), kind='csv')
+    
+    return breakouts
+
 
 class AdvancedTrendsFetcher:
     def __init__(self, 
                  regions: List[str] = ['US'], 
                  categories: List[str] = None,
-                 output_dir: str = 'trends_output'):
+                 output_dir: str = 'trends_output',
+                 use_cache: bool = True,
+                 cache: Optional[TrendsCache] = None,
+                 rate_limiter: Optional[AdaptiveRateLimiter] = None,
+                 max_item_retries: int = 2,
+                 max_workers: int = 1,
+                 chart_mode: str = 'parallel',
+                 chart_workers: int = None,
+                 store: Optional[TrendsStore] = None,
+                 session_class: type = None,
+                 compact_insights: bool = False):
         """
         Initialize Advanced Trends Fetcher
         
         :param regions: List of region codes (e.g., ['US', 'GB', 'CA'])
         :param categories: Optional list of Google Trends categories
         :param output_dir: Directory to save output files
+        :param use_cache: Whether to cache responses on disk under output_dir
+        :param cache: Optional cache instance to use instead of the default one
+        :param rate_limiter: Optional limiter shared with other fetchers
+        :param max_item_retries: Extra attempts for a region or keyword that failed
+        :param max_workers: Worker threads used to fetch regions concurrently
+        :param chart_mode: 'parallel' renders charts after fetching in a process pool,
+                           'lazy' queues them for render_pending_charts(), 'skip' disables them
+        :param chart_workers: Processes used to render charts (defaults to the CPU count)
+        :param store: Columnar store for fetched data (defaults to one under output_dir)
+        :param session_class: pytrends session class (defaults to TrendReq; e.g. mock_trend_req() for a local server)
+        :param compact_insights: Return demographic insights as CompactInsights, which
+                                 keeps large keyword lists in a fraction of the memory
         """
-        self.pytrends = TrendReq(hl='en-US', tz=360)
+        if chart_mode not in CHART_MODES:
+            raise ValueError(f"chart_mode must be one of {CHART_MODES}")
+        
+        self.hl = 'en-US'
+        self.tz = 360
+        self.session_class = session_class or TrendReq
+        
+        # Per-thread pytrends session, the payload currently built on it and
+        # the response tally of count_responses (set up before the first session)
+        self._local = threading.local()
+        self._tally_lock = threading.Lock()
+        self.pytrends = self._new_session()
         self.regions = regions
         self.categories = categories or []
         self.output_dir = output_dir
         
         # Create output directory if it doesn't exist
         os.makedirs(output_dir, exist_ok=True)
+        
+        if cache is None and use_cache:
+            cache = TrendsCache(os.path.join(output_dir, CACHE_FILENAME))
+        self.cache = cache
+        
+        # Time series and regional scores are appended here instead of per-keyword CSVs
+        self.store = store or TrendsStore(os.path.join(output_dir, STORE_DIRNAME))
+        
+        # Shared limiter replacing fixed sleeps between requests
+        self.rate_limiter = rate_limiter or AdaptiveRateLimiter()
+        self.max_item_retries = max_item_retries
+        
+        # Items that still failed after all retries, mapped to their last error
+        self.failures = {}
+        
+        self.max_workers = max_workers
+        self.region_stats = {}
+        
+        # Charts are rendered in their own stage, from already-fetched frames
+        self.chart_mode = chart_mode
+        self.chart_workers = chart_workers
+        self.pending_charts = []
+        
+        # Breakout terms found by the last comprehensive report
+        self.breakouts = pd.DataFrame()
+        self.compact_insights = compact_insights
+        
+        # Progress journal of the comprehensive report being generated, if any
+        self.journal: Optional[ProgressJournal] = None
+
+    def _fetch_frame(self, 
+                     endpoint: str, 
+                     kw_list: List[str] = None, 
+                     timeframe: str = None, 
+                     geo: str = '', 
+                     fresh: bool = False,
+                     **params) -> pd.DataFrame:
+        """
+        Call a pytrends endpoint through the response cache and rate limiter
+        
+        The payload is only built on the session when the response is not
+        cached, so cache hits cost no network round trip at all.
+        
+        :param endpoint: pytrends method name (e.g. 'interest_over_time')
+        :param kw_list: Keywords of the payload, if the endpoint needs one
+        :param timeframe: Google Trends timeframe of the payload
+        :param geo: Geographic restriction of the payload
+        :param fresh: Skip the cache and build the payload again, so a relative
+                      'now' timeframe is resolved at call time
+        :param params: Keyword arguments passed to the endpoint
+        :return: Response frame
+        """
+        payload = dict(params, kw_list=kw_list, timeframe=timeframe, geo=geo, hl=self.hl, tz=self.tz)
+        
+        if self.cache is not None and not fresh:
+            frame = read_cache(self.cache, endpoint, payload)
+            if frame is not None:
+                return frame
+        
+        session = self._session()
+        if kw_list is not None:
+            payload_key = (tuple(kw_list), timeframe, geo)
+            if fresh or payload_key != getattr(self._local, 'payload', None):
+                self.rate_limiter.call(
+                    'build_payload', session.build_payload, 
+                    list(kw_list), timeframe=timeframe, geo=geo
+                )
+                self._local.payload = payload_key
+        
+        frame = self.rate_limiter.call(endpoint, getattr(session, endpoint), **params)
+        
+        if self.cache is not None:
+            write_cache(self.cache, endpoint, payload, frame)
+        
+        return frame
+
+    def _new_session(self) -> TrendReq:
+        # Responses and bytes received are counted through requests hooks
+        hooks = {'response': [record_response, self._count_response]}
+        return self.session_class(hl=self.hl, tz=self.tz, requests_args={'hooks': hooks})
+
+    def _count_response(self, response, *args, **kwargs):
+        # requests response hook adding to the tally of the thread's count_responses, if any
+        tally = getattr(self._local, 'tally', None)
+        if tally is not None:
+            with self._tally_lock:
+                tally[0] += 1
+
+    @contextmanager
+    def count_responses(self) -> Iterator[List[int]]:
+        """
+        Count the HTTP responses received by fetches made from the calling thread
+        
+        Worker threads started by those fetches add to the same tally, while
+        fetches from other threads are left out. The count does not depend on
+        metrics being enabled.
+        
+        :return: One-element list holding the number of responses so far
+        """
+        tally = [0]
+        previous = getattr(self._local, 'tally', None)
+        self._local.tally = tally
+        try:
+            yield tally
+        finally:
+            self._local.tally = previous
+
+    def _session(self) -> TrendReq:
+        """
+        Return the pytrends session of the calling thread
+        
+        Worker threads get their own session from _init_worker_session;
+        everything else shares self.pytrends.
+        """
+        return getattr(self._local, 'session', self.pytrends)
+
+    def _init_worker_session(self, tally: List[int] = None):
+        """
+        Create a dedicated pytrends session for a worker thread
+
+        Created outside the rate limiter, so it neither counts as a request
+        nor takes a token from the endpoints.
+
+        :param tally: Response tally of the thread that started the worker, if any
+        """
+        self._local.tally = tally
+        self._local.session = self._new_session()
+        self._local.payload = None
+
+    def _run_with_retries(self, 
+                          items: List[Any], 
+                          fetch_item: Callable[[Any], Any], 
+                          description: str,
+                          max_workers: int = 1,
+                          journal_scope: str = None) -> Dict[Any, Any]:
+        """
+        Fetch every item, queueing failures for another pass instead of dropping them
+        
+        While a progress journal is open, items are journaled under
+        ``journal_scope`` as soon as they succeed, and items journaled by an
+        interrupted run are loaded instead of fetched again.
+        
+        :param items: Work items (regions, keywords or keyword batches)
+        :param fetch_item: Callable returning the result for one item
+        :param description: What is being fetched, used in error messages
+        :param max_workers: Number of worker threads (1 fetches sequentially)
+        :param journal_scope: Everything besides the item that identifies its
+                              result (e.g. endpoint group and timeframe)
+        :return: Mapping of item to result, in input order, for items that succeeded
+        """
+        results = {}
+        retry_queue = RetryQueue(self.max_item_retries)
+        journal = self.journal if journal_scope is not None else None
+        
+        if journal is not None:
+            for item in items:
+                if [journal_scope, item] in journal:
+                    results[item] = journal.load([journal_scope, item])
+            if results:
+                print(f"Resuming {description}: {len(results)} of {len(items)} already fetched")
+        
+        def attempt(item):
+            try:
+                return item, fetch_item(item), None
+            except Exception as e:
+                return item, None, e
+        
+        def collect(outcomes):
+            for item, result, error in outcomes:
+                if error is None:
+                    results[item] = result
+                    if journal is not None:
+                        journal.record([journal_scope, item], result)
+                    continue
+                print(f"Error fetching {description} for {item}: {error}")
+                if retry_queue.push(item, error):
+                    print(f"Queued {item} for retry")
+        
+        pending = [item for item in items if item not in results]
+        executor = None
+        if max_workers > 1 and len(pending) > 1:
+            executor = ThreadPoolExecutor(
+                max_workers=min(max_workers, len(pending)), 
+                initializer=self._init_worker_session,
+                initargs=(getattr(self._local, 'tally', None),)
+            )
+        
+        try:
+            # Retry failed items after each full pass so throttling has time to clear
+            while pending:
+                if executor is not None:
+                    collect(executor.map(attempt, pending))
+                else:
+                    collect(attempt(item) for item in pending)
+                pending = [retry_queue.pop() for _ in range(len(retry_queue))]
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        
+        for item in retry_queue.exhausted():
+            self.failures[item] = retry_queue.errors[item]
+            print(f"Giving up on {description} for {item}: {retry_queue.errors[item]}")
+        
+        return {item: results[item] for item in items if item in results}
 
     def fetch_top_keywords(self, 
                            timeframe: str = 'now 1-d', 
-                           top_n: int = 50) -> pd.DataFrame:
+                           top_n: int = 50,
+                           max_workers: int = None) -> pd.DataFrame:
         """
         Fetch top keywords across multiple regions
         
+        With more than one worker, regions are fetched concurrently, each
+        worker on its own pytrends session under the shared rate limiter.
+        The combined frame keeps the order of self.regions either way, and
+        per-region latency, attempts and errors are kept in self.region_stats.
+        
         :param timeframe: Google Trends timeframe
         :param top_n: Number of top keywords to return
+        :param max_workers: Number of worker threads (defaults to self.max_workers)
         :return: DataFrame with top keywords
         """
-        top_keywords_list = []
+        self.region_stats = {region: {'latency': 0.0, 'attempts': 0, 'error': None} for region in self.regions}
         
-        # Fetch top keywords for each region
-        for region in self.regions:
+        def fetch_region(region):
+            stats = self.region_stats[region]
+            stats['attempts'] += 1
+            started = time.perf_counter()
             try:
                 # Daily trending searches
-                daily_trends = self.pytrends.trending_searches(pn=region)
-                
-                # Add region column
-                daily_trends['region'] = region
-                daily_trends = daily_trends.head(top_n)
-                
-                top_keywords_list.append(daily_trends)
-                
-                # Add a small delay to avoid rate limiting
-                time.sleep(1)
+                daily_trends = self._fetch_frame('trending_searches', pn=region)
             except Exception as e:
-                print(f"Error fetching trends for {region}: {e}")
-        
-        # Combine results from all regions
-        if top_keywords_list:
-            top_keywords_df = pd.concat(top_keywords_list, ignore_index=True)
+                stats['error'] = str(e)
+                raise
+            finally:
+                stats['latency'] += time.perf_counter() - started
             
-            # Save to CSV
-            output_path = os.path.join(self.output_dir, 'top_keywords.csv')
-            top_keywords_df.to_csv(output_path, index=False)
+            stats['error'] = None
             
-            return top_keywords_df
+            # Add region column
+            daily_trends['region'] = region
+            return daily_trends.head(top_n)
         
-        return pd.DataFrame()
+        # Fetch top keywords for each region
+        with metrics.span('stage', stage='fetch_top_keywords'):
+            top_keywords_list = list(self._run_with_retries(
+                self.regions, fetch_region, 'trends', max_workers or self.max_workers,
+                journal_scope=f'trending_searches {top_n}'
+            ).values())
+        
+        for region, stats in self.region_stats.items():
+            status = f"failed ({stats['error']})" if stats['error'] else 'ok'
+            print(f"{region}: {status} in {stats['latency']:.2f}s over {stats['attempts']} attempt(s)")
+        
+        return combine_top_keywords(top_keywords_list, self.output_dir)
 
     def analyze_keyword_demographics(self, 
                                      keywords: List[str], 
-                                     timeframe: str = 'today 3-m') -> Dict[str, Any]:
+                                     timeframe: str = 'today 3-m',
+                                     batch_size: int = 1,
+                                     anchor_keyword: str = None,
+                                     incremental: bool = False) -> Dict[str, Any]:
         """
         Analyze demographic trends for given keywords
         
+        With ``batch_size`` > 1 keywords are packed into shared payloads of up
+        to ``MAX_PAYLOAD_KEYWORDS`` terms, one slot of which is taken by the
+        anchor keyword. Interest over time is rescaled onto the anchor's scale
+        in the first batch so scores are comparable across batches. Regional
+        scores are always fetched one keyword per payload.
+        
+        With ``incremental`` set, keywords that already have a stored daily
+        history only fetch the days since it ends (see _fetch_incremental_frames).
+        
         :param keywords: List of keywords to analyze
         :param timeframe: Google Trends timeframe
+        :param batch_size: Number of keywords per payload (1 disables batching)
+        :param anchor_keyword: Keyword shared by every batch (defaults to the first keyword)
+        :param incremental: Only fetch the part of the window missing from the store
         :return: Dictionary of demographic insights
         """
-        demographic_insights = {}
+        with metrics.span('stage', stage='analyze_keyword_demographics'):
+            if incremental:
+                fetched = self._fetch_incremental_frames(keywords, timeframe, batch_size, anchor_keyword)
+            else:
+                fetched = self._fetch_full_frames(keywords, timeframe, batch_size, anchor_keyword)
+        
+        demographic_insights = build_demographic_insights(fetched, self.compact_insights)
+        
+        # Append detailed insights to the columnar store
+        if self.store is not None:
+            self.store.write_insights(demographic_insights, timeframe)
+        
+        # Visualize regional interest
+        self.pending_charts.extend(regional_chart_jobs(demographic_insights, self.output_dir, timeframe))
+        if self.chart_mode == 'parallel':
+            self.render_pending_charts()
+        elif self.chart_mode == 'skip':
+            self.pending_charts = []
+        
+        return demographic_insights
+
+    def render_pending_charts(self) -> List[str]:
+        """
+        Render the regional interest charts queued by analyze_keyword_demographics
         
+        :return: Paths of the charts that were written
+        """
+        jobs, self.pending_charts = self.pending_charts, []
+        return render_charts(jobs, self.chart_workers)
+
+    def fetch_related_queries(self,
+                              keywords: List[str],
+                              timeframe: str = 'today 3-m',
+                              batch_size: int = MAX_PAYLOAD_KEYWORDS) -> Dict[str, Dict[str, pd.DataFrame]]:
+        """
+        Fetch the top and rising related queries of every keyword
+
+        Related queries are reported per keyword, so keywords share payloads
+        (one explore request per batch) without any rescaling. Feed the result
+        to a QueryGraph (see query_graph.py) to index it across keywords and runs.
+
+        :param keywords: List of keywords
+        :param timeframe: Google Trends timeframe
+        :param batch_size: Number of keywords per payload
+        :return: Keyword -> {'top': DataFrame, 'rising': DataFrame} with query and
+                 value columns (None where Trends has no queries)
+        """
+        return self._fetch_related('related_queries', keywords, timeframe, batch_size)
+
+    def fetch_related_topics(self,
+                             keywords: List[str],
+                             timeframe: str = 'today 3-m',
+                             batch_size: int = MAX_PAYLOAD_KEYWORDS) -> Dict[str, Dict[str, pd.DataFrame]]:
+        """
+        Fetch the top and rising related topics of every keyword
+
+        :param keywords: List of keywords
+        :param timeframe: Google Trends timeframe
+        :param batch_size: Number of keywords per payload
+        :return: Keyword -> {'top': DataFrame, 'rising': DataFrame} with topic_title,
+                 topic_type and value columns (None where Trends has no topics)
+        """
+        return self._fetch_related('related_topics', keywords, timeframe, batch_size)
+
+    def _fetch_related(self,
+                       endpoint: str,
+                       keywords: List[str],
+                       timeframe: str,
+                       batch_size: int) -> Dict[str, Dict[str, pd.DataFrame]]:
+        keywords = list(dict.fromkeys(keywords))
+        per_payload = max(1, min(batch_size, MAX_PAYLOAD_KEYWORDS))
+        batches = [tuple(keywords[i:i + per_payload]) for i in range(0, len(keywords), per_payload)]
+        description = endpoint.replace('_', ' ')
+
+        def fetch_batch(batch):
+            print(f"Fetching {description} for: {', '.join(batch)}")
+            return self._fetch_frame(endpoint, list(batch), timeframe)
+
+        related = {}
+        with metrics.span('stage', stage=f'fetch_{endpoint}'):
+            fetched = self._run_with_retries(
+                batches, fetch_batch, description, self.max_workers,
+                journal_scope=f'{endpoint} {timeframe}'
+            )
+        for batch, by_keyword in fetched.items():
+            for keyword in batch:
+                queries = by_keyword.get(keyword) or {}
+                related[keyword] = {'top': queries.get('top'), 'rising': queries.get('rising')}
+
+        return related
+
+    def fetch_payload_frames(self,
+                             kw_list: List[str], 
+                             timeframe: str,
+                             region_keywords: List[str] = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Fetch the raw frames of one payload, before any per-keyword split or rescaling
+        
+        Only interest over time is batched. Trends scores a multi-keyword
+        interest by region payload as each keyword's share of the payload in
+        every region, so each keyword's regions are fetched on their own (and
+        cached like unbatched fetches), explore request included.
+        
+        :param kw_list: Keywords of the payload (anchor first when batching)
+        :param timeframe: Google Trends timeframe
+        :param region_keywords: Keywords whose regions are fetched (defaults to kw_list)
+        :return: (interest_by_region, interest_over_time)
+        """
+        # Fetch interest by region, one keyword per payload
+        interest_by_region = combine_region_frames([
+            self._fetch_frame('interest_by_region', [keyword], timeframe, resolution='REGION')
+            for keyword in (kw_list if region_keywords is None else region_keywords)
+        ])
+        
+        # Fetch interest over time
+        interest_over_time = self._fetch_frame('interest_over_time', kw_list, timeframe)
+        
+        return interest_by_region, interest_over_time
+
+    def _fetch_full_frames(self, 
+                           keywords: List[str], 
+                           timeframe: str,
+                           batch_size: int = 1,
+                           anchor_keyword: str = None) -> Dict[str, Tuple[pd.DataFrame, pd.DataFrame]]:
+        """
+        Fetch the whole timeframe for every keyword, batched or one per payload
+        """
+        if batch_size > 1:
+            return self._fetch_batched_frames(keywords, timeframe, batch_size, anchor_keyword)
+        return self._fetch_single_frames(keywords, timeframe)
+
+    def _stored_histories(self, keywords: List[str]) -> Dict[str, pd.DataFrame]:
+        """
+        Load the stored daily history of each keyword
+        
+        :param keywords: Keywords to look up
+        :return: Mapping of keyword to a date-indexed frame with value and is_partial
+        """
+        stored = self.store.read_time_series(keywords, geo='', timeframe=HISTORY_TIMEFRAME)
+        if stored.empty:
+            return {}
+        return {keyword: group.set_index('date')[['value', 'is_partial']] 
+                for keyword, group in stored.groupby('keyword')}
+
+    def _fetch_incremental_frames(self, 
+                                  keywords: List[str], 
+                                  timeframe: str,
+                                  batch_size: int = 1,
+                                  anchor_keyword: str = None) -> Dict[str, Tuple[pd.DataFrame, pd.DataFrame]]:
+        """
+        Fetch only the recent part of a daily timeframe and extend the stored history
+        
+        Keywords with a stored history fetch a short date range starting
+        INCREMENTAL_OVERLAP_DAYS before the history ends. The new window is
+        rescaled onto the history by least squares over the overlap, appended
+        to the store, and the requested timeframe is cut from the combined
+        series. Keywords without a usable history, or whose overlap cannot be
+        aligned, are fetched in full and seed the history instead. Regional
+        scores for incremental keywords cover the short window only.
+        
+        :param keywords: List of keywords to fetch
+        :param timeframe: Daily Google Trends timeframe (e.g. 'today 3-m')
+        :param batch_size: Number of keywords per payload
+        :param anchor_keyword: Anchor for keywords fetched in full
+        :return: Mapping of keyword to (interest_by_region, interest_over_time)
+        """
+        window = DAILY_TIMEFRAME_DAYS.get(timeframe)
+        if window is None or self.store is None:
+            print(f"Incremental mode needs a daily timeframe and a store; fetching {timeframe} in full")
+            return self._fetch_full_frames(keywords, timeframe, batch_size, anchor_keyword)
+        
+        today = date.today()
+        histories = self._stored_histories(keywords)
+        
+        # Split keywords into those whose history can be extended and those to fetch in full
+        full_keywords = []
+        recent = {}
         for keyword in keywords:
-            try:
-                print(f"Fetching data for: {keyword}")
-                
-                # Fetch interest by region
-                self.pytrends.build_payload([keyword], timeframe=timeframe)
-                interest_by_region = self.pytrends.interest_by_region(resolution='REGION')
-                
-                # Fetch interest over time
-                interest_over_time = self.pytrends.interest_over_time()
-                
-                # Analyze top regions
-                top_regions = interest_by_region.nlargest(10, keyword)
-                
-                # Visualize regional interest
-                plt.figure(figsize=(12, 6))
-                top_regions[keyword].plot(kind='bar')
-                plt.title(f'Top Regions - {keyword} Interest')
-                plt.xlabel('Regions')
-                plt.ylabel('Interest Score')
-                plt.tight_layout()
-                plt.savefig(os.path.join(self.output_dir, f'{keyword}_regional_interest.png'))
-                plt.close()
-                
-                # Store insights
-                demographic_insights[keyword] = {
-                    'top_regions': top_regions,
-                    'time_series': interest_over_time
-                }
-                
-                # Save detailed insights to CSV
-                top_regions.to_csv(os.path.join(self.output_dir, f'{keyword}_top_regions.csv'))
-                interest_over_time.to_csv(os.path.join(self.output_dir, f'{keyword}_time_series.csv'))
-                
-                # Add a small delay to avoid rate limiting
-                time.sleep(1)
+            history = histories.get(keyword)
+            complete = history.loc[~history['is_partial'], 'value'] if history is not None else None
+            if complete is None or complete.empty:
+                full_keywords.append(keyword)
+            elif (today - complete.index.max().date()).days + INCREMENTAL_OVERLAP_DAYS > window:
+                full_keywords.append(keyword)
+            else:
+                recent[keyword] = complete
+        
+        frames = {}
+        
+        if recent:
+            start = min(series.index.max() for series in recent.values()).date()
+            recent_timeframe = date_range_timeframe(start - timedelta(days=INCREMENTAL_OVERLAP_DAYS), today)
+            per_payload = max(1, min(batch_size, MAX_PAYLOAD_KEYWORDS))
+            names = list(recent)
+            batches = [tuple(names[i:i + per_payload]) for i in range(0, len(names), per_payload)]
+            window_start = pd.Timestamp(today - timedelta(days=window - 1))
             
-            except Exception as e:
-                print(f"Error analyzing demographics for {keyword}: {e}")
-                # Continue with other keywords even if one fails
-                continue
+            def fetch_recent(batch):
+                print(f"Fetching {recent_timeframe} for: {', '.join(batch)}")
+                return self.fetch_payload_frames(list(batch), recent_timeframe)
+            
+            extended = {}
+            for batch, (interest_by_region, interest_over_time) in self._run_with_retries(
+                batches, fetch_recent, 'recent window', journal_scope=f'payload {recent_timeframe}'
+            ).items():
+                for keyword in batch:
+                    history = recent[keyword]
+                    if interest_over_time.empty:
+                        full_keywords.append(keyword)
+                        continue
+                    
+                    partial = interest_over_time['isPartial'].astype(bool)
+                    new = interest_over_time[keyword].astype('float64')
+                    scale = overlap_scale(history, new[~partial])
+                    if scale is None:
+                        print(f"Could not align recent window for {keyword}; fetching {timeframe} in full")
+                        full_keywords.append(keyword)
+                        continue
+                    
+                    combined = stitch(history, new, scale)
+                    is_partial = pd.Series(False, index=combined.index)
+                    is_partial[partial[partial].index.intersection(combined.index)] = True
+                    
+                    appended = combined.index > history.index.max()
+                    extended[keyword] = pd.DataFrame(
+                        {keyword: combined[appended], 'isPartial': is_partial[appended]}
+                    )
+                    
+                    time_frame = pd.DataFrame({keyword: combined, 'isPartial': is_partial})
+                    time_frame = time_frame[time_frame.index >= window_start]
+                    time_frame.index.name = 'date'
+                    region_frame = interest_by_region[[keyword]] if not interest_by_region.empty else interest_by_region
+                    frames[keyword] = (region_frame, time_frame)
+            
+            self.store.write_time_series(extended, HISTORY_TIMEFRAME)
         
-        return demographic_insights
+        if full_keywords:
+            full = self._fetch_full_frames(full_keywords, timeframe, batch_size, anchor_keyword)
+            self.store.write_time_series(
+                {keyword: time_frame for keyword, (_, time_frame) in full.items() if not time_frame.empty}, 
+                HISTORY_TIMEFRAME
+            )
+            frames.update(full)
+        
+        return {keyword: frames[keyword] for keyword in keywords if keyword in frames}
+
+    def _fetch_single_frames(self, 
+                             keywords: List[str], 
+                             timeframe: str) -> Dict[str, Tuple[pd.DataFrame, pd.DataFrame]]:
+        """
+        Fetch regional and time series frames with one payload per keyword
+        
+        :param keywords: List of keywords to fetch
+        :param timeframe: Google Trends timeframe
+        :return: Mapping of keyword to (interest_by_region, interest_over_time)
+        """
+        def fetch_keyword(keyword):
+            print(f"Fetching data for: {keyword}")
+            return self.fetch_payload_frames([keyword], timeframe)
+        
+        return self._run_with_retries(keywords, fetch_keyword, 'demographics', journal_scope=f'payload {timeframe}')
+
+    def _fetch_batched_frames(self, 
+                              keywords: List[str], 
+                              timeframe: str,
+                              batch_size: int,
+                              anchor_keyword: str = None) -> Dict[str, Tuple[pd.DataFrame, pd.DataFrame]]:
+        """
+        Fetch regional and time series frames for several keywords per payload
+        
+        :param keywords: List of keywords to fetch
+        :param timeframe: Google Trends timeframe
+        :param batch_size: Maximum number of keywords per payload, anchor included
+        :param anchor_keyword: Keyword shared by every batch
+        :return: Mapping of keyword to (interest_by_region, interest_over_time)
+        """
+        anchor, batches = plan_keyword_batches(keywords, batch_size, anchor_keyword)
+        if anchor is None:
+            return {}
+        
+        def fetch_batch(batch):
+            kw_list = [anchor] + list(batch)
+            print(f"Fetching data for: {', '.join(kw_list)}")
+            return self.fetch_payload_frames(kw_list, timeframe, region_keywords(anchor, batch, batches, keywords))
+        
+        # Raw payloads are journaled, so resumed batches are rescaled like fresh ones
+        fetched = self._run_with_retries(
+            batches, fetch_batch, 'demographics', journal_scope=f'payload {timeframe} {anchor}'
+        )
+        
+        # Anchor total of the first batch in plan order; every batch is scaled onto it
+        reference = {}
+        frames = {}
+        for batch, (interest_by_region, interest_over_time) in fetched.items():
+            batch_frames = split_batch_frames(
+                [anchor] + list(batch), anchor, keywords, interest_by_region, interest_over_time, reference
+            )
+            for keyword, keyword_frames in batch_frames.items():
+                frames.setdefault(keyword, keyword_frames)
+        
+        return frames
 
     def generate_comprehensive_report(self, 
                                       keywords: List[str] = None, 
-                                      timeframe: str = 'today 3-m'):
+                                      timeframe: str = 'today 3-m',
+                                      batch_size: int = 1,
+                                      anchor_keyword: str = None,
+                                      incremental: bool = False,
+                                      resume: bool = True):
         """
         Generate a comprehensive trends report
         
+        With ``resume`` set, every region, keyword and batch is journaled under
+        output_dir as soon as it is fetched. If the run dies part way, running
+        the same report again on the same day reuses what was journaled and
+        only fetches the rest; the journal is removed once a run finishes
+        without failures.
+        
         :param keywords: Optional list of keywords to deep dive
         :param timeframe: Google Trends timeframe
+        :param batch_size: Number of keywords per payload (1 disables batching)
+        :param anchor_keyword: Keyword shared by every batch when batching
+        :param incremental: Only fetch the part of the window missing from the store
+        :param resume: Journal progress and reuse the journal of an interrupted run
+        :return: Summary DataFrame
         """
+        if not resume:
+            return self._generate_comprehensive_report(keywords, timeframe, batch_size, anchor_keyword, incremental)
+        
+        key = run_key(keywords, timeframe, batch_size, anchor_keyword, incremental, self.regions, date.today().isoformat())
+        self.journal = ProgressJournal(os.path.join(self.output_dir, PROGRESS_DIRNAME), key)
+        failures = len(self.failures)
+        try:
+            summary_df = self._generate_comprehensive_report(keywords, timeframe, batch_size, anchor_keyword, incremental)
+        finally:
+            journal, self.journal = self.journal, None
+        
+        # Keep the journal while something is missing, so the next run only fetches that
+        if len(self.failures) == failures:
+            journal.remove()
+        return summary_df
+
+    def _generate_comprehensive_report(self, 
+                                       keywords: List[str], 
+                                       timeframe: str,
+                                       batch_size: int,
+                                       anchor_keyword: str,
+                                       incremental: bool) -> pd.DataFrame:
         # Fetch top keywords if not provided
         if not keywords:
             top_keywords_df = self.fetch_top_keywords()
             keywords = top_keywords_df.iloc[:, 0].tolist()[:50]
         
         # Analyze demographic trends
-        demographic_insights = self.analyze_keyword_demographics(keywords, timeframe)
+        demographic_insights = self.analyze_keyword_demographics(
+            keywords, 
+            timeframe, 
+            batch_size=batch_size, 
+            anchor_keyword=anchor_keyword,
+            incremental=incremental
+        )
         
         # Create a summary report
-        report_data = []
-        
-        for keyword, insights in demographic_insights.items():
-            top_regions = insights['top_regions']
-            time_series = insights['time_series']
-            
-            report_data.append({
-                'Keyword': keyword,
-                'Top Regions': ', '.join(top_regions.index[:5]),
-                'Peak Interest': time_series[keyword].max() if not time_series.empty else 0
-            })
-        
-        # Convert to DataFrame
-        report_df = pd.DataFrame(report_data)
+        summary_df = write_summary_report(demographic_insights, self.output_dir)
         
-        # Save summary report
-        report_df.to_csv(os.path.join(self.output_dir, 'trends_summary_report.csv'), index=False)
+        # Rank keywords breaking out in the newly fetched points
+        self.breakouts = write_breakouts(demographic_insights, self.output_dir, timeframe)
         
         print(f"Comprehensive report generated in {self.output_dir}")
+        return summary_df
 
 def main():
     """
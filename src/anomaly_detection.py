@@ -0,0 +1,371 @@
+import os
+import re
+from typing import Dict, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+# File holding detector state between runs, under the output directory (one per timeframe, see anomaly_state_path)
+ANOMALY_STATE_FILENAME = 'anomaly_state.npz'
+
+# Slots of the seasonal baseline (day of week)
+SEASON_LENGTH = 7
+
+# Absorbed points kept per series to align a newly fetched window onto the detector's scale
+ALIGN_POINTS = 28
+
+# Minimum shared dates needed to align a window
+MIN_ALIGN_OVERLAP = 3
+
+# Columns of the frame returned by AnomalyDetector.breakouts
+BREAKOUT_COLUMNS = ['term', 'date', 'value', 'score', 'ewma_z', 'robust_z', 'seasonal_z']
+
+_NEVER = np.datetime64('1970-01-01T00:00:00', 's')
+_NAT = np.datetime64('NaT', 's')
+
+
+def series_label(keyword: str, geo: str = '') -> str:
+    """
+    Label of a keyword x region series
+
+    :param keyword: Keyword
+    :param geo: Geographic restriction ('' for worldwide)
+    :return: The keyword, followed by the region in brackets when there is one
+    """
+    return f"{keyword} [{geo}]" if geo else keyword
+
+
+def series_from_store(store, keywords: List[str] = None, timeframe: str = None) -> pd.DataFrame:
+    """
+    Stored time series of every keyword x region as one wide frame
+
+    :param store: TrendsStore to read from
+    :param keywords: Keywords to return (all if None)
+    :param timeframe: Timeframe to match (all if None; latest fetch wins)
+    :return: Frame indexed by date with one column per series_label
+    """
+    frame = store.read_time_series(keywords, timeframe=timeframe)
+    if frame.empty:
+        return pd.DataFrame()
+
+    frame = frame.sort_values('fetched_at').drop_duplicates(['keyword', 'geo', 'date'], keep='last')
+    frame['series'] = [series_label(keyword, geo) for keyword, geo in zip(frame['keyword'], frame['geo'])]
+    wide = frame.pivot(index='date', columns='series', values='value').sort_index()
+    wide.columns.name = None
+    return wide
+
+
+class AnomalyDetector:
+    def __init__(self,
+                 alpha: float = 0.1,
+                 seasonal_alpha: float = 0.2,
+                 median_step: float = 0.05,
+                 threshold: float = 3.0,
+                 warmup: int = 14,
+                 min_scale: float = 1.0):
+        """
+        Online spike detector over many series at once
+
+        Every series keeps a fixed amount of state, so new points are scored
+        without revisiting its history:
+          - an EWMA control chart (exponentially weighted mean and variance)
+          - a robust z-score against a streaming median and MAD estimate
+          - a day-of-week seasonal baseline
+        A point's score is the smaller of its seasonal z-score and the larger
+        of the other two, so a breakout has to beat its day-of-week baseline
+        and at least one of the other detectors. State lives in flat NumPy
+        arrays and each timestamp updates all series in one step.
+
+        Trends scales every fetch to its own peak, so the last ALIGN_POINTS
+        absorbed values of each series are kept as well: a new window is
+        rescaled onto them by least squares over the dates they share before
+        its new points are scored, keeping the state on one scale across runs.
+
+        :param alpha: Smoothing factor of the EWMA mean and variance
+        :param seasonal_alpha: Smoothing factor of the seasonal baseline
+        :param median_step: Step size of the streaming median and MAD, relative to the MAD
+        :param threshold: Score at which a point counts as a breakout
+        :param warmup: Points a series needs before its scores count
+        :param min_scale: Lower bound for deviations (Trends values are integers)
+        """
+        self.alpha = alpha
+        self.seasonal_alpha = seasonal_alpha
+        self.median_step = median_step
+        self.threshold = threshold
+        self.warmup = warmup
+        self.min_scale = min_scale
+
+        self.keys: List[str] = []
+        self._positions: Dict[str, int] = {}
+        self.count = np.zeros(0, dtype='int64')
+        self.mean = np.zeros(0)
+        self.var = np.zeros(0)
+        self.median = np.zeros(0)
+        self.mad = np.zeros(0)
+        self.seasonal = np.zeros((0, SEASON_LENGTH))
+        self.seasonal_seen = np.zeros((0, SEASON_LENGTH), dtype=bool)
+        self.last_seen = np.zeros(0, dtype='datetime64[s]')
+        self.tail_values = np.zeros((0, ALIGN_POINTS))
+        self.tail_dates = np.zeros((0, ALIGN_POINTS), dtype='datetime64[s]')
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _ensure(self, keys: Sequence[str]) -> np.ndarray:
+        """
+        Return the state positions of ``keys``, adding state for new ones
+        """
+        new = [key for key in dict.fromkeys(keys) if key not in self._positions]
+        if new:
+            for key in new:
+                self._positions[key] = len(self.keys)
+                self.keys.append(key)
+
+            size = len(new)
+            self.count = np.concatenate([self.count, np.zeros(size, dtype='int64')])
+            self.mean = np.concatenate([self.mean, np.zeros(size)])
+            self.var = np.concatenate([self.var, np.zeros(size)])
+            self.median = np.concatenate([self.median, np.zeros(size)])
+            self.mad = np.concatenate([self.mad, np.zeros(size)])
+            self.seasonal = np.concatenate([self.seasonal, np.zeros((size, SEASON_LENGTH))])
+            self.seasonal_seen = np.concatenate([self.seasonal_seen, np.zeros((size, SEASON_LENGTH), dtype=bool)])
+            self.last_seen = np.concatenate([self.last_seen, np.full(size, _NEVER)])
+            self.tail_values = np.concatenate([self.tail_values, np.full((size, ALIGN_POINTS), np.nan)])
+            self.tail_dates = np.concatenate([self.tail_dates, np.full((size, ALIGN_POINTS), _NAT)])
+
+        return np.array([self._positions[key] for key in keys], dtype='int64')
+
+    def update(self, frame: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+        """
+        Score and absorb new points
+
+        Points at or before a series' last absorbed timestamp are skipped, so
+        feeding an overlapping window again only scores the new dates. Each
+        column is first rescaled onto the points already absorbed (see
+        _alignment); NaN points are skipped without being marked as seen.
+
+        :param frame: Wide frame indexed by timestamp, one column per series
+        :return: Dictionary of date x series frames: 'score', 'ewma_z',
+                 'robust_z' and 'seasonal_z' (NaN where a point was skipped)
+        """
+        frame = frame.sort_index()
+        positions = self._ensure([str(column) for column in frame.columns])
+        values = frame.to_numpy(dtype='float64')
+        dates = pd.DatetimeIndex(frame.index).to_numpy().astype('datetime64[s]')
+        values = values * self._alignment(positions, dates, values)
+        # 1970-01-01 was a Thursday; shift so Monday is slot 0
+        slots = (dates.astype('datetime64[D]').astype('int64') + 3) % SEASON_LENGTH
+
+        scores = {name: np.full(values.shape, np.nan) for name in ('score', 'ewma_z', 'robust_z', 'seasonal_z')}
+        for row in range(len(values)):
+            x = values[row]
+            fresh = ~np.isnan(x) & (dates[row] > self.last_seen[positions])
+            if not fresh.any():
+                continue
+
+            columns = np.flatnonzero(fresh)
+            index = positions[columns]
+            x = x[columns]
+            slot = slots[row]
+            self._score(index, x, slot, columns, row, scores)
+            self._absorb(index, x, slot, dates[row])
+
+        return {name: pd.DataFrame(array, index=frame.index, columns=frame.columns)
+                for name, array in scores.items()}
+
+    def _alignment(self, positions: np.ndarray, dates: np.ndarray, values: np.ndarray) -> np.ndarray:
+        """
+        Least-squares factor per column mapping a window onto the absorbed points
+
+        Columns sharing fewer than MIN_ALIGN_OVERLAP dates with their kept
+        points (new series, gaps) or whose overlap is all zeros keep a factor of 1.
+
+        :param positions: State position of every column
+        :param dates: Sorted timestamps of the window's rows
+        :param values: Window values, row x column
+        :return: Factor per column
+        """
+        scales = np.ones(values.shape[1])
+        if not len(dates) or not values.shape[1]:
+            return scales
+
+        kept_dates = self.tail_dates[positions]
+        kept = self.tail_values[positions]
+        rows = np.clip(np.searchsorted(dates, kept_dates), 0, len(dates) - 1)
+        new = values[rows, np.arange(values.shape[1])[:, None]]
+        shared = (dates[rows] == kept_dates) & ~np.isnan(kept) & ~np.isnan(new)
+
+        kept = np.where(shared, kept, 0.0)
+        new = np.where(shared, new, 0.0)
+        numerator = (kept * new).sum(axis=1)
+        denominator = (new * new).sum(axis=1)
+        usable = (shared.sum(axis=1) >= MIN_ALIGN_OVERLAP) & (denominator > 0) & kept.any(axis=1)
+        scales[usable] = numerator[usable] / denominator[usable]
+        return scales
+
+    def _score(self, index: np.ndarray, x: np.ndarray, slot: int,
+               columns: np.ndarray, row: int, scores: Dict[str, np.ndarray]):
+        scale = np.maximum(np.sqrt(self.var[index]), self.min_scale)
+        ewma_z = (x - self.mean[index]) / scale
+        robust_z = (x - self.median[index]) / np.maximum(1.4826 * self.mad[index], self.min_scale)
+        baseline = np.where(self.seasonal_seen[index, slot], self.seasonal[index, slot], self.mean[index])
+        seasonal_z = (x - baseline) / scale
+
+        score = np.minimum(seasonal_z, np.maximum(ewma_z, robust_z))
+        warm = self.count[index] >= self.warmup
+        for name, value in (('score', score), ('ewma_z', ewma_z), ('robust_z', robust_z), ('seasonal_z', seasonal_z)):
+            scores[name][row, columns] = np.where(warm, value, 0.0)
+
+    def _absorb(self, index: np.ndarray, x: np.ndarray, slot: int, date: np.datetime64):
+        first = self.count[index] == 0
+
+        # EWMA mean and variance
+        diff = x - self.mean[index]
+        increment = self.alpha * diff
+        self.mean[index] = np.where(first, x, self.mean[index] + increment)
+        self.var[index] = np.where(first, 0.0, (1 - self.alpha) * (self.var[index] + diff * increment))
+
+        # Streaming median and MAD: nudge each estimate towards the new point
+        step = self.median_step * np.maximum(self.mad[index], self.min_scale)
+        median = np.where(first, x, self.median[index] + step * np.sign(x - self.median[index]))
+        self.median[index] = median
+        self.mad[index] = np.where(first, 0.0,
+                                   np.maximum(0.0, self.mad[index] + step * np.sign(np.abs(x - median) - self.mad[index])))
+
+        # Seasonal baseline of this day of week
+        seen = self.seasonal_seen[index, slot]
+        current = self.seasonal[index, slot]
+        self.seasonal[index, slot] = np.where(seen, current + self.seasonal_alpha * (x - current), x)
+        self.seasonal_seen[index, slot] = True
+
+        # Latest absorbed values, kept to align the next window
+        kept = self.count[index] % ALIGN_POINTS
+        self.tail_values[index, kept] = x
+        self.tail_dates[index, kept] = date
+
+        self.count[index] += 1
+        self.last_seen[index] = date
+
+    def breakouts(self, frame: pd.DataFrame, top_n: int = 20) -> pd.DataFrame:
+        """
+        Score new points and rank the series breaking out right now
+
+        A series breaks out when its latest newly scored point reaches the
+        threshold.
+
+        :param frame: Wide frame indexed by timestamp, one column per series
+        :param top_n: Maximum number of breakouts to return
+        :return: Frame with the BREAKOUT_COLUMNS, highest score first
+        """
+        scores = self.update(frame)
+        score = scores['score'].to_numpy()
+        if score.size == 0:
+            return pd.DataFrame(columns=BREAKOUT_COLUMNS)
+
+        # Row of each series' latest scored point
+        scored = ~np.isnan(score)
+        latest = len(score) - 1 - scored[::-1].argmax(axis=0)
+        columns = np.flatnonzero(scored.any(axis=0))
+        rows = latest[columns]
+
+        result = pd.DataFrame({
+            'term': frame.columns[columns].astype(str),
+            'date': frame.index[rows],
+            'value': frame.to_numpy(dtype='float64')[rows, columns],
+            'score': score[rows, columns],
+            'ewma_z': scores['ewma_z'].to_numpy()[rows, columns],
+            'robust_z': scores['robust_z'].to_numpy()[rows, columns],
+            'seasonal_z': scores['seasonal_z'].to_numpy()[rows, columns],
+        })
+        result = result[result['score'] >= self.threshold]
+        return result.sort_values('score', ascending=False, kind='stable').head(top_n).reset_index(drop=True)
+
+    def save(self, path: str):
+        """
+        Write the detector state to an .npz file
+
+        :param path: File path
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'wb') as f:
+            np.savez(f,
+                     keys=np.array(self.keys, dtype=str),
+                     count=self.count,
+                     mean=self.mean,
+                     var=self.var,
+                     median=self.median,
+                     mad=self.mad,
+                     seasonal=self.seasonal,
+                     seasonal_seen=self.seasonal_seen,
+                     last_seen=self.last_seen,
+                     tail_values=self.tail_values,
+                     tail_dates=self.tail_dates)
+
+    @classmethod
+    def load(cls, path: str, **kwargs) -> 'AnomalyDetector':
+        """
+        Restore a detector saved with save(), or start a fresh one
+
+        :param path: File path
+        :param kwargs: Detector parameters
+        :return: AnomalyDetector
+        """
+        detector = cls(**kwargs)
+        if not os.path.exists(path):
+            return detector
+
+        with np.load(path) as state:
+            detector.keys = state['keys'].tolist()
+            detector._positions = {key: position for position, key in enumerate(detector.keys)}
+            detector.count = state['count']
+            detector.mean = state['mean']
+            detector.var = state['var']
+            detector.median = state['median']
+            detector.mad = state['mad']
+            detector.seasonal = state['seasonal']
+            detector.seasonal_seen = state['seasonal_seen']
+            detector.last_seen = state['last_seen']
+            # State saved before alignment was added has no kept points
+            if 'tail_values' in state:
+                detector.tail_values = state['tail_values']
+                detector.tail_dates = state['tail_dates']
+            else:
+                detector.tail_values = np.full((len(detector.keys), ALIGN_POINTS), np.nan)
+                detector.tail_dates = np.full((len(detector.keys), ALIGN_POINTS), _NAT)
+        return detector
+
+
+def anomaly_state_path(output_dir: str, timeframe: str = None) -> str:
+    """
+    Return the detector state file of a timeframe
+
+    Hourly, daily and weekly points must not share a series' last_seen and
+    baselines, so every timeframe keeps a state file of its own.
+
+    :param output_dir: Directory holding the state
+    :param timeframe: Google Trends timeframe the scored series cover
+    :return: State file path
+    """
+    if timeframe:
+        stem, extension = os.path.splitext(ANOMALY_STATE_FILENAME)
+        label = re.sub(r'[^\w-]+', '_', timeframe)
+        return os.path.join(output_dir, f'{stem}_{label}{extension}')
+    return os.path.join(output_dir, ANOMALY_STATE_FILENAME)
+
+
+def detect_breakouts(series: pd.DataFrame, state_path: str, top_n: int = 20, **kwargs) -> pd.DataFrame:
+    """
+    Run the persisted detector over new points and save its state again
+
+    :param series: Wide frame indexed by timestamp, one column per series
+    :param state_path: Detector state file
+    :param top_n: Maximum number of breakouts to return
+    :param kwargs: Detector parameters
+    :return: Ranked breakouts (see AnomalyDetector.breakouts)
+    """
+    detector = AnomalyDetector.load(state_path, **kwargs)
+    breakouts = detector.breakouts(series, top_n)
+    detector.save(state_path)
+    return breakouts
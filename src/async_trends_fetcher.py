@@ -0,0 +1,595 @@
+import os
+import json
+import asyncio
+from typing import List, Dict, Any, Tuple, Optional, Callable, Awaitable
+
+import aiohttp
+import pandas as pd
+from pytrends.request import BASE_TRENDS_URL
+
+from trends_cache import TrendsCache
+from trends_store import TrendsStore
+from chart_renderer import CHART_MODES, regional_chart_jobs, render_charts
+from rate_limiter import AdaptiveRateLimiter, RetryQueue
+from instrumentation import metrics
+from advanced_trends_fetcher import (
+    CACHE_FILENAME,
+    STORE_DIRNAME,
+    MAX_PAYLOAD_KEYWORDS,
+    plan_keyword_batches,
+    combine_region_frames,
+    region_keywords,
+    read_cache,
+    write_cache,
+    split_batch_frames,
+    combine_top_keywords,
+    build_demographic_insights,
+    write_summary_report,
+    write_breakouts,
+)
+
+
+def parse_interest_over_time(req_json: Dict[str, Any], kw_list: List[str]) -> pd.DataFrame:
+    """
+    Build the interest over time frame the way pytrends does
+
+    :param req_json: Parsed multiline widget response
+    :param kw_list: Keywords of the payload, in payload order
+    :return: Frame indexed by date with one int column per keyword and isPartial
+    """
+    timeline = req_json['default']['timelineData']
+    if not timeline:
+        return pd.DataFrame()
+
+    index = pd.to_datetime([float(point['time']) for point in timeline], unit='s')
+    values = [point['value'] for point in timeline]
+    df = pd.DataFrame(values, index=index, columns=kw_list).astype('int')
+    df['isPartial'] = [bool(point.get('isPartial', False)) for point in timeline]
+    df.index.name = 'date'
+    return df.sort_index()
+
+
+def parse_interest_by_region(req_json: Dict[str, Any], kw_list: List[str]) -> pd.DataFrame:
+    """
+    Build the interest by region frame the way pytrends does
+
+    :param req_json: Parsed comparedgeo widget response
+    :param kw_list: Keywords of the payload, in payload order
+    :return: Frame indexed by geoName with one int column per keyword
+    """
+    geo_map = req_json['default']['geoMapData']
+    if not geo_map:
+        return pd.DataFrame()
+
+    index = pd.Index([region['geoName'] for region in geo_map], name='geoName')
+    values = [region['value'] for region in geo_map]
+    return pd.DataFrame(values, index=index, columns=kw_list).astype('int').sort_index()
+
+
+def parse_related_searches(req_json: Dict[str, Any], topics: bool = False) -> Dict[str, Optional[pd.DataFrame]]:
+    """
+    Build the top and rising frames of one keyword the way pytrends does
+
+    :param req_json: Parsed relatedsearches widget response
+    :param topics: Whether the widget holds related topics instead of queries
+    :return: {'top': DataFrame, 'rising': DataFrame}, None where Trends has none
+    """
+    frames = {}
+    for position, kind in enumerate(('top', 'rising')):
+        try:
+            ranked = req_json['default']['rankedList'][position]['rankedKeyword']
+            if topics:
+                frames[kind] = pd.json_normalize(ranked, sep='_')
+            else:
+                frames[kind] = pd.DataFrame(ranked)[['query', 'value']]
+        except (KeyError, IndexError):
+            frames[kind] = None
+    return frames
+
+
+class AsyncTrendsFetcher:
+    def __init__(self,
+                 regions: List[str] = ['US'],
+                 categories: List[str] = None,
+                 output_dir: str = 'trends_output',
+                 use_cache: bool = True,
+                 cache: Optional[TrendsCache] = None,
+                 rate_limiter: Optional[AdaptiveRateLimiter] = None,
+                 max_item_retries: int = 2,
+                 concurrency: int = 10,
+                 base_url: str = BASE_TRENDS_URL,
+                 timeout: float = 30.0,
+                 chart_mode: str = 'parallel',
+                 chart_workers: int = None,
+                 store: Optional[TrendsStore] = None,
+                 compact_insights: bool = False):
+        """
+        Asyncio sibling of AdvancedTrendsFetcher
+
+        Exposes the same report methods as coroutines. Requests go over one
+        pooled keep-alive aiohttp session, the cookie handshake is done once
+        when the session opens, and at most ``concurrency`` requests are in
+        flight at a time under the shared rate limiter. Use it as an async
+        context manager:
+
+            async with AsyncTrendsFetcher(regions=['US']) as fetcher:
+                await fetcher.generate_comprehensive_report(keywords)
+
+        :param regions: List of region codes (e.g., ['US', 'GB', 'CA'])
+        :param categories: Optional list of Google Trends categories
+        :param output_dir: Directory to save output files
+        :param use_cache: Whether to cache responses on disk under output_dir
+        :param cache: Optional cache instance to use instead of the default one
+        :param rate_limiter: Optional limiter shared with other fetchers
+        :param max_item_retries: Extra attempts for a region or keyword that failed
+        :param concurrency: Maximum number of requests in flight (connection pool size)
+        :param base_url: Google Trends base URL (point at a mock server for tests)
+        :param timeout: Total timeout per request in seconds
+        :param chart_mode: 'parallel', 'lazy' or 'skip' (see AdvancedTrendsFetcher)
+        :param chart_workers: Processes used to render charts (defaults to the CPU count)
+        :param store: Columnar store for fetched data (defaults to one under output_dir)
+        :param compact_insights: Return demographic insights as CompactInsights
+        """
+        if chart_mode not in CHART_MODES:
+            raise ValueError(f"chart_mode must be one of {CHART_MODES}")
+
+        self.regions = regions
+        self.categories = categories or []
+        self.output_dir = output_dir
+        self.hl = 'en-US'
+        self.tz = 360
+        self.base_url = base_url.rstrip('/')
+        self.concurrency = concurrency
+        self.timeout = timeout
+
+        # Create output directory if it doesn't exist
+        os.makedirs(output_dir, exist_ok=True)
+
+        if cache is None and use_cache:
+            cache = TrendsCache(os.path.join(output_dir, CACHE_FILENAME))
+        self.cache = cache
+        self.store = store or TrendsStore(os.path.join(output_dir, STORE_DIRNAME))
+
+        self.rate_limiter = rate_limiter or AdaptiveRateLimiter()
+        self.max_item_retries = max_item_retries
+
+        # Items that still failed after all retries, mapped to their last error
+        self.failures = {}
+
+        self.chart_mode = chart_mode
+        self.chart_workers = chart_workers
+        self.pending_charts = []
+
+        # Breakout terms found by the last comprehensive report
+        self.breakouts = pd.DataFrame()
+        self.compact_insights = compact_insights
+
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        # Widget tokens per payload, shared by concurrent requests for the same payload
+        self._widgets: Dict[Tuple, asyncio.Task] = {}
+
+    async def __aenter__(self) -> 'AsyncTrendsFetcher':
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def open(self):
+        """
+        Open the pooled HTTP session and do the cookie handshake
+        """
+        if self._session is not None:
+            return
+
+        connector = aiohttp.TCPConnector(limit=self.concurrency, keepalive_timeout=60)
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            headers={'accept-language': self.hl},
+        )
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+
+        # The NID cookie lands in the session's cookie jar and is reused for every request
+        await self.rate_limiter.acall(
+            'session', self._request, 'get', f'{self.base_url}/explore/', {'geo': self.hl[-2:]}, None
+        )
+
+    async def close(self):
+        """
+        Close the HTTP session
+        """
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        self._widgets = {}
+
+    async def _request(self,
+                       method: str,
+                       url: str,
+                       params: Dict[str, Any],
+                       trim_chars: Optional[int]) -> Any:
+        """
+        Send one request over the pooled session
+
+        :param method: 'get' or 'post'
+        :param url: Request URL
+        :param params: Query parameters
+        :param trim_chars: Characters to strip before parsing JSON (None skips parsing)
+        :return: Parsed JSON, or None when trim_chars is None
+        """
+        async with self._semaphore:
+            try:
+                async with self._session.request(method, url, params=params) as response:
+                    metrics.increment('http_responses', status=response.status)
+                    if response.status != 200:
+                        raise aiohttp.ClientResponseError(
+                            response.request_info, response.history,
+                            status=response.status,
+                            message=f'Google returned a response with code {response.status}',
+                            headers=response.headers,
+                        )
+                    if trim_chars is None:
+                        return None
+                    text = await response.text()
+                    metrics.increment('response_bytes', len(text))
+            except aiohttp.ClientConnectionError as e:
+                # Let the rate limiter treat it like any other connection failure
+                raise ConnectionError(str(e)) from e
+
+        return json.loads(text[trim_chars:])
+
+    async def _widget_tokens(self, kw_list: List[str], timeframe: str, geo: str) -> Dict[str, Any]:
+        """
+        Fetch the explore widgets (request + token) for a payload, once per payload
+
+        :param kw_list: Keywords of the payload
+        :param timeframe: Google Trends timeframe
+        :param geo: Geographic restriction
+        :return: Mapping of widget id prefix to widget
+        """
+        key = (tuple(kw_list), timeframe, geo)
+        task = self._widgets.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._explore(kw_list, timeframe, geo))
+            self._widgets[key] = task
+        try:
+            return await asyncio.shield(task)
+        except Exception:
+            self._widgets.pop(key, None)
+            raise
+
+    async def _explore(self, kw_list: List[str], timeframe: str, geo: str) -> Dict[str, Any]:
+        req = {
+            'comparisonItem': [{'keyword': keyword, 'time': timeframe, 'geo': geo} for keyword in kw_list],
+            'category': 0,
+            'property': '',
+        }
+        params = {'hl': self.hl, 'tz': self.tz, 'req': json.dumps(req)}
+        widgets = (await self.rate_limiter.acall(
+            'build_payload', self._request, 'post', f'{self.base_url}/api/explore', params, 4
+        ))['widgets']
+
+        tokens = {}
+        for widget in widgets:
+            if widget['id'] == 'TIMESERIES':
+                tokens['TIMESERIES'] = widget
+            if widget['id'] == 'GEO_MAP' and 'GEO_MAP' not in tokens:
+                tokens['GEO_MAP'] = widget
+            # One related queries and one related topics widget per keyword
+            for related in ('RELATED_QUERIES', 'RELATED_TOPICS'):
+                if related in widget['id']:
+                    tokens.setdefault(related, []).append(widget)
+        return tokens
+
+    async def _widget_data(self, endpoint: str, path: str, widget: Dict[str, Any]) -> Any:
+        params = {'req': json.dumps(widget['request']), 'token': widget['token'], 'tz': self.tz}
+        return await self.rate_limiter.acall(
+            endpoint, self._request, 'get', f'{self.base_url}/api/widgetdata/{path}', params, 5
+        )
+
+    async def _fetch_frame(self,
+                           endpoint: str,
+                           kw_list: List[str] = None,
+                           timeframe: str = None,
+                           geo: str = '',
+                           **params) -> pd.DataFrame:
+        """
+        Fetch a pytrends-compatible frame through the response cache
+
+        Cache keys match AdvancedTrendsFetcher's, so both fetchers share entries.
+        SQLite reads and writes run in the default executor, off the event loop.
+
+        :param endpoint: pytrends method name (e.g. 'interest_over_time')
+        :param kw_list: Keywords of the payload, if the endpoint needs one
+        :param timeframe: Google Trends timeframe of the payload
+        :param geo: Geographic restriction of the payload
+        :param params: Endpoint options (pn, resolution)
+        :return: Response frame (for related queries and topics, a dictionary
+                 of keyword to top and rising frames)
+        """
+        payload = dict(params, kw_list=kw_list, timeframe=timeframe, geo=geo, hl=self.hl, tz=self.tz)
+        loop = asyncio.get_running_loop()
+
+        if self.cache is not None:
+            frame = await loop.run_in_executor(None, read_cache, self.cache, endpoint, payload)
+            if frame is not None:
+                return frame
+
+        if endpoint == 'trending_searches':
+            req_json = await self.rate_limiter.acall(
+                endpoint, self._request, 'get', f'{self.base_url}/hottrends/visualize/internal/data', None, 0
+            )
+            frame = pd.DataFrame(req_json[params['pn']])
+        elif endpoint == 'interest_over_time':
+            widgets = await self._widget_tokens(kw_list, timeframe, geo)
+            req_json = await self._widget_data(endpoint, 'multiline', widgets['TIMESERIES'])
+            frame = parse_interest_over_time(req_json, kw_list)
+        elif endpoint == 'interest_by_region':
+            widgets = await self._widget_tokens(kw_list, timeframe, geo)
+            widget = {'token': widgets['GEO_MAP']['token'], 'request': dict(widgets['GEO_MAP']['request'])}
+            resolution = params.get('resolution', 'COUNTRY')
+            if geo == '' or (geo == 'US' and resolution in ['DMA', 'CITY', 'REGION']):
+                widget['request']['resolution'] = resolution
+            widget['request']['includeLowSearchVolumeGeos'] = False
+            req_json = await self._widget_data(endpoint, 'comparedgeo', widget)
+            frame = parse_interest_by_region(req_json, kw_list)
+        elif endpoint in ('related_queries', 'related_topics'):
+            widgets = await self._widget_tokens(kw_list, timeframe, geo)
+            related = widgets.get(endpoint.upper(), [])
+            responses = await asyncio.gather(*(
+                self._widget_data(endpoint, 'relatedsearches', widget) for widget in related
+            ))
+            # Keyed by the keyword each widget is restricted to, like pytrends
+            frame = {
+                widget['request']['restriction']['complexKeywordsRestriction']['keyword'][0]['value']:
+                    parse_related_searches(req_json, topics=endpoint == 'related_topics')
+                for widget, req_json in zip(related, responses)
+            }
+        else:
+            raise ValueError(f"Unsupported endpoint: {endpoint}")
+
+        if self.cache is not None:
+            await loop.run_in_executor(None, write_cache, self.cache, endpoint, payload, frame)
+
+        return frame
+
+    async def _run_with_retries(self,
+                                items: List[Any],
+                                fetch_item: Callable[[Any], Awaitable[Any]],
+                                description: str) -> Dict[Any, Any]:
+        """
+        Fetch every item concurrently, queueing failures for another pass
+
+        :param items: Work items (regions, keywords or keyword batches)
+        :param fetch_item: Coroutine function returning the result for one item
+        :param description: What is being fetched, used in error messages
+        :return: Mapping of item to result, in input order, for items that succeeded
+        """
+        results = {}
+        retry_queue = RetryQueue(self.max_item_retries)
+
+        pending = list(items)
+        while pending:
+            outcomes = await asyncio.gather(*(fetch_item(item) for item in pending), return_exceptions=True)
+            for item, outcome in zip(pending, outcomes):
+                if not isinstance(outcome, BaseException):
+                    results[item] = outcome
+                    continue
+                print(f"Error fetching {description} for {item}: {outcome}")
+                if retry_queue.push(item, outcome):
+                    print(f"Queued {item} for retry")
+            pending = [retry_queue.pop() for _ in range(len(retry_queue))]
+
+        for item in retry_queue.exhausted():
+            self.failures[item] = retry_queue.errors[item]
+            print(f"Giving up on {description} for {item}: {retry_queue.errors[item]}")
+
+        return {item: results[item] for item in items if item in results}
+
+    async def fetch_top_keywords(self,
+                                 timeframe: str = 'now 1-d',
+                                 top_n: int = 50) -> pd.DataFrame:
+        """
+        Fetch top keywords across multiple regions concurrently
+
+        :param timeframe: Google Trends timeframe
+        :param top_n: Number of top keywords to return
+        :return: DataFrame with top keywords
+        """
+        async def fetch_region(region):
+            # Daily trending searches
+            daily_trends = await self._fetch_frame('trending_searches', pn=region)
+
+            # Add region column
+            daily_trends['region'] = region
+            return daily_trends.head(top_n)
+
+        with metrics.span('stage', stage='fetch_top_keywords'):
+            top_keywords = await self._run_with_retries(self.regions, fetch_region, 'trends')
+        return combine_top_keywords(list(top_keywords.values()), self.output_dir)
+
+    async def analyze_keyword_demographics(self,
+                                           keywords: List[str],
+                                           timeframe: str = 'today 3-m',
+                                           batch_size: int = 1,
+                                           anchor_keyword: str = None) -> Dict[str, Any]:
+        """
+        Analyze demographic trends for given keywords concurrently
+
+        Batching works as in AdvancedTrendsFetcher.analyze_keyword_demographics.
+
+        :param keywords: List of keywords to analyze
+        :param timeframe: Google Trends timeframe
+        :param batch_size: Number of keywords per payload (1 disables batching)
+        :param anchor_keyword: Keyword shared by every batch (defaults to the first keyword)
+        :return: Dictionary of demographic insights
+        """
+        with metrics.span('stage', stage='analyze_keyword_demographics'):
+            if batch_size > 1:
+                fetched = await self._fetch_batched_frames(keywords, timeframe, batch_size, anchor_keyword)
+            else:
+                fetched = await self._fetch_single_frames(keywords, timeframe)
+
+        demographic_insights = build_demographic_insights(fetched, self.compact_insights)
+
+        # Append detailed insights to the columnar store
+        if self.store is not None:
+            self.store.write_insights(demographic_insights, timeframe)
+
+        # Visualize regional interest
+        self.pending_charts.extend(regional_chart_jobs(demographic_insights, self.output_dir, timeframe))
+        if self.chart_mode == 'parallel':
+            await self.render_pending_charts()
+        elif self.chart_mode == 'skip':
+            self.pending_charts = []
+
+        return demographic_insights
+
+    async def render_pending_charts(self) -> List[str]:
+        """
+        Render queued regional interest charts without blocking the event loop
+
+        :return: Paths of the charts that were written
+        """
+        jobs, self.pending_charts = self.pending_charts, []
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, render_charts, jobs, self.chart_workers)
+
+    async def fetch_related_queries(self,
+                                    keywords: List[str],
+                                    timeframe: str = 'today 3-m',
+                                    batch_size: int = MAX_PAYLOAD_KEYWORDS) -> Dict[str, Dict[str, pd.DataFrame]]:
+        """
+        Fetch the top and rising related queries of every keyword concurrently
+
+        Works as AdvancedTrendsFetcher.fetch_related_queries.
+
+        :param keywords: List of keywords
+        :param timeframe: Google Trends timeframe
+        :param batch_size: Number of keywords per payload
+        :return: Keyword -> {'top': DataFrame, 'rising': DataFrame}
+        """
+        return await self._fetch_related('related_queries', keywords, timeframe, batch_size)
+
+    async def fetch_related_topics(self,
+                                   keywords: List[str],
+                                   timeframe: str = 'today 3-m',
+                                   batch_size: int = MAX_PAYLOAD_KEYWORDS) -> Dict[str, Dict[str, pd.DataFrame]]:
+        """
+        Fetch the top and rising related topics of every keyword concurrently
+
+        :param keywords: List of keywords
+        :param timeframe: Google Trends timeframe
+        :param batch_size: Number of keywords per payload
+        :return: Keyword -> {'top': DataFrame, 'rising': DataFrame}
+        """
+        return await self._fetch_related('related_topics', keywords, timeframe, batch_size)
+
+    async def _fetch_related(self,
+                             endpoint: str,
+                             keywords: List[str],
+                             timeframe: str,
+                             batch_size: int) -> Dict[str, Dict[str, pd.DataFrame]]:
+        keywords = list(dict.fromkeys(keywords))
+        per_payload = max(1, min(batch_size, MAX_PAYLOAD_KEYWORDS))
+        batches = [tuple(keywords[i:i + per_payload]) for i in range(0, len(keywords), per_payload)]
+        description = endpoint.replace('_', ' ')
+
+        async def fetch_batch(batch):
+            print(f"Fetching {description} for: {', '.join(batch)}")
+            return await self._fetch_frame(endpoint, list(batch), timeframe)
+
+        with metrics.span('stage', stage=f'fetch_{endpoint}'):
+            fetched = await self._run_with_retries(batches, fetch_batch, description)
+
+        related = {}
+        for batch, by_keyword in fetched.items():
+            for keyword in batch:
+                queries = by_keyword.get(keyword) or {}
+                related[keyword] = {'top': queries.get('top'), 'rising': queries.get('rising')}
+        return related
+
+    async def _fetch_single_frames(self,
+                                   keywords: List[str],
+                                   timeframe: str) -> Dict[str, Tuple[pd.DataFrame, pd.DataFrame]]:
+        async def fetch_keyword(keyword):
+            print(f"Fetching data for: {keyword}")
+            return tuple(await asyncio.gather(
+                self._fetch_frame('interest_by_region', [keyword], timeframe, resolution='REGION'),
+                self._fetch_frame('interest_over_time', [keyword], timeframe),
+            ))
+
+        return await self._run_with_retries(keywords, fetch_keyword, 'demographics')
+
+    async def _fetch_batched_frames(self,
+                                    keywords: List[str],
+                                    timeframe: str,
+                                    batch_size: int,
+                                    anchor_keyword: str = None) -> Dict[str, Tuple[pd.DataFrame, pd.DataFrame]]:
+        anchor, batches = plan_keyword_batches(keywords, batch_size, anchor_keyword)
+        if anchor is None:
+            return {}
+
+        async def fetch_batch(batch):
+            kw_list = [anchor] + list(batch)
+            print(f"Fetching data for: {', '.join(kw_list)}")
+            # Regions per keyword: a batched payload only gives each keyword's share of the batch
+            *region_frames, interest_over_time = await asyncio.gather(
+                *(self._fetch_frame('interest_by_region', [keyword], timeframe, resolution='REGION')
+                  for keyword in region_keywords(anchor, batch, batches, keywords)),
+                self._fetch_frame('interest_over_time', kw_list, timeframe),
+            )
+            return combine_region_frames(region_frames), interest_over_time
+
+        fetched = await self._run_with_retries(batches, fetch_batch, 'demographics')
+
+        # Rescale in batch order so the first batch stays the reference
+        frames = {}
+        reference = {}
+        for batch, (interest_by_region, interest_over_time) in fetched.items():
+            kw_list = [anchor] + list(batch)
+            batch_frames = split_batch_frames(
+                kw_list, anchor, keywords, interest_by_region, interest_over_time, reference
+            )
+            for keyword, keyword_frames in batch_frames.items():
+                frames.setdefault(keyword, keyword_frames)
+
+        return frames
+
+    async def generate_comprehensive_report(self,
+                                            keywords: List[str] = None,
+                                            timeframe: str = 'today 3-m',
+                                            batch_size: int = 1,
+                                            anchor_keyword: str = None):
+        """
+        Generate a comprehensive trends report
+
+        :param keywords: Optional list of keywords to deep dive
+        :param timeframe: Google Trends timeframe
+        :param batch_size: Number of keywords per payload (1 disables batching)
+        :param anchor_keyword: Keyword shared by every batch when batching
+        :return: Summary DataFrame
+        """
+        # Fetch top keywords if not provided
+        if not keywords:
+            top_keywords_df = await self.fetch_top_keywords()
+            keywords = top_keywords_df.iloc[:, 0].tolist()[:50]
+
+        # Analyze demographic trends
+        demographic_insights = await self.analyze_keyword_demographics(
+            keywords,
+            timeframe,
+            batch_size=batch_size,
+            anchor_keyword=anchor_keyword
+        )
+
+        # Create a summary report
+        summary_df = write_summary_report(demographic_insights, self.output_dir)
+
+        # Rank keywords breaking out in the newly fetched points
+        self.breakouts = write_breakouts(demographic_insights, self.output_dir, timeframe)
+
+        print(f"Comprehensive report generated in {self.output_dir}")
+        return summary_df
@@ -0,0 +1,331 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import pandas as pd
+import matplotlib
+matplotlib.use('Agg')
+
+from config import CONFIG
+from rate_limiter import AdaptiveRateLimiter
+from mock_trends_server import MockTrendsServer, mock_trend_req
+from advanced_trends_fetcher import AdvancedTrendsFetcher, write_summary_report, write_breakouts
+from trend_analytics import stack_time_series
+from excel_generator import ExcelReportGenerator
+
+# Scenario sizes run when none are given on the command line
+DEFAULT_KEYWORD_COUNTS = [10, 100, 1000]
+DEFAULT_REGION_COUNTS = [1, 10, 50]
+
+# Wall time growth over the baseline that counts as a regression
+DEFAULT_TOLERANCE = 0.2
+
+
+def bench_keywords(count: int) -> List[str]:
+    return [f'benchmark keyword {index}' for index in range(count)]
+
+
+def bench_regions(count: int) -> List[str]:
+    return [f'R{index:02d}' for index in range(count)]
+
+
+def _peak_rss_mb(who: int) -> float:
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(who).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _current_rss_mb() -> Optional[float]:
+    # Resident pages of this process right now; only Linux exposes them without extra packages
+    try:
+        with open('/proc/self/statm') as f:
+            resident = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return resident * resource.getpagesize() / (1024 * 1024)
+
+
+class StageTimer:
+    def __init__(self, server: MockTrendsServer):
+        """
+        Record wall time, RSS growth and request count of each stage of a run
+
+        RSS growth is the current RSS after a stage minus before it (None
+        where /proc is not available). The process high-water mark cannot be
+        split by stage, so run_scenario reports it once per scenario; that is
+        why scenarios are run in their own process by run_suite.
+
+        :param server: Mock server whose requests are counted
+        """
+        self.server = server
+        self.stages: Dict[str, Dict[str, float]] = {}
+
+    def run(self, name: str, stage: Callable[[], Any]) -> Any:
+        """
+        Run one stage and record its measurements
+
+        :param name: Stage name
+        :param stage: Callable running the stage
+        :return: Whatever the stage returned
+        """
+        requests_before = self.server.request_count
+        rss_before = _current_rss_mb()
+        started = time.perf_counter()
+        result = stage()
+        wall = time.perf_counter() - started
+        rss_after = _current_rss_mb()
+        self.stages[name] = {
+            'wall_s': round(wall, 4),
+            'rss_delta_mb': round(rss_after - rss_before, 1) if rss_before is not None and rss_after is not None else None,
+            'requests': self.server.request_count - requests_before,
+        }
+        return result
+
+
+def run_scenario(keyword_count: int,
+                 region_count: int,
+                 timeframe: str = 'today 3-m',
+                 batch_size: int = 5,
+                 max_workers: int = 4,
+                 chart_workers: int = None,
+                 latency: float = 0.0,
+                 output_dir: str = None) -> Dict[str, Any]:
+    """
+    Run every stage of a report once against a local mock Trends server
+
+    Responses are the deterministic synthetic data of MockTrendsServer, so
+    runs are repeatable and need no network. The rate limiter is opened up
+    and the response cache disabled, so the numbers measure this code and
+    not Google's throttling.
+
+    :param keyword_count: Number of keywords analyzed
+    :param region_count: Number of regions whose trending searches are fetched
+    :param timeframe: Google Trends timeframe of the keyword history
+    :param batch_size: Number of keywords per payload (1 disables batching)
+    :param max_workers: Worker threads used by the fetcher
+    :param chart_workers: Processes used to render charts (defaults to the CPU count)
+    :param latency: Seconds the mock server waits before each response
+    :param output_dir: Directory for the run's files (a temporary one, removed afterwards, if None)
+    :return: Scenario results, with measurements per stage
+    """
+    keywords = bench_keywords(keyword_count)
+    regions = bench_regions(region_count)
+    workdir = output_dir or tempfile.mkdtemp(prefix='trends_benchmark_')
+
+    try:
+        with MockTrendsServer(latency=latency, trending_regions=regions) as server:
+            fetcher = AdvancedTrendsFetcher(
+                regions=regions,
+                output_dir=workdir,
+                use_cache=False,
+                rate_limiter=AdaptiveRateLimiter(rate=1000.0, max_rate=1000.0, burst=1000.0),
+                max_workers=max_workers,
+                chart_mode='lazy',
+                chart_workers=chart_workers,
+                session_class=mock_trend_req(server.base_url)
+            )
+            timer = StageTimer(server)
+
+            top_keywords = timer.run('fetch_top_keywords', fetcher.fetch_top_keywords)
+            insights = timer.run('analyze_keyword_demographics', lambda: fetcher.analyze_keyword_demographics(
+                keywords, timeframe, batch_size=batch_size
+            ))
+            charts = timer.run('render_charts', fetcher.render_pending_charts)
+
+            def summarize():
+                return write_summary_report(insights, workdir), write_breakouts(insights, workdir, timeframe)
+            summary, breakouts = timer.run('summary', summarize)
+
+            terms = top_keywords.iloc[:, 0].drop_duplicates().tolist() if not top_keywords.empty else []
+            data = {
+                'report_type': 'daily',
+                'periods': ['daily'],
+                'trending_searches': {'daily': _trending_frame(terms)},
+                'stock_trends': {'daily': stack_time_series(insights)},
+                'summary': summary,
+                'breakouts': breakouts,
+            }
+            report_path = timer.run('excel_report', lambda: ExcelReportGenerator(output_dir=workdir).create_report(data))
+
+        return {
+            'keywords': keyword_count,
+            'regions': region_count,
+            'timeframe': timeframe,
+            'batch_size': batch_size,
+            'max_workers': max_workers,
+            'charts': len(charts),
+            'failures': len(fetcher.failures),
+            'report_bytes': os.path.getsize(report_path) if report_path else 0,
+            'wall_s': round(sum(stage['wall_s'] for stage in timer.stages.values()), 4),
+            'requests': sum(stage['requests'] for stage in timer.stages.values()),
+            # High-water marks of the whole scenario (its own process) and of chart workers
+            'peak_rss_mb': round(_peak_rss_mb(resource.RUSAGE_SELF), 1),
+            'children_peak_rss_mb': round(_peak_rss_mb(resource.RUSAGE_CHILDREN), 1),
+            'stages': timer.stages,
+        }
+    finally:
+        if output_dir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _trending_frame(terms: List[str]) -> pd.DataFrame:
+    return pd.DataFrame({
+        'Rank': range(1, len(terms) + 1),
+        'Search Term': terms,
+        'Period': 'daily',
+        'Date': datetime.now().strftime('%Y-%m-%d'),
+    })
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def run_suite(keyword_counts: List[int],
+              region_counts: List[int],
+              options: List[str] = None,
+              verbose: bool = False) -> Dict[str, Any]:
+    """
+    Run every keyword x region scenario, each in a fresh Python process
+
+    :param keyword_counts: Keyword counts to benchmark
+    :param region_counts: Region counts to benchmark
+    :param options: Extra command line options passed to each scenario
+    :param verbose: Show the fetcher's progress output
+    :return: Results with run metadata and one entry per scenario
+    """
+    scenarios = []
+    for keyword_count in keyword_counts:
+        for region_count in region_counts:
+            print(f"Benchmarking {keyword_count} keywords x {region_count} regions...", file=sys.stderr)
+            with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as handle:
+                result_path = handle.name
+            try:
+                subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), '--scenario',
+                     '--keywords', str(keyword_count), '--regions', str(region_count),
+                     '--output', result_path] + (options or []),
+                    stdout=None if verbose else subprocess.DEVNULL,
+                    check=True
+                )
+                with open(result_path) as f:
+                    scenarios.append(json.load(f))
+            finally:
+                os.remove(result_path)
+
+            scenario = scenarios[-1]
+            print(f"  {scenario['wall_s']:.2f}s, {scenario['requests']} requests, "
+                  f"peak RSS {scenario['peak_rss_mb']:.0f} MB",
+                  file=sys.stderr)
+
+    return {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'revision': _git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'scenarios': scenarios,
+    }
+
+
+def compare_results(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = DEFAULT_TOLERANCE) -> List[str]:
+    """
+    Compare stage wall times with a baseline run
+
+    :param results: Results from run_suite
+    :param baseline: Earlier results from run_suite
+    :param tolerance: Allowed relative growth of a stage's wall time
+    :return: Descriptions of the stages that regressed
+    """
+    previous = {(scenario['keywords'], scenario['regions']): scenario for scenario in baseline.get('scenarios', [])}
+    regressions = []
+    for scenario in results['scenarios']:
+        old = previous.get((scenario['keywords'], scenario['regions']))
+        if old is None:
+            continue
+        for stage, measured in scenario['stages'].items():
+            before = old['stages'].get(stage, {}).get('wall_s')
+            if not before:
+                continue
+            ratio = measured['wall_s'] / before
+            line = (f"{scenario['keywords']} keywords x {scenario['regions']} regions, {stage}: "
+                    f"{before:.3f}s -> {measured['wall_s']:.3f}s ({ratio:.2f}x)")
+            print(line, file=sys.stderr)
+            if ratio > 1 + tolerance:
+                regressions.append(line)
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the report pipeline against a local mock Trends server')
+    parser.add_argument('--keywords', type=int, nargs='+', default=DEFAULT_KEYWORD_COUNTS,
+                        help='Keyword counts to benchmark')
+    parser.add_argument('--regions', type=int, nargs='+', default=DEFAULT_REGION_COUNTS,
+                        help='Region counts to benchmark')
+    parser.add_argument('--timeframe', default='today 3-m', help='Timeframe of the keyword history')
+    parser.add_argument('--batch-size', type=int, default=CONFIG.get('batch_size', 5),
+                        help='Keywords per payload')
+    parser.add_argument('--workers', type=int, default=CONFIG.get('max_workers', 4),
+                        help='Fetcher worker threads')
+    parser.add_argument('--chart-workers', type=int, default=None, help='Chart rendering processes')
+    parser.add_argument('--latency', type=float, default=0.0, help='Mock server latency per request in seconds')
+    parser.add_argument('--output', default='benchmark_results.json', help='JSON file to write the results to')
+    parser.add_argument('--baseline', help='Earlier results to compare wall times against')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='Allowed relative wall time growth before a stage counts as a regression')
+    parser.add_argument('--verbose', action='store_true', help="Show the fetcher's progress output")
+    parser.add_argument('--scenario', action='store_true', help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """
+    Run the benchmark suite and save the results as JSON
+    """
+    args = parse_args(argv)
+    options = ['--timeframe', args.timeframe, '--batch-size', str(args.batch_size),
+               '--workers', str(args.workers), '--latency', str(args.latency)]
+    if args.chart_workers:
+        options += ['--chart-workers', str(args.chart_workers)]
+
+    # A single scenario, run by run_suite in its own process
+    if args.scenario:
+        result = run_scenario(args.keywords[0], args.regions[0], args.timeframe, args.batch_size,
+                              args.workers, args.chart_workers, args.latency)
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+        return 0
+
+    results = run_suite(args.keywords, args.regions, options, args.verbose)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results saved to {args.output}", file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_results(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} stage(s) slower than the baseline by more than {args.tolerance:.0%}",
+                  file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,119 @@
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+from instrumentation import metrics
+
+# How charts are produced after fetching:
+#   'parallel' - render right after fetching, in a process pool
+#   'lazy'     - queue render jobs and render them on demand
+#   'skip'     - do not render charts at all
+CHART_MODES = ('parallel', 'lazy', 'skip')
+
+# A render job: keyword, regional scores and the PNG path to write
+ChartJob = Tuple[str, pd.Series, str]
+
+
+def regional_chart_path(output_dir: str, keyword: str, timeframe: str = None) -> str:
+    """
+    Return the path of a keyword's regional interest chart
+
+    Charts of several timeframes fetched in one run (e.g. by a FetchPlan)
+    get a file each instead of overwriting one another.
+
+    :param output_dir: Directory holding the charts
+    :param keyword: Keyword the chart belongs to
+    :param timeframe: Google Trends timeframe the regional scores cover
+    :return: PNG file path
+    """
+    if timeframe:
+        label = re.sub(r'[^\w-]+', '_', timeframe)
+        return os.path.join(output_dir, f'{keyword}_{label}_regional_interest.png')
+    return os.path.join(output_dir, f'{keyword}_regional_interest.png')
+
+
+def render_regional_chart(keyword: str, top_regions: pd.Series, output_path: str) -> str:
+    """
+    Render a bar chart of a keyword's top regions
+
+    Uses the object-oriented Agg API, so no pyplot global state is touched
+    and charts can be rendered from several processes at once.
+
+    :param keyword: Keyword the chart belongs to
+    :param top_regions: Interest score per region
+    :param output_path: PNG file path
+    :return: output_path
+    """
+    figure = Figure(figsize=(12, 6))
+    FigureCanvasAgg(figure)
+    axes = figure.add_subplot()
+
+    positions = range(len(top_regions))
+    axes.bar(positions, top_regions.to_numpy())
+    axes.set_xticks(list(positions))
+    axes.set_xticklabels([str(region) for region in top_regions.index], rotation=90)
+    axes.set_title(f'Top Regions - {keyword} Interest')
+    axes.set_xlabel('Regions')
+    axes.set_ylabel('Interest Score')
+
+    figure.tight_layout()
+    figure.savefig(output_path)
+    return output_path
+
+
+def regional_chart_jobs(demographic_insights: Dict[str, Any],
+                        output_dir: str,
+                        timeframe: str = None) -> List[ChartJob]:
+    """
+    Build render jobs for already-fetched demographic insights
+
+    :param demographic_insights: Dictionary of demographic insights
+    :param output_dir: Directory to save the charts
+    :param timeframe: Google Trends timeframe of the insights, part of the file names
+    :return: List of render jobs
+    """
+    jobs = []
+    for keyword, insights in demographic_insights.items():
+        top_regions = insights['top_regions']
+        if keyword in getattr(top_regions, 'columns', []):
+            jobs.append((keyword, top_regions[keyword], regional_chart_path(output_dir, keyword, timeframe)))
+    return jobs
+
+
+def _render_job(job: ChartJob) -> Optional[str]:
+    keyword, top_regions, output_path = job
+    try:
+        return render_regional_chart(keyword, top_regions, output_path)
+    except Exception as e:
+        print(f"Error rendering chart for {keyword}: {e}")
+        return None
+
+
+def render_charts(jobs: List[ChartJob], max_workers: int = None) -> List[str]:
+    """
+    Render charts across a pool of processes
+
+    :param jobs: Render jobs
+    :param max_workers: Number of processes (defaults to the CPU count; 1 renders inline)
+    :return: Paths of the charts that were written
+    """
+    if not jobs:
+        return []
+
+    with metrics.span('chart_render'):
+        if max_workers == 1 or len(jobs) == 1:
+            rendered = [_render_job(job) for job in jobs]
+        else:
+            workers = min(max_workers or os.cpu_count() or 1, len(jobs))
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                rendered = list(executor.map(_render_job, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+
+    paths = [path for path in rendered if path]
+    metrics.increment('charts_rendered', len(paths))
+    metrics.increment('chart_failures', len(rendered) - len(paths))
+    return paths
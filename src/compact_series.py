@@ -0,0 +1,276 @@
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Regions kept per keyword, as in build_demographic_insights
+TOP_REGIONS_KEPT = 10
+
+# Google Trends scores are integers in this range and fit in a uint8
+MAX_SCORE = 100
+
+
+def _score_dtype(values: np.ndarray) -> np.dtype:
+    """
+    uint8 when every value is a whole score in 0-100, float32 otherwise
+    """
+    if not values.size or np.isnan(values).any():
+        return np.dtype('float32') if values.size else np.dtype('uint8')
+    if values.min() < 0 or values.max() > MAX_SCORE or (values != np.round(values)).any():
+        return np.dtype('float32')
+    return np.dtype('uint8')
+
+
+class CompactInsights(Mapping):
+    def __init__(self,
+                 keywords: List[str],
+                 index: pd.Index,
+                 values: np.ndarray,
+                 partial: np.ndarray,
+                 spans: np.ndarray,
+                 regions: pd.Index,
+                 top_positions: np.ndarray,
+                 top_scores: np.ndarray,
+                 top_counts: np.ndarray):
+        """
+        Demographic insights of many keywords in a few contiguous arrays
+
+        A drop-in replacement for the dictionary returned by
+        build_demographic_insights: ``insights[keyword]`` still gives
+        ``{'top_regions': ..., 'time_series': ...}``, but the frames are
+        zero-copy views built on demand instead of two DataFrames (with their
+        own index and object overhead) held per keyword.
+
+        Every time series lives in one column-major ``values`` array
+        (date x keyword) over a shared date index, so each keyword's column is
+        contiguous; ``spans`` holds the rows each keyword covers. Scores are
+        uint8 when they are whole 0-100 values and float32 (NaN for gaps)
+        otherwise, which includes every batched, anchor-rescaled or stitched
+        series. Top regions are positions into the shared ``regions``
+        dictionary plus their scores. Build it with from_frames or
+        from_insights. The views share memory with the container, so copy a
+        frame before modifying it.
+
+        :param keywords: Keywords, one per column
+        :param index: Shared date index of the rows
+        :param values: Scores, date x keyword, column-major
+        :param partial: isPartial flags, same shape and layout as values
+        :param spans: First and past-the-last row of every keyword (keyword x 2)
+        :param regions: Region dictionary
+        :param top_positions: Region positions of every keyword's top regions, best first
+        :param top_scores: Scores of those regions
+        :param top_counts: Number of top regions of every keyword
+        """
+        self.keywords = list(keywords)
+        self.keyword_ids: Dict[str, int] = {keyword: position for position, keyword in enumerate(self.keywords)}
+        self.index = index
+        self.values = values
+        self.partial = partial
+        self.spans = spans
+        self.regions = regions
+        self.region_ids: Dict[Any, int] = {region: position for position, region in enumerate(regions)}
+        self.top_positions = top_positions
+        self.top_scores = top_scores
+        self.top_counts = top_counts
+
+    @classmethod
+    def from_frames(cls, fetched: Dict[str, Tuple[pd.DataFrame, pd.DataFrame]]) -> 'CompactInsights':
+        """
+        Pack fetched frames without building per-keyword insights first
+
+        :param fetched: Mapping of keyword to (interest_by_region, interest_over_time)
+        :return: CompactInsights
+        """
+        series = {}
+        partials = {}
+        top_regions = {}
+        for keyword, (interest_by_region, interest_over_time) in fetched.items():
+            try:
+                top_regions[keyword] = interest_by_region[keyword].nlargest(TOP_REGIONS_KEPT)
+            except Exception as e:
+                print(f"Error analyzing demographics for {keyword}: {e}")
+                continue
+
+            if keyword in interest_over_time.columns:
+                series[keyword] = interest_over_time[keyword]
+                if 'isPartial' in interest_over_time.columns:
+                    partials[keyword] = interest_over_time['isPartial']
+            else:
+                series[keyword] = pd.Series(dtype='float64', index=interest_over_time.index[:0])
+
+        return cls._pack(list(top_regions), series, partials, top_regions)
+
+    @classmethod
+    def from_insights(cls, demographic_insights: Dict[str, Any]) -> 'CompactInsights':
+        """
+        Pack the dictionary returned by build_demographic_insights
+
+        :param demographic_insights: Dictionary of demographic insights
+        :return: CompactInsights
+        """
+        if isinstance(demographic_insights, cls):
+            return demographic_insights
+
+        series = {}
+        partials = {}
+        top_regions = {}
+        for keyword, insights in demographic_insights.items():
+            time_series = insights['time_series']
+            if keyword in time_series.columns:
+                series[keyword] = time_series[keyword]
+                if 'isPartial' in time_series.columns:
+                    partials[keyword] = time_series['isPartial']
+            else:
+                series[keyword] = pd.Series(dtype='float64', index=time_series.index[:0])
+
+            regions = insights['top_regions']
+            top_regions[keyword] = (
+                regions[keyword].dropna() if keyword in regions.columns else pd.Series(dtype='float64')
+            )
+
+        return cls._pack(list(demographic_insights), series, partials, top_regions)
+
+    @classmethod
+    def _pack(cls,
+              keywords: List[str],
+              series: Dict[str, pd.Series],
+              partials: Dict[str, pd.Series],
+              top_regions: Dict[str, pd.Series]) -> 'CompactInsights':
+        # Series fetched for the same timeframe share their dates, so the
+        # union is usually just the first index
+        indexes = [item.index for item in series.values() if len(item)]
+        index = indexes[0] if indexes else pd.DatetimeIndex([], name='date')
+        if not all(other.equals(index) for other in indexes[1:]):
+            index = index.append(indexes[1:]).unique().sort_values()
+
+        rows, columns = len(index), len(keywords)
+        dense = np.full((rows, columns), np.nan, order='F')
+        partial = np.zeros((rows, columns), dtype=bool, order='F')
+        spans = np.zeros((columns, 2), dtype=np.int32)
+
+        for column, keyword in enumerate(keywords):
+            item = series[keyword]
+            if not len(item):
+                continue
+            item = item[~item.index.duplicated()]
+            positions = np.arange(rows) if item.index.equals(index) else index.get_indexer(item.index)
+            dense[positions, column] = item.to_numpy(dtype='float64')
+            if keyword in partials:
+                flags = partials[keyword]
+                partial[positions, column] = flags[~flags.index.duplicated()].to_numpy(dtype=bool)
+            spans[column] = positions.min(), positions.max() + 1
+
+        # Only the rows a keyword covers decide the dtype; rows outside its span are never viewed
+        covered = np.zeros((rows, columns), dtype=bool, order='F')
+        for column, (start, stop) in enumerate(spans):
+            covered[start:stop, column] = True
+        dtype = _score_dtype(dense[covered])
+        values = np.asfortranarray(np.where(covered, dense, 0) if dtype == np.uint8 else dense, dtype=dtype)
+
+        # Top regions: positions into one region dictionary
+        region_labels = pd.Index(pd.unique(np.concatenate(
+            [item.index.to_numpy(dtype=object) for item in top_regions.values()] or [np.empty(0, dtype=object)]
+        )))
+        names = [item.index.name for item in top_regions.values() if item.index.name is not None]
+        region_labels.name = names[0] if names else None
+
+        top_positions = np.full((columns, TOP_REGIONS_KEPT), -1, dtype=np.int32)
+        top_dense = np.full((columns, TOP_REGIONS_KEPT), np.nan)
+        top_counts = np.zeros(columns, dtype=np.int32)
+        for column, keyword in enumerate(keywords):
+            item = top_regions[keyword].iloc[:TOP_REGIONS_KEPT]
+            count = len(item)
+            top_positions[column, :count] = region_labels.get_indexer(item.index)
+            top_dense[column, :count] = item.to_numpy(dtype='float64')
+            top_counts[column] = count
+
+        kept = np.arange(TOP_REGIONS_KEPT) < top_counts[:, None]
+        top_dtype = _score_dtype(top_dense[kept])
+        top_scores = np.where(kept, top_dense, 0).astype(top_dtype) if top_dtype == np.uint8 \
+            else top_dense.astype(top_dtype)
+
+        return cls(keywords, index, values, partial, spans, region_labels, top_positions, top_scores, top_counts)
+
+    def __getitem__(self, keyword: str) -> Dict[str, pd.DataFrame]:
+        if keyword not in self.keyword_ids:
+            raise KeyError(keyword)
+        return {'top_regions': self.top_regions(keyword), 'time_series': self.time_series(keyword)}
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.keywords)
+
+    def __len__(self) -> int:
+        return len(self.keywords)
+
+    def __contains__(self, keyword: object) -> bool:
+        return keyword in self.keyword_ids
+
+    def time_series(self, keyword: str) -> pd.DataFrame:
+        """
+        Interest over time of one keyword, as a view of the shared arrays
+
+        :param keyword: Keyword
+        :return: Frame indexed by date with the keyword's column and isPartial
+        """
+        column = self.keyword_ids[keyword]
+        start, stop = self.spans[column]
+        return pd.DataFrame(
+            {keyword: self.values[start:stop, column], 'isPartial': self.partial[start:stop, column]},
+            index=self.index[start:stop],
+            copy=False
+        )
+
+    def top_regions(self, keyword: str) -> pd.DataFrame:
+        """
+        Highest scoring regions of one keyword, best first
+
+        :param keyword: Keyword
+        :return: Frame indexed by region with the keyword's column
+        """
+        column = self.keyword_ids[keyword]
+        count = self.top_counts[column]
+        return pd.DataFrame(
+            {keyword: self.top_scores[column, :count]},
+            index=self.regions[self.top_positions[column, :count]],
+            copy=False
+        )
+
+    def stacked_time_series(self, complete_only: bool = False) -> pd.DataFrame:
+        """
+        Every keyword's series in one float64 frame, NaN outside its dates
+
+        Same result as trend_analytics.stack_time_series, in one array operation.
+
+        :param complete_only: Leave points flagged isPartial out (NaN)
+        :return: Frame indexed by date with one column per keyword
+        """
+        values = self.values.astype('float64')
+        rows = np.arange(len(self.index))[:, None]
+        values[(rows < self.spans[:, 0]) | (rows >= self.spans[:, 1])] = np.nan
+        if complete_only:
+            values[self.partial] = np.nan
+        return pd.DataFrame(values, index=self.index, columns=self.keywords).sort_index()
+
+    def stacked_regions(self) -> pd.DataFrame:
+        """
+        Every keyword's top region scores in one float64 frame
+
+        Same result as trend_analytics.stack_regions.
+
+        :return: Frame indexed by region with one column per keyword
+        """
+        values = np.full((len(self.regions), len(self.keywords)), np.nan)
+        kept = np.arange(TOP_REGIONS_KEPT) < self.top_counts[:, None]
+        columns = np.broadcast_to(np.arange(len(self.keywords))[:, None], kept.shape)
+        values[self.top_positions[kept], columns[kept]] = self.top_scores[kept]
+        return pd.DataFrame(values, index=self.regions, columns=self.keywords)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Bytes held by the arrays
+        """
+        return sum(array.nbytes for array in (
+            self.values, self.partial, self.spans, self.top_positions, self.top_scores, self.top_counts
+        )) + self.index.nbytes + self.regions.memory_usage(deep=True)
@@ -18,6 +18,68 @@ CONFIG = {
     # Timeframe for trend analysis
     'timeframe': 'today 3-m',
     
+    # Keywords per interest over time payload (max 5, 1 disables batching).
+    # Only interest over time is batched: regional scores still take their own
+    # explore and widget request per keyword, so batching 5 saves about a sixth
+    # of the requests and puts every series on the anchor's (float) scale
+    'batch_size': 1,
+    
+    # Keyword shared by every batch to keep scores on one scale
+    # (defaults to the first keyword)
+    'anchor_keyword': None,
+    
+    # Worker threads used to fetch regions concurrently (1 is sequential)
+    'max_workers': 4,
+    
+    # Worker processes splitting the keyword list in `main.py fetch`
+    # (1 fetches in this process; see sharded_runner.py)
+    'shards': 1,
+    
+    # Chart rendering: 'parallel' (process pool after fetching), 'lazy' or 'skip'
+    'chart_mode': 'parallel',
+    
+    # Keep fetched series in shared arrays instead of a DataFrame per keyword
+    # (see compact_series.py); worth it for thousands of keywords. Series are
+    # float32, and uint8 only when every value is a raw Trends score
+    # (batch_size 1, no anchor rescaling, stitching or incremental merge)
+    'compact_insights': False,
+    
+    # Write Excel reports in constant memory mode (None: only reports of more
+    # than excel_generator.STREAMING_ROW_THRESHOLD rows)
+    'excel_streaming': None,
+    
+    # Cache pytrends responses on disk under output_dir between runs
+    'use_cache': True,
+    
+    # `main.py fetch --crawl`: expand the keywords breadth-first through rising
+    # related queries (see watchlist_crawler.py), at most crawl_depth levels
+    # deep and within crawl_requests requests
+    'crawl_depth': 2,
+    'crawl_requests': 100,
+    'crawl_timeframe': 'now 7-d',
+    'crawl_max_keywords': 200,
+    
+    # `main.py history`: rebuild this many years of daily history from overlapping
+    # daily windows (see history_builder.py), keywords per payload
+    'history_years': 5,
+    'history_batch_size': 1,
+    
+    # `main.py watch`: poll now 1-H, now 4-H and now 1-d for a hot subset of
+    # keywords (defaults to the first five) and alert on spikes (see realtime_watch.py)
+    'watch_keywords': None,
+    'watch_requests_per_hour': 600,
+    'watch_threshold': 4.0,
+    'watch_batch_size': 1,
+    'watch_webhook': None,
+    
+    # Fetch related queries for the reports and keep them in a query graph
+    # under output_dir (see query_graph.py)
+    'related_queries': True,
+    
+    # Only fetch the days missing from the stored history on each run
+    # (regional scores then cover the short recent window)
+    'incremental': False,
+    
     # Email configuration (optional)
     'email_config': {
         'sender_email': 'your_email@example.com',
@@ -32,4 +94,41 @@ CONFIG = {
         'level': 'INFO',
         'file': 'trends_tracker.log'
     }
-}
\ No newline at end of file
+}
+
+# Directory where Excel reports are written
+OUTPUT_DIR = CONFIG['output_dir']
+
+# Run metrics (run_metrics.json and run_metrics.prom) are written here after each run;
+# point a Prometheus node_exporter textfile collector at it to scrape them.
+# Set TRENDS_METRICS=0 to turn instrumentation off.
+METRICS_DIR = os.environ.get('METRICS_DIR', OUTPUT_DIR)
+
+# Report types, from the shortest period to the longest
+REPORT_TYPES = ['daily', 'weekly', 'monthly']
+
+# Report schedule (local time, HH:MM); matches the cron entries in the Dockerfile
+DAILY_REPORT_TIME = '08:00'
+WEEKLY_REPORT_DAY = 'monday'
+WEEKLY_REPORT_TIME = '09:00'
+MONTHLY_REPORT_DAY = 1
+MONTHLY_REPORT_TIME = '10:00'
+
+# Scheduler: report jobs run at once, and how long fetched data is reused
+# by report types that fire close together
+SCHEDULER_MAX_WORKERS = 2
+SCHEDULER_SHARE_MINUTES = 30
+
+# Email settings; environment variables (e.g. from .env) override email_config
+EMAIL_SENDER = os.environ.get('EMAIL_SENDER', CONFIG['email_config']['sender_email'])
+EMAIL_PASSWORD = os.environ.get('EMAIL_PASSWORD', CONFIG['email_config']['sender_password'])
+EMAIL_RECIPIENT = os.environ.get('EMAIL_RECIPIENT', ', '.join(CONFIG['email_config']['recipient_emails']))
+SMTP_SERVER = os.environ.get('SMTP_SERVER', CONFIG['email_config']['smtp_server'])
+SMTP_PORT = int(os.environ.get('SMTP_PORT', CONFIG['email_config']['smtp_port']))
+SMTP_USE_TLS = os.environ.get('SMTP_USE_TLS', 'true').lower() not in ('0', 'false', 'no')
+
+# Reports larger than this are zipped ('zip'), linked ('link') or attached anyway ('attach');
+# links point at REPORT_BASE_URL, where the report directory is served
+EMAIL_ATTACHMENT_LIMIT_MB = float(os.environ.get('EMAIL_ATTACHMENT_LIMIT_MB', 10))
+EMAIL_ATTACHMENT_MODE = os.environ.get('EMAIL_ATTACHMENT_MODE', 'zip')
+REPORT_BASE_URL = os.environ.get('REPORT_BASE_URL', '')
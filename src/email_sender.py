@@ -1,80 +1,466 @@
 import os
+import io
+import time
+import heapq
+import itertools
 import smtplib
+import zipfile
+import threading
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.mime.application import MIMEApplication
+from email.utils import formatdate, make_msgid
 from datetime import datetime
 import logging
-from config import EMAIL_SENDER, EMAIL_PASSWORD, EMAIL_RECIPIENT, SMTP_SERVER, SMTP_PORT
+from html import escape
+from config import (
+    EMAIL_SENDER, EMAIL_PASSWORD, EMAIL_RECIPIENT, SMTP_SERVER, SMTP_PORT, SMTP_USE_TLS,
+    EMAIL_ATTACHMENT_LIMIT_MB, EMAIL_ATTACHMENT_MODE, REPORT_BASE_URL
+)
+from instrumentation import metrics
+
+# How reports above the attachment limit are delivered
+ATTACHMENT_MODES = ('zip', 'link', 'attach')
+
+# Seconds a pooled connection may sit idle before it is checked with NOOP
+IDLE_CHECK_SECONDS = 60
+
+# SMTP errors always worth retrying: the server went away or could not be reached
+RETRYABLE_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)
+
+
+def is_retryable(error):
+    """
+    Whether a failed delivery may succeed later.
+
+    Disconnects, connection errors and transient 4xx replies are worth
+    another attempt; permanent 5xx replies (rejected sender or recipients,
+    failed login) fail right away.
+
+    Args:
+        error (Exception): Error raised by the delivery
+
+    Returns:
+        bool: True if the delivery should be retried
+    """
+    if isinstance(error, RETRYABLE_ERRORS):
+        return True
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return bool(error.recipients) and all(code < 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code < 500
+    # SMTPException derives from OSError; only socket errors and timeouts are transient
+    return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+
+
+def parse_recipients(recipients):
+    """
+    Normalize recipients to a list of addresses.
+
+    Args:
+        recipients (str or list): Comma or semicolon separated string, or a list
+
+    Returns:
+        list: Addresses, without blanks or duplicates
+    """
+    if isinstance(recipients, str):
+        recipients = recipients.replace(';', ',').split(',')
+    return list(dict.fromkeys(address.strip() for address in recipients or [] if address and address.strip()))
+
 
 class EmailSender:
-    def __init__(self):
-        self.sender = EMAIL_SENDER
-        self.password = EMAIL_PASSWORD
-        self.recipient = EMAIL_RECIPIENT
-        self.smtp_server = SMTP_SERVER
-        self.smtp_port = SMTP_PORT
+    def __init__(self, sender=None, password=None, recipients=None, smtp_server=None, smtp_port=None,
+                 use_tls=None, attachment_limit_mb=None, attachment_mode=None, link_base_url=None,
+                 max_retries=3, retry_delay=30.0, timeout=60.0):
+        """
+        Deliver reports over one pooled, authenticated SMTP connection.
+
+        The connection (with STARTTLS and login) is opened on first use and
+        reused for every later message until close(). Each message is built
+        once and sent to all recipients in a single transaction. Reports above
+        the attachment limit are zipped or replaced by a link. send_report_async
+        hands messages to a background thread that retries failed deliveries.
+
+        Args:
+            sender (str): From address (defaults to EMAIL_SENDER)
+            password (str): SMTP password; login is skipped when empty
+            recipients (str or list): Recipient addresses (defaults to EMAIL_RECIPIENT)
+            smtp_server (str): SMTP host (defaults to SMTP_SERVER)
+            smtp_port (int): SMTP port (defaults to SMTP_PORT)
+            use_tls (bool): Whether to STARTTLS (defaults to SMTP_USE_TLS)
+            attachment_limit_mb (float): Attachment size above which attachment_mode applies
+            attachment_mode (str): 'zip', 'link' or 'attach' for reports above the limit
+            link_base_url (str): URL the report directory is served under, for links
+            max_retries (int): Delivery attempts after the first one, in the background
+            retry_delay (float): Seconds before the first background retry (doubles each time)
+            timeout (float): Socket timeout in seconds
+        """
+        self.sender = sender if sender is not None else EMAIL_SENDER
+        self.password = password if password is not None else EMAIL_PASSWORD
+        self.recipients = parse_recipients(recipients if recipients is not None else EMAIL_RECIPIENT)
+        self.smtp_server = smtp_server or SMTP_SERVER
+        self.smtp_port = smtp_port or SMTP_PORT
+        self.use_tls = SMTP_USE_TLS if use_tls is None else use_tls
+        limit_mb = EMAIL_ATTACHMENT_LIMIT_MB if attachment_limit_mb is None else attachment_limit_mb
+        self.attachment_limit = int(limit_mb * 1024 * 1024)
+        self.attachment_mode = attachment_mode or EMAIL_ATTACHMENT_MODE
+        if self.attachment_mode not in ATTACHMENT_MODES:
+            raise ValueError(f"attachment_mode must be one of {ATTACHMENT_MODES}, got {self.attachment_mode!r}")
+        self.link_base_url = link_base_url if link_base_url is not None else REPORT_BASE_URL
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.timeout = timeout
         self.logger = logging.getLogger(__name__)
-    
-    def send_report(self, report_path, report_type="daily"):
+
+        self._server = None
+        self._last_used = 0.0
+        self._lock = threading.Lock()
+
+        # Background delivery: messages ordered by the time they may be sent
+        self._outbox = []
+        self._sequence = itertools.count()
+        self._in_flight = 0
+        self._stopping = False
+        self._cond = threading.Condition()
+        self._worker = None
+        self.failed = []
+
+    @property
+    def recipient(self):
+        """
+        Recipients as a single header value.
+        """
+        return ', '.join(self.recipients)
+
+    def _connect(self):
+        server = smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=self.timeout)
+        try:
+            server.ehlo()
+            if self.use_tls:
+                server.starttls()  # Secure the connection
+                server.ehlo()
+            if self.password:
+                server.login(self.sender, self.password)
+        except Exception:
+            server.close()
+            raise
+        return server
+
+    def _connection(self):
+        """
+        Return the pooled connection, reconnecting if it went away.
+        """
+        if self._server is not None and time.monotonic() - self._last_used > IDLE_CHECK_SECONDS:
+            try:
+                if self._server.noop()[0] != 250:
+                    raise smtplib.SMTPServerDisconnected("NOOP failed")
+            except (smtplib.SMTPException, OSError):
+                self._drop_connection()
+
+        if self._server is None:
+            self._server = self._connect()
+        return self._server
+
+    def _drop_connection(self):
+        if self._server is not None:
+            try:
+                self._server.close()
+            except OSError:
+                pass
+            self._server = None
+
+    def close(self):
+        """
+        Stop the background sender and close the pooled connection.
+        """
+        self.stop()
+        with self._lock:
+            if self._server is not None:
+                try:
+                    self._server.quit()
+                except (smtplib.SMTPException, OSError):
+                    pass
+                self._drop_connection()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _attachment(self, report_path):
+        """
+        Build the attachment part of a report, or a link when it is too large.
+
+        Returns:
+            tuple: (MIME part or None, HTML note for the body)
+        """
+        size = os.path.getsize(report_path)
+        filename = os.path.basename(report_path)
+        mode = self.attachment_mode if size > self.attachment_limit else 'attach'
+
+        if mode == 'zip':
+            buffer = io.BytesIO()
+            with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+                archive.write(report_path, arcname=filename)
+            if buffer.tell() <= self.attachment_limit or not self.link_base_url:
+                part = MIMEApplication(buffer.getvalue(), _subtype='zip')
+                part.add_header('Content-Disposition', 'attachment', filename=f"{filename}.zip")
+                return part, "<p>The report is attached as a zip archive.</p>"
+            mode = 'link'
+
+        if mode == 'link' and self.link_base_url:
+            url = f"{self.link_base_url.rstrip('/')}/{filename}"
+            return None, f'<p>The report is too large to attach. Download it from <a href="{escape(url)}">{escape(filename)}</a>.</p>'
+
+        with open(report_path, 'rb') as f:
+            part = MIMEApplication(f.read(), _subtype='xlsx')
+        part.add_header('Content-Disposition', 'attachment', filename=filename)
+        return part, ""
+
+    def build_message(self, report_path, report_type="daily", breakouts=None):
+        """
+        Build the report email once, for every recipient.
+
+        Args:
+            report_path (str): Path to the Excel report file
+            report_type (str): Type of report (daily, weekly, monthly)
+            breakouts (DataFrame): Optional ranked breakout terms to list in the body
+
+        Returns:
+            MIMEMultipart: The message
+        """
+        attachment, attachment_note = self._attachment(report_path)
+
+        # Create message
+        msg = MIMEMultipart()
+        msg['From'] = self.sender
+        msg['To'] = self.recipient
+        msg['Subject'] = f"Google Trends {report_type.capitalize()} Report - {datetime.now().strftime('%Y-%m-%d')}"
+        msg['Date'] = formatdate(localtime=True)
+        msg['Message-ID'] = make_msgid()
+
+        # Add body text
+        body = f"""
+        <html>
+        <body>
+            <h2>Google Trends Report</h2>
+            <p>Please find attached the {report_type} Google Trends report.</p>
+            <p>This report includes:</p>
+            <ul>
+                <li>Top trending searches for the past day, week, and month</li>
+                <li>Stock market and trading related search trends</li>
+                <li>Related queries and rising search terms</li>
+            </ul>
+            {self._breakouts_html(breakouts)}
+            {attachment_note}
+            <p>This report was automatically generated on {datetime.now().strftime('%Y-%m-%d at %H:%M:%S')}.</p>
+            <p>Regards,<br>Google Trends Tracker</p>
+        </body>
+        </html>
+        """
+        msg.attach(MIMEText(body, 'html'))
+
+        # Attach the report
+        if attachment is not None:
+            msg.attach(attachment)
+
+        return msg
+
+    def deliver(self, msg, recipients=None):
+        """
+        Send a built message over the pooled connection.
+
+        A connection that dropped since its last use is reopened once before
+        the error is raised.
+
+        Args:
+            msg (MIMEMultipart): Message from build_message
+            recipients (list): Addresses (defaults to self.recipients)
+        """
+        recipients = recipients or self.recipients
+        with self._lock, metrics.span('email_send'):
+            for attempt in range(2):
+                try:
+                    self._connection().send_message(msg, from_addr=self.sender, to_addrs=recipients)
+                    self._last_used = time.monotonic()
+                    break
+                except (smtplib.SMTPServerDisconnected, ConnectionError):
+                    self._drop_connection()
+                    metrics.increment('smtp_reconnects')
+                    if attempt:
+                        raise
+
+        metrics.increment('emails_sent')
+        # Encoded size of the parts, without serializing the message again
+        metrics.increment('email_bytes', sum(len(part.get_payload()) for part in msg.walk() if not part.is_multipart()))
+
+    def send_report(self, report_path, report_type="daily", breakouts=None):
         """
         Send the Excel report via email.
-        
+
         Args:
             report_path (str): Path to the Excel report file
             report_type (str): Type of report (daily, weekly, monthly)
-            
+            breakouts (DataFrame): Optional ranked breakout terms to list in the body
+
         Returns:
             bool: True if email was sent successfully, False otherwise
         """
         try:
             self.logger.info(f"Sending {report_type} report email")
-            
+
             # Check if credentials are available
-            if not all([self.sender, self.password, self.recipient]):
-                self.logger.error("Email credentials missing. Check your .env file.")
+            if not self.sender or not self.recipients:
+                self.logger.error("Email sender or recipients missing. Check your .env file.")
                 return False
-            
-            # Create message
-            msg = MIMEMultipart()
-            msg['From'] = self.sender
-            msg['To'] = self.recipient
-            msg['Subject'] = f"Google Trends {report_type.capitalize()} Report - {datetime.now().strftime('%Y-%m-%d')}"
-            
-            # Add body text
-            body = f"""
-            <html>
-            <body>
-                <h2>Google Trends Report</h2>
-                <p>Please find attached the {report_type} Google Trends report.</p>
-                <p>This report includes:</p>
-                <ul>
-                    <li>Top trending searches for the past day, week, and month</li>
-                    <li>Stock market and trading related search trends</li>
-                    <li>Related queries and rising search terms</li>
-                </ul>
-                <p>This report was automatically generated on {datetime.now().strftime('%Y-%m-%d at %H:%M:%S')}.</p>
-                <p>Regards,<br>Google Trends Tracker</p>
-            </body>
-            </html>
-            """
-            msg.attach(MIMEText(body, 'html'))
-            
-            # Attach the report
-            with open(report_path, 'rb') as f:
-                attachment = MIMEApplication(f.read(), _subtype='xlsx')
-                attachment.add_header('Content-Disposition', 'attachment', filename=os.path.basename(report_path))
-                msg.attach(attachment)
-            
-            # Connect to SMTP server and send email
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                server.starttls()  # Secure the connection
-                server.login(self.sender, self.password)
-                server.send_message(msg)
-            
+
+            self.deliver(self.build_message(report_path, report_type, breakouts))
+
             self.logger.info(f"Email sent successfully to {self.recipient}")
             return True
-        
+
         except Exception as e:
+            metrics.increment('email_failures')
             self.logger.error(f"Error sending email: {str(e)}")
             return False
+
+    def send_report_async(self, report_path, report_type="daily", breakouts=None):
+        """
+        Queue the report for background delivery and return immediately.
+
+        The message is built right away, so the report file may be moved or
+        removed afterwards. Deliveries that fail transiently (see is_retryable)
+        are retried with exponential backoff; messages rejected permanently or
+        out of attempts end up in self.failed.
+
+        Args:
+            report_path (str): Path to the Excel report file
+            report_type (str): Type of report (daily, weekly, monthly)
+            breakouts (DataFrame): Optional ranked breakout terms to list in the body
+
+        Returns:
+            bool: True if the message was queued, False otherwise
+        """
+        try:
+            if not self.sender or not self.recipients:
+                self.logger.error("Email sender or recipients missing. Check your .env file.")
+                return False
+
+            msg = self.build_message(report_path, report_type, breakouts)
+        except Exception as e:
+            self.logger.error(f"Error building {report_type} report email: {str(e)}")
+            return False
+
+        self.start()
+        self._enqueue(msg, 0, time.monotonic())
+        self.logger.info(f"Queued {report_type} report email to {self.recipient}")
+        return True
+
+    @property
+    def pending(self):
+        """
+        Messages queued or being delivered in the background.
+        """
+        with self._cond:
+            return len(self._outbox) + self._in_flight
+
+    def _enqueue(self, msg, attempt, not_before):
+        with self._cond:
+            heapq.heappush(self._outbox, (not_before, next(self._sequence), msg, attempt))
+            self._cond.notify_all()
+
+    def start(self):
+        """
+        Start the background sender thread if it is not running.
+        """
+        with self._cond:
+            if self._worker is None or not self._worker.is_alive():
+                self._stopping = False
+                self._worker = threading.Thread(target=self._run_worker, name='email-sender', daemon=True)
+                self._worker.start()
+
+    def stop(self, wait=True):
+        """
+        Stop the background sender.
+
+        Args:
+            wait (bool): First deliver everything queued, including pending retries
+        """
+        with self._cond:
+            worker = self._worker
+            if worker is None:
+                return
+            if wait:
+                while self._outbox or self._in_flight:
+                    self._cond.wait()
+            self._stopping = True
+            self._cond.notify_all()
+        worker.join()
+        self._worker = None
+
+    def _next_message(self):
+        """
+        Wait for the next message that is due, or None when stopping.
+        """
+        with self._cond:
+            while True:
+                if self._stopping:
+                    return None
+                timeout = None
+                if self._outbox:
+                    timeout = self._outbox[0][0] - time.monotonic()
+                    if timeout <= 0:
+                        _, _, msg, attempt = heapq.heappop(self._outbox)
+                        self._in_flight += 1
+                        return msg, attempt
+                self._cond.wait(timeout)
+
+    def _run_worker(self):
+        while True:
+            item = self._next_message()
+            if item is None:
+                return
+
+            msg, attempt = item
+            try:
+                self.deliver(msg)
+                self.logger.info(f"Email '{msg['Subject']}' sent to {self.recipient}")
+            except Exception as e:
+                if is_retryable(e) and attempt < self.max_retries:
+                    delay = self.retry_delay * (2 ** attempt)
+                    metrics.increment('email_retries')
+                    self.logger.warning(f"Email '{msg['Subject']}' failed ({str(e)}); retrying in {delay:.0f}s")
+                    self._enqueue(msg, attempt + 1, time.monotonic() + delay)
+                else:
+                    if is_retryable(e):
+                        self.logger.error(f"Giving up on email '{msg['Subject']}': {str(e)}")
+                    else:
+                        self.logger.error(f"Error sending email '{msg['Subject']}': {str(e)}")
+                    metrics.increment('email_failures')
+                    self.failed.append((msg, str(e)))
+            finally:
+                with self._cond:
+                    self._in_flight -= 1
+                    self._cond.notify_all()
+
+    def _breakouts_html(self, breakouts, limit=10):
+        """
+        Render the top breakout terms as an HTML list.
+
+        Args:
+            breakouts (DataFrame): Ranked breakouts with term, date, value and score columns
+            limit (int): Maximum number of terms to list
+
+        Returns:
+            str: HTML fragment, empty if there are no breakouts
+        """
+        if breakouts is None or breakouts.empty:
+            return ""
+
+        top = breakouts.head(limit)
+        items = "".join(
+            f"<li><b>{escape(str(term))}</b>: interest {value:g} on {date:%Y-%m-%d} ({score:.1f} sigma above normal)</li>"
+            for term, date, value, score in zip(top['term'], top['date'], top['value'], top['score'])
+        )
+        return f"<p>Breakout terms:</p><ul>{items}</ul>"
@@ -1,36 +1,59 @@
 import os
+import time
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 from datetime import datetime
 import logging
 from config import OUTPUT_DIR
+from trend_analytics import summarize_trends
+from instrumentation import metrics
+
+# Reports with more data rows than this are written in constant memory mode
+# unless streaming is set explicitly
+STREAMING_ROW_THRESHOLD = 50000
+
+# Rows converted from the column arrays to Python values at a time
+WRITE_CHUNK_ROWS = 1024
 
 class ExcelReportGenerator:
-    def __init__(self):
+    def __init__(self, output_dir=None):
         self.logger = logging.getLogger(__name__)
+        self.output_dir = output_dir or OUTPUT_DIR
     
-    def create_report(self, data, include_charts=True):
+    def create_report(self, data, include_charts=True, streaming=None):
         """
         Create Excel report from Google Trends data.
         
+        Every sheet is written top to bottom, a chunk of rows at a time,
+        straight from the column arrays. With streaming enabled the workbook
+        uses xlsxwriter's constant_memory mode, which flushes each row to disk
+        as soon as the next one starts, so memory stays flat however many
+        keywords there are.
+        
         Args:
             data (dict): Dictionary containing all Google Trends data
             include_charts (bool): Whether to include charts in the report
+            streaming (bool): Whether to write the workbook in constant memory mode
+                (None streams reports of more than STREAMING_ROW_THRESHOLD rows)
             
         Returns:
             str: Path to the created Excel file
         """
+        started = time.perf_counter()
         try:
             self.logger.info("Creating Excel report")
             
+            if streaming is None:
+                streaming = self._row_count(data) > STREAMING_ROW_THRESHOLD
+            
             # Create timestamp for filename
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"google_trends_report_{timestamp}.xlsx"
-            file_path = os.path.join(OUTPUT_DIR, filename)
+            report_type = data.get('report_type')
+            filename = f"google_trends_{report_type}_report_{timestamp}.xlsx" if report_type else f"google_trends_report_{timestamp}.xlsx"
+            file_path = os.path.join(self.output_dir, filename)
             
             # Create Excel writer
-            with pd.ExcelWriter(file_path, engine='xlsxwriter') as writer:
+            options = {'constant_memory': streaming, 'nan_inf_to_errors': True}
+            with pd.ExcelWriter(file_path, engine='xlsxwriter', engine_kwargs={'options': options}) as writer:
                 workbook = writer.book
                 
                 # Add title format
@@ -66,18 +89,69 @@ class ExcelReportGenerator:
                 self._create_trending_searches_sheets(writer, data, title_format, header_format)
                 
                 # Create stock market trends sheets
-                self._create_stock_trends_sheets(writer, data, title_format, header_format, include_charts)
+                self._create_stock_trends_sheets(writer, data, title_format, header_format, date_format, include_charts)
                 
                 # Create related queries sheets
                 self._create_related_queries_sheets(writer, data, title_format, header_format)
             
+            metrics.observe('excel_report', time.perf_counter() - started, report_type=report_type or 'report')
+            metrics.increment('bytes_written', os.path.getsize(file_path), kind='excel')
+            
             self.logger.info(f"Excel report created at {file_path}")
             return file_path
         
         except Exception as e:
+            metrics.increment('excel_failures')
             self.logger.error(f"Error creating Excel report: {str(e)}")
             return None
     
+    def _row_count(self, data):
+        """
+        Number of data rows the report sheets will hold.
+        """
+        rows = 0
+        for section in ('trending_searches', 'stock_trends'):
+            rows += sum(len(frame) for frame in data.get(section, {}).values() if isinstance(frame, pd.DataFrame))
+        for queries_by_keyword in data.get('related_queries', {}).values():
+            for queries in queries_by_keyword.values():
+                rows += sum(len(frame) for frame in (queries or {}).values() if isinstance(frame, pd.DataFrame))
+        return rows
+    
+    def _write_rows(self, worksheet, first_row, columns, column_formats=None):
+        """
+        Write column arrays to consecutive rows, top to bottom.
+        
+        Only WRITE_CHUNK_ROWS rows at a time are turned into Python values, so
+        writing does not copy whole columns into lists first. NaN is written
+        as a blank cell, as to_excel does.
+        
+        Args:
+            worksheet: xlsxwriter worksheet
+            first_row (int): Zero-based row of the first value
+            columns (list): One array (NumPy array, Index or list) of cell values per column
+            column_formats (list): Optional cell format per column
+            
+        Returns:
+            int: Row index after the last written row
+        """
+        row = first_row
+        size = min((len(values) for values in columns), default=0)
+        for start in range(0, size, WRITE_CHUNK_ROWS):
+            chunk = [values[start:start + WRITE_CHUNK_ROWS] for values in columns]
+            chunk = [values.tolist() if hasattr(values, 'tolist') else values for values in chunk]
+            chunk = [[None if isinstance(value, float) and value != value else value for value in values]
+                     for values in chunk]
+            if column_formats is None:
+                for values in zip(*chunk):
+                    worksheet.write_row(row, 0, values)
+                    row += 1
+            else:
+                for values in zip(*chunk):
+                    for col, (value, cell_format) in enumerate(zip(values, column_formats)):
+                        worksheet.write(row, col, value, cell_format)
+                    row += 1
+        return row
+    
     def _create_summary_sheet(self, writer, data, title_format, header_format):
         """
         Create summary sheet with key findings.
@@ -113,18 +187,26 @@ class ExcelReportGenerator:
             if 'stock_trends' in data and 'daily' in data['stock_trends']:
                 stock_trends = data['stock_trends']['daily']
                 if not stock_trends.empty and len(stock_trends.columns) > 0:
-                    # Get the latest date
-                    latest_date = stock_trends.index[-1]
-                    # Get values for the latest date
-                    latest_values = stock_trends.loc[latest_date]
-                    # Sort by value descending
-                    sorted_terms = latest_values.sort_values(ascending=False)
+                    # Metrics for every term at once, ranked by the latest value
+                    summary = summarize_trends(stock_trends).sort_values('latest', ascending=False, kind='stable')
                     
-                    for i, (term, value) in enumerate(sorted_terms.items()):
-                        if i < 5:  # Top 5
-                            worksheet.write(f'A{row}', term)
-                            worksheet.write(f'B{row}', f"Interest score: {value}")
-                            row += 1
+                    top = summary.head(5)
+                    for term, latest, peak, momentum in zip(top.index, top['latest'], top['peak'], top['momentum']):
+                        worksheet.write(f'A{row}', term)
+                        worksheet.write(f'B{row}', f"Interest score: {latest:g} (peak {peak:g}, momentum {momentum:+.1f})")
+                        row += 1
+            
+            # Add breakout terms found by the anomaly detector
+            breakouts = data.get('breakouts')
+            if isinstance(breakouts, pd.DataFrame) and not breakouts.empty:
+                row += 2
+                worksheet.merge_range(f'A{row}:B{row}', 'Breakout Terms', header_format)
+                row += 1
+                
+                for term, date, value, score in zip(breakouts['term'], breakouts['date'], breakouts['value'], breakouts['score']):
+                    worksheet.write(f'A{row}', term)
+                    worksheet.write(f'B{row}', f"Interest {value:g} on {pd.Timestamp(date):%Y-%m-%d} ({score:.1f} sigma above normal)")
+                    row += 1
             
             # Add insights
             row += 2
@@ -157,15 +239,8 @@ class ExcelReportGenerator:
                     trending_df = data['trending_searches'][period]
                     
                     if not trending_df.empty:
-                        # Write to Excel
                         sheet_name = f"{period.capitalize()} Trends"
-                        trending_df.to_excel(writer, sheet_name=sheet_name, index=False, startrow=1)
-                        
-                        # Get the xlsxwriter worksheet object
-                        worksheet = writer.sheets[sheet_name]
-                        
-                        # Add title
-                        worksheet.merge_range('A1:D1', f"{period.capitalize()} Trending Searches", title_format)
+                        worksheet = writer.book.add_worksheet(sheet_name)
                         
                         # Make the columns wider for better visibility
                         worksheet.set_column('A:A', 10)  # Rank
@@ -173,14 +248,17 @@ class ExcelReportGenerator:
                         worksheet.set_column('C:C', 15)  # Period
                         worksheet.set_column('D:D', 15)  # Date
                         
-                        # Format the header row
-                        for col_num, value in enumerate(trending_df.columns.values):
-                            worksheet.write(1, col_num, value, header_format)
+                        # Add title
+                        worksheet.merge_range('A1:D1', f"{period.capitalize()} Trending Searches", title_format)
+                        
+                        # Write the header row, then the data
+                        worksheet.write_row(1, 0, [str(value) for value in trending_df.columns], header_format)
+                        self._write_rows(worksheet, 2, [trending_df[column].to_numpy() for column in trending_df.columns])
         
         except Exception as e:
             self.logger.error(f"Error creating trending searches sheets: {str(e)}")
     
-    def _create_stock_trends_sheets(self, writer, data, title_format, header_format, include_charts):
+    def _create_stock_trends_sheets(self, writer, data, title_format, header_format, date_format, include_charts):
         """
         Create sheets for stock market trends.
         """
@@ -190,25 +268,22 @@ class ExcelReportGenerator:
                     stock_df = data['stock_trends'][period]
                     
                     if not stock_df.empty and len(stock_df.columns) > 0:
-                        # Write to Excel
                         sheet_name = f"Stock Trends {period.capitalize()}"
-                        stock_df.to_excel(writer, sheet_name=sheet_name, startrow=1)
+                        worksheet = writer.book.add_worksheet(sheet_name)
                         
-                        # Get the xlsxwriter worksheet object
-                        worksheet = writer.sheets[sheet_name]
+                        # Make the columns wider for better visibility
+                        worksheet.set_column(0, 0, 20)  # Date index
+                        worksheet.set_column(1, len(stock_df.columns), 15)  # Other columns
                         
                         # Add title
-                        worksheet.merge_range(f'A1:{chr(65+len(stock_df.columns))}1', f"Stock Market Search Trends - {period.capitalize()}", title_format)
+                        worksheet.merge_range(0, 0, 0, len(stock_df.columns), f"Stock Market Search Trends - {period.capitalize()}", title_format)
                         
-                        # Make the columns wider for better visibility
-                        worksheet.set_column('A:A', 20)  # Date index
-                        for i in range(len(stock_df.columns)):
-                            worksheet.set_column(f'{chr(66+i)}:{chr(66+i)}', 15)  # Other columns
-                        
-                        # Format the header row
+                        # Write the header row, then the data with the date index first
                         worksheet.write(1, 0, 'Date', header_format)
-                        for col_num, value in enumerate(stock_df.columns.values):
-                            worksheet.write(1, col_num+1, value, header_format)
+                        worksheet.write_row(1, 1, [str(value) for value in stock_df.columns], header_format)
+                        columns = [stock_df.index] + [stock_df[column].to_numpy() for column in stock_df.columns]
+                        formats = [date_format] + [None] * len(stock_df.columns)
+                        self._write_rows(worksheet, 2, columns, formats)
                         
                         # Add chart if requested
                         if include_charts and len(stock_df) > 1:
@@ -272,21 +347,12 @@ class ExcelReportGenerator:
                     worksheet.set_column('C:C', 15)  # Value
                     
                     # Add headers
-                    row = 3
                     worksheet.write('A2', 'Keyword', header_format)
                     worksheet.write('B2', 'Related Query', header_format)
                     worksheet.write('C2', 'Value', header_format)
                     
                     # Add data
-                    for keyword, queries in related_queries[period].items():
-                        # Add top queries
-                        top_df = queries['top']
-                        if isinstance(top_df, pd.DataFrame) and not top_df.empty:
-                            for i, (_, query_row) in enumerate(top_df.iterrows()):
-                                worksheet.write(f'A{row}', keyword)
-                                worksheet.write(f'B{row}', query_row['query'])
-                                worksheet.write(f'C{row}', query_row['value'])
-                                row += 1
+                    self._write_related_queries(worksheet, 2, related_queries[period], 'top')
                     
                     # Create a sheet with all rising related queries
                     sheet_name = f"Rising Queries {period.capitalize()}"
@@ -301,21 +367,35 @@ class ExcelReportGenerator:
                     worksheet.set_column('C:C', 15)  # Value
                     
                     # Add headers
-                    row = 3
                     worksheet.write('A2', 'Keyword', header_format)
                     worksheet.write('B2', 'Rising Query', header_format)
                     worksheet.write('C2', 'Value', header_format)
                     
                     # Add data
-                    for keyword, queries in related_queries[period].items():
-                        # Add rising queries
-                        rising_df = queries['rising']
-                        if isinstance(rising_df, pd.DataFrame) and not rising_df.empty:
-                            for i, (_, query_row) in enumerate(rising_df.iterrows()):
-                                worksheet.write(f'A{row}', keyword)
-                                worksheet.write(f'B{row}', query_row['query'])
-                                worksheet.write(f'C{row}', query_row['value'])
-                                row += 1
+                    self._write_related_queries(worksheet, 2, related_queries[period], 'rising')
         
         except Exception as e:
             self.logger.error(f"Error creating related queries sheets: {str(e)}")
+    
+    def _write_related_queries(self, worksheet, first_row, queries_by_keyword, kind):
+        """
+        Write the top or rising related queries of every keyword.
+        
+        Args:
+            worksheet: xlsxwriter worksheet
+            first_row (int): Zero-based row of the first query
+            queries_by_keyword (dict): Keyword to {'top': DataFrame, 'rising': DataFrame}
+            kind (str): 'top' or 'rising'
+            
+        Returns:
+            int: Row index after the last written row
+        """
+        row = first_row
+        for keyword, queries in queries_by_keyword.items():
+            queries_df = queries.get(kind)
+            if isinstance(queries_df, pd.DataFrame) and not queries_df.empty:
+                row = self._write_rows(
+                    worksheet, row,
+                    [[keyword] * len(queries_df), queries_df['query'].to_numpy(), queries_df['value'].to_numpy()]
+                )
+        return row
@@ -0,0 +1,250 @@
+import os
+import calendar
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set
+
+import pandas as pd
+
+from config import REPORT_TYPES
+from trend_analytics import stack_time_series
+from advanced_trends_fetcher import write_summary_report, write_breakouts
+from query_graph import QUERY_GRAPH_FILENAME, QueryGraph, update_query_graph
+
+# Google Trends timeframe fetched for each report period
+PERIOD_TIMEFRAMES = {
+    'daily': 'now 1-d',
+    'weekly': 'now 7-d',
+    'monthly': 'today 1-m',
+}
+
+# Periods covered by each report type
+REPORT_PERIODS = {
+    'daily': ['daily'],
+    'weekly': ['daily', 'weekly'],
+    'monthly': ['daily', 'weekly', 'monthly'],
+}
+
+# Rising queries first seen since the previous day, written next to the reports
+NEW_RISING_QUERIES_FILENAME = 'new_rising_queries.csv'
+
+
+class FetchRequest(NamedTuple):
+    """
+    One unit of data a report needs from Google Trends
+    """
+    endpoint: str
+    keyword: Optional[str]
+    geo: str
+    timeframe: str
+
+
+def report_requests(report_type: str,
+                    keywords: List[str],
+                    regions: List[str],
+                    history_timeframe: str,
+                    related_queries: bool = True) -> Set[FetchRequest]:
+    """
+    Requests behind one report
+
+    :param report_type: 'daily', 'weekly' or 'monthly'
+    :param keywords: Tracked keywords
+    :param regions: Regions whose trending searches are listed
+    :param history_timeframe: Daily-resolution timeframe of the summary and breakouts
+    :param related_queries: Whether the report lists related queries for its periods
+    :return: Set of requests
+    """
+    requests = {FetchRequest('trending_searches', None, region, 'now 1-d') for region in regions}
+
+    period_timeframes = [PERIOD_TIMEFRAMES[period] for period in REPORT_PERIODS[report_type]]
+    for timeframe in period_timeframes + [history_timeframe]:
+        for keyword in keywords:
+            requests.add(FetchRequest('interest_over_time', keyword, '', timeframe))
+            requests.add(FetchRequest('interest_by_region', keyword, '', timeframe))
+
+    if related_queries:
+        for timeframe in period_timeframes:
+            for keyword in keywords:
+                requests.add(FetchRequest('related_queries', keyword, '', timeframe))
+    return requests
+
+
+class FetchPlan:
+    def __init__(self,
+                 report_types: Iterable[str],
+                 keywords: List[str],
+                 regions: List[str],
+                 history_timeframe: str = 'today 3-m',
+                 batch_size: int = 1,
+                 anchor_keyword: str = None,
+                 incremental: bool = False,
+                 related_queries: bool = True):
+        """
+        One shared fetch for several reports
+
+        Every report is expanded into (endpoint, keyword, geo, timeframe)
+        requests. The plan fetches the union of those requests once, grouped
+        by timeframe so keywords still share payloads, and then hands each
+        report the part of the results it asked for.
+
+        The daily related queries are also added to the query graph kept in
+        the fetcher's output directory, and the rising queries it had not
+        seen before yesterday are written to new_rising_queries.csv.
+
+        :param report_types: Reports to plan for ('daily', 'weekly', 'monthly')
+        :param keywords: Tracked keywords
+        :param regions: Regions whose trending searches are listed
+        :param history_timeframe: Daily-resolution timeframe of the summary and breakouts
+        :param batch_size: Number of keywords per payload (1 disables batching)
+        :param anchor_keyword: Keyword shared by every batch when batching
+        :param incremental: Only fetch the part of the history missing from the store
+        :param related_queries: Fetch the related queries listed in the reports
+        """
+        self.report_types = list(dict.fromkeys(report_types))
+        self.keywords = list(keywords)
+        self.regions = list(regions)
+        self.history_timeframe = history_timeframe
+        self.batch_size = batch_size
+        self.anchor_keyword = anchor_keyword
+        self.incremental = incremental
+        self.fetch_related = related_queries
+
+        self.reports = {
+            report_type: report_requests(report_type, self.keywords, self.regions, history_timeframe, related_queries)
+            for report_type in self.report_types
+        }
+        self.requests: Set[FetchRequest] = set().union(*self.reports.values())
+
+        # Results, filled in by execute()
+        self.fetched_at: Optional[datetime] = None
+        self.trending_searches = pd.DataFrame()
+        self.insights: Dict[str, Dict[str, Any]] = {}
+        self.summary = pd.DataFrame()
+        self.breakouts = pd.DataFrame()
+        self.related_queries: Dict[str, Dict[str, Dict[str, pd.DataFrame]]] = {}
+        self.query_graph: Optional[QueryGraph] = None
+        self.new_rising_queries = pd.DataFrame()
+
+    def __len__(self) -> int:
+        return len(self.requests)
+
+    @property
+    def requested(self) -> int:
+        """
+        Number of requests the reports would make if fetched separately
+        """
+        return sum(len(requests) for requests in self.reports.values())
+
+    def timeframes(self, endpoints: Iterable[str] = ('interest_over_time', 'interest_by_region')) -> Dict[str, List[str]]:
+        """
+        Keywords to fetch per timeframe, in keyword order
+
+        :param endpoints: Endpoints whose requests are grouped (demographics by default)
+        """
+        endpoints = set(endpoints)
+        grouped = {}
+        for request in self.requests:
+            if request.keyword is not None and request.endpoint in endpoints:
+                grouped.setdefault(request.timeframe, set()).add(request.keyword)
+        return {timeframe: [keyword for keyword in self.keywords if keyword in needed]
+                for timeframe, needed in grouped.items()}
+
+    def covers(self, report_types: Iterable[str]) -> bool:
+        """
+        Whether this plan's requests include everything the given reports need
+        """
+        return all(report_requests(report_type, self.keywords, self.regions, self.history_timeframe,
+                                   self.fetch_related) <= self.requests
+                   for report_type in report_types)
+
+    def execute(self, trends_fetcher) -> 'FetchPlan':
+        """
+        Fetch every planned request once
+
+        :param trends_fetcher: AdvancedTrendsFetcher (its regions should match the plan)
+        :return: self
+        """
+        if any(request.endpoint == 'trending_searches' for request in self.requests):
+            self.trending_searches = trends_fetcher.fetch_top_keywords()
+
+        for timeframe, keywords in self.timeframes().items():
+            history = timeframe == self.history_timeframe
+            self.insights[timeframe] = trends_fetcher.analyze_keyword_demographics(
+                keywords,
+                timeframe,
+                batch_size=self.batch_size,
+                anchor_keyword=self.anchor_keyword,
+                incremental=self.incremental and history
+            )
+
+            # The history also feeds the summary metrics and breakouts
+            if history:
+                self.summary = write_summary_report(self.insights[timeframe], trends_fetcher.output_dir)
+                self.breakouts = write_breakouts(self.insights[timeframe], trends_fetcher.output_dir, timeframe)
+
+        for timeframe, keywords in self.timeframes(['related_queries']).items():
+            self.related_queries[timeframe] = trends_fetcher.fetch_related_queries(keywords, timeframe)
+
+        # The last day's related queries build up the query graph run after run
+        daily_related = self.related_queries.get(PERIOD_TIMEFRAMES['daily'])
+        if daily_related:
+            today = datetime.now().date()
+            self.query_graph = update_query_graph(
+                daily_related, os.path.join(trends_fetcher.output_dir, QUERY_GRAPH_FILENAME), today
+            )
+            self.new_rising_queries = self.query_graph.new_queries(today - timedelta(days=1))
+            self.new_rising_queries.to_csv(
+                os.path.join(trends_fetcher.output_dir, NEW_RISING_QUERIES_FILENAME), index=False
+            )
+
+        self.fetched_at = datetime.now()
+        return self
+
+    def report_data(self, report_type: str) -> Dict[str, Any]:
+        """
+        Results for one report, in the form ExcelReportGenerator.create_report takes
+
+        :param report_type: One of the planned report types
+        :return: Report data dictionary
+        """
+        periods = REPORT_PERIODS[report_type]
+        data = {'report_type': report_type, 'periods': list(periods), 'trending_searches': {}, 'stock_trends': {}}
+
+        # Trending searches are only published for the current day
+        if not self.trending_searches.empty:
+            terms = self.trending_searches.iloc[:, 0].drop_duplicates().tolist()
+            data['trending_searches']['daily'] = pd.DataFrame({
+                'Rank': range(1, len(terms) + 1),
+                'Search Term': terms,
+                'Period': 'daily',
+                'Date': (self.fetched_at or datetime.now()).strftime('%Y-%m-%d'),
+            })
+
+        for period in periods:
+            insights = self.insights.get(PERIOD_TIMEFRAMES[period], {})
+            data['stock_trends'][period] = stack_time_series(insights)
+
+        related = {period: self.related_queries[PERIOD_TIMEFRAMES[period]]
+                   for period in periods if PERIOD_TIMEFRAMES[period] in self.related_queries}
+        if related:
+            data['related_queries'] = related
+
+        data['summary'] = self.summary
+        data['breakouts'] = self.breakouts
+        return data
+
+
+def due_report_types(moment: datetime, weekly_day: str, monthly_day: int) -> List[str]:
+    """
+    Report types due on the day of ``moment``
+
+    :param moment: Day to check
+    :param weekly_day: Day of the week of the weekly report (e.g. 'monday')
+    :param monthly_day: Day of the month of the monthly report (clamped to the month's length)
+    :return: Report types, daily first
+    """
+    due = ['daily']
+    if moment.strftime('%A').lower() == weekly_day.lower():
+        due.append('weekly')
+    if moment.day == min(monthly_day, calendar.monthrange(moment.year, moment.month)[1]):
+        due.append('monthly')
+    return due
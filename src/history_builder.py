@@ -0,0 +1,227 @@
+import os
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from instrumentation import metrics
+from progress_journal import ProgressJournal, run_key
+from series_stitching import MAX_DAILY_RANGE_DAYS, date_range_timeframe, overlap_scale, stitch
+from advanced_trends_fetcher import HISTORY_TIMEFRAME, MAX_PAYLOAD_KEYWORDS, PROGRESS_DIRNAME
+
+# Days consecutive history windows share, used to align each window onto the previous one
+HISTORY_OVERLAP_DAYS = 30
+
+# Directory of the progress journal of an unfinished history build, under the output directory
+HISTORY_PROGRESS_DIRNAME = os.path.join(PROGRESS_DIRNAME, 'history')
+
+
+def plan_windows(start: date,
+                 end: date,
+                 window_days: int = MAX_DAILY_RANGE_DAYS,
+                 overlap_days: int = HISTORY_OVERLAP_DAYS) -> List[Tuple[date, date]]:
+    """
+    Overlapping date ranges covering start to end, oldest first
+
+    Windows are laid out backwards from ``end`` so the newest one is always
+    full length; the oldest starts at ``start`` and may reach further into
+    the next window than ``overlap_days``.
+
+    :param start: First day of the history
+    :param end: Last day of the history
+    :param window_days: Days per window (at most MAX_DAILY_RANGE_DAYS to stay daily)
+    :param overlap_days: Days shared by consecutive windows
+    :return: (first day, last day) of every window
+    """
+    step = window_days - overlap_days
+    if step < 1:
+        raise ValueError(f"Overlap of {overlap_days} days leaves nothing new in {window_days}-day windows")
+
+    windows = []
+    window_end = end
+    while True:
+        window_start = window_end - timedelta(days=window_days - 1)
+        if window_start <= start:
+            windows.append((start, min(start + timedelta(days=window_days - 1), end)))
+            break
+        windows.append((window_start, window_end))
+        window_end -= timedelta(days=step)
+    return windows[::-1]
+
+
+def chain_windows(windows: List[pd.DataFrame], keyword: str, min_overlap: int = 3) -> pd.DataFrame:
+    """
+    Chain a keyword's windows into one series on the scale of the oldest window
+
+    Each window is rescaled by least squares over the complete points it
+    shares with the series built so far and its later points are appended.
+    Partial points are only kept from the newest window. A window that
+    cannot be aligned (missing neighbour, all-zero overlap) restarts the
+    chain, so the result is always one continuous scale.
+
+    :param windows: interest_over_time frames, oldest first
+    :param keyword: Keyword column to chain
+    :param min_overlap: Minimum shared points to align a window
+    :return: Frame indexed by date with the keyword's column and isPartial
+    """
+    combined = pd.Series(dtype='float64')
+    partial_dates = pd.DatetimeIndex([])
+    for position, frame in enumerate(windows):
+        if frame.empty or keyword not in frame.columns:
+            continue
+        partial = frame['isPartial'].astype(bool) if 'isPartial' in frame.columns \
+            else pd.Series(False, index=frame.index)
+        complete = frame[keyword].astype('float64')[~partial]
+        newest = position == len(windows) - 1
+        new = frame[keyword].astype('float64') if newest else complete
+
+        if combined.empty:
+            combined = new.copy()
+        else:
+            scale = overlap_scale(combined, complete, min_overlap)
+            if scale is None:
+                print(f"Could not align the window from {new.index.min():%Y-%m-%d} for {keyword}; "
+                      f"history restarts there")
+                combined = new.copy()
+            else:
+                combined = stitch(combined, new, scale)
+        if newest:
+            partial_dates = partial[partial].index.intersection(combined.index)
+
+    is_partial = pd.Series(False, index=combined.index)
+    is_partial[partial_dates] = True
+    chained = pd.DataFrame({keyword: combined, 'isPartial': is_partial})
+    chained.index.name = 'date'
+    return chained
+
+
+class HistoryBuilder:
+    def __init__(self,
+                 fetcher,
+                 keywords: List[str],
+                 start: date,
+                 end: date = None,
+                 geo: str = '',
+                 window_days: int = MAX_DAILY_RANGE_DAYS,
+                 overlap_days: int = HISTORY_OVERLAP_DAYS,
+                 batch_size: int = 1):
+        """
+        Multi-year daily history rebuilt from overlapping daily windows
+
+        Trends only answers at daily resolution for ranges up to
+        MAX_DAILY_RANGE_DAYS, so the span is split into windows that overlap
+        by ``overlap_days`` (plan_windows). The windows are fetched in
+        parallel through the fetcher's worker pool, cache and rate limiter,
+        journaled as they arrive so an interrupted build resumes where it
+        stopped, then chained per keyword by least-squares alignment over the
+        overlaps (chain_windows). The chained series is put on the scale of
+        the stored daily history when there is one, so incremental runs keep
+        extending it, and otherwise scaled to a peak of 100.
+
+        Keywords sharing a payload (``batch_size`` > 1) save requests, but a
+        keyword far less searched than its neighbours then comes back as
+        zeros, which cannot be aligned.
+
+        :param fetcher: AdvancedTrendsFetcher whose cache, limiter, workers and store are used
+        :param keywords: Keywords to rebuild
+        :param start: First day of the history
+        :param end: Last day of the history (defaults to today)
+        :param geo: Geographic restriction of the payloads
+        :param window_days: Days per window (at most MAX_DAILY_RANGE_DAYS)
+        :param overlap_days: Days shared by consecutive windows
+        :param batch_size: Number of keywords per payload
+        """
+        if window_days > MAX_DAILY_RANGE_DAYS:
+            raise ValueError(f"Windows longer than {MAX_DAILY_RANGE_DAYS} days are not returned daily")
+
+        self.fetcher = fetcher
+        self.keywords = list(dict.fromkeys(keywords))
+        self.end = end or date.today()
+        self.start = start
+        self.geo = geo
+        self.window_days = window_days
+        self.overlap_days = overlap_days
+        per_payload = max(1, min(batch_size, MAX_PAYLOAD_KEYWORDS))
+        self.batches = [tuple(self.keywords[i:i + per_payload]) for i in range(0, len(self.keywords), per_payload)]
+        self.windows = [date_range_timeframe(first, last)
+                        for first, last in plan_windows(start, self.end, window_days, overlap_days)]
+
+    def _fetch(self) -> Dict[Tuple[str, Tuple[str, ...]], pd.DataFrame]:
+        fetcher = self.fetcher
+
+        def fetch_window(item):
+            timeframe, batch = item
+            print(f"Fetching {timeframe} for: {', '.join(batch)}")
+            return fetcher._fetch_frame('interest_over_time', list(batch), timeframe, geo=self.geo)
+
+        items = [(timeframe, batch) for batch in self.batches for timeframe in self.windows]
+        return fetcher._run_with_retries(
+            items, fetch_window, 'history window', fetcher.max_workers, journal_scope=f'history {self.geo}'
+        )
+
+    def _stored_history(self, keyword: str) -> Optional[pd.Series]:
+        store = self.fetcher.store
+        if store is None:
+            return None
+        stored = store.read_time_series([keyword], geo=self.geo, timeframe=HISTORY_TIMEFRAME)
+        if stored.empty:
+            return None
+        stored = stored.set_index('date')
+        return stored.loc[~stored['is_partial'], 'value']
+
+    def build(self, resume: bool = True) -> pd.DataFrame:
+        """
+        Fetch every window, chain them and write the histories to the store
+
+        With ``resume`` set, windows are journaled under output_dir as they
+        arrive; building the same history again after a crash only fetches the
+        windows that are missing. The journal is removed once every window
+        has been fetched.
+
+        :param resume: Journal progress and reuse the journal of an interrupted build
+        :return: Frame indexed by date with one column per keyword
+        """
+        fetcher = self.fetcher
+        journal, previous = None, fetcher.journal
+        if resume:
+            key = run_key('history', self.keywords, self.start, self.end, self.geo,
+                          self.window_days, self.overlap_days, self.batches)
+            journal = ProgressJournal(os.path.join(fetcher.output_dir, HISTORY_PROGRESS_DIRNAME), key)
+        fetcher.journal = journal
+
+        failures = len(fetcher.failures)
+        print(f"Rebuilding {self.start:%Y-%m-%d} to {self.end:%Y-%m-%d} from {len(self.windows)} windows "
+              f"for {len(self.keywords)} keyword(s)")
+        try:
+            with metrics.span('stage', stage='history'):
+                frames = self._fetch()
+        finally:
+            fetcher.journal = previous
+
+        histories = {}
+        for batch in self.batches:
+            for keyword in batch:
+                windows = [frames.get((timeframe, batch), pd.DataFrame()) for timeframe in self.windows]
+                chained = chain_windows(windows, keyword)
+                if chained.empty:
+                    print(f"No history for {keyword}")
+                    continue
+
+                values = chained[keyword]
+                stored = self._stored_history(keyword)
+                scale = overlap_scale(stored, values[~chained['isPartial']]) if stored is not None else None
+                if scale is None and values.max() > 0:
+                    scale = 100 / values.max()
+                chained[keyword] = values * (scale or 1.0)
+                histories[keyword] = chained
+
+        if fetcher.store is not None:
+            fetcher.store.write_time_series(histories, HISTORY_TIMEFRAME, self.geo)
+
+        # Keep the journal while windows are missing, so the next build only fetches those
+        if journal is not None and len(fetcher.failures) == failures:
+            journal.remove()
+
+        history = pd.DataFrame({keyword: frame[keyword] for keyword, frame in histories.items()})
+        history.index.name = 'date'
+        return history
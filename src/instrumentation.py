@@ -0,0 +1,261 @@
+import os
+import re
+import json
+import time
+import threading
+from datetime import datetime
+from typing import Any, Dict, Tuple
+
+# Prefix of every exported Prometheus metric
+METRIC_PREFIX = 'trends_'
+
+# File names written by Metrics.write
+METRICS_JSON_FILENAME = 'run_metrics.json'
+METRICS_PROMETHEUS_FILENAME = 'run_metrics.prom'
+
+# A metric series: name plus sorted (label, value) pairs
+SeriesKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+def _series_key(name: str, labels: Dict[str, Any]) -> SeriesKey:
+    return name, tuple(sorted((label, str(value)) for label, value in labels.items()))
+
+
+def _metric_name(name: str) -> str:
+    return METRIC_PREFIX + re.sub(r'[^a-zA-Z0-9_]', '_', name)
+
+
+def _label_text(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ''
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return '{' + ','.join(f'{label}="{value}"' for (label, _), value in zip(labels, escaped)) + '}'
+
+
+class _Span:
+    __slots__ = ('metrics', 'key', 'started')
+
+    def __init__(self, metrics: 'Metrics', key: SeriesKey):
+        self.metrics = metrics
+        self.key = key
+
+    def __enter__(self) -> '_Span':
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.metrics._observe(self.key, time.perf_counter() - self.started, exc_type is not None)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> '_NullSpan':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Metrics:
+    def __init__(self, enabled: bool = True):
+        """
+        Thread-safe counters and timing spans for one process
+
+        Counters add up values such as requests, retries, 429s and bytes.
+        Spans time a block of code and keep its count, total, maximum and
+        error count, so recording one is a dictionary update under a lock
+        and cheap enough to leave on in production. Both can be exported as
+        Prometheus text or as a JSON run report.
+
+        :param enabled: Whether anything is recorded
+        """
+        self.enabled = enabled
+        self.started_at = datetime.now()
+        self._counters: Dict[SeriesKey, float] = {}
+        self._spans: Dict[SeriesKey, list] = {}
+        self._lock = threading.Lock()
+
+    def increment(self, name: str, value: float = 1, **labels):
+        """
+        Add to a counter
+
+        :param name: Counter name (e.g. 'requests')
+        :param value: Amount to add
+        :param labels: Labels of the series (e.g. endpoint='interest_over_time')
+        """
+        if not self.enabled:
+            return
+        key = _series_key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def span(self, name: str, **labels):
+        """
+        Time a block of code
+
+        Use as ``with metrics.span('request', endpoint=endpoint): ...``.
+        Blocks that raise are timed too and counted as errors.
+
+        :param name: Span name (e.g. 'request')
+        :param labels: Labels of the series
+        :return: Context manager
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, _series_key(name, labels))
+
+    def observe(self, name: str, seconds: float, **labels):
+        """
+        Record a duration measured elsewhere (e.g. a rate limiter wait)
+
+        :param name: Span name
+        :param seconds: Duration in seconds
+        :param labels: Labels of the series
+        """
+        if self.enabled:
+            self._observe(_series_key(name, labels), seconds, False)
+
+    def _observe(self, key: SeriesKey, seconds: float, failed: bool):
+        with self._lock:
+            timing = self._spans.get(key)
+            if timing is None:
+                timing = self._spans[key] = [0, 0.0, 0.0, 0]
+            timing[0] += 1
+            timing[1] += seconds
+            timing[2] = max(timing[2], seconds)
+            timing[3] += failed
+
+    def total(self, name: str) -> float:
+        """
+        Value of a counter summed over all its labels
+
+        :param name: Counter name (e.g. 'requests')
+        :return: Sum of every series of the counter
+        """
+        with self._lock:
+            return sum(value for (counter, _), value in self._counters.items() if counter == name)
+
+    def reset(self):
+        """
+        Forget everything recorded so far
+        """
+        with self._lock:
+            self._counters.clear()
+            self._spans.clear()
+            self.started_at = datetime.now()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Everything recorded so far, as a JSON-serializable run report
+
+        :return: Dictionary with 'counters' and 'spans' lists
+        """
+        with self._lock:
+            counters = list(self._counters.items())
+            spans = [(key, list(timing)) for key, timing in self._spans.items()]
+
+        return {
+            'started_at': self.started_at.isoformat(timespec='seconds'),
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'counters': [
+                {'name': name, 'labels': dict(labels), 'value': value}
+                for (name, labels), value in sorted(counters)
+            ],
+            'spans': [
+                {'name': name, 'labels': dict(labels), 'count': count, 'total_s': round(total, 6),
+                 'max_s': round(longest, 6), 'errors': errors}
+                for (name, labels), (count, total, longest, errors) in sorted(spans)
+            ],
+        }
+
+    def prometheus_text(self) -> str:
+        """
+        Everything recorded so far in the Prometheus text exposition format
+
+        Counters become ``trends_<name>_total``; spans become
+        ``trends_<name>_seconds`` summaries (``_count`` and ``_sum``) plus
+        ``trends_<name>_seconds_max`` and ``trends_<name>_errors_total``.
+
+        :return: Exposition text
+        """
+        report = self.snapshot()
+        lines = []
+
+        def family(name, kind, rows):
+            lines.append(f'# TYPE {name} {kind}')
+            lines.extend(rows)
+
+        by_name = {}
+        for counter in report['counters']:
+            by_name.setdefault(counter['name'], []).append(counter)
+        for name, counters in by_name.items():
+            metric = _metric_name(name) + '_total'
+            family(metric, 'counter', [
+                f"{metric}{_label_text(tuple(sorted(counter['labels'].items())))} {counter['value']:g}"
+                for counter in counters
+            ])
+
+        by_name = {}
+        for span in report['spans']:
+            by_name.setdefault(span['name'], []).append(span)
+        for name, spans in by_name.items():
+            metric = _metric_name(name) + '_seconds'
+            rows = []
+            for span in spans:
+                labels = _label_text(tuple(sorted(span['labels'].items())))
+                rows.append(f"{metric}_count{labels} {span['count']}")
+                rows.append(f"{metric}_sum{labels} {span['total_s']:.6f}")
+            family(metric, 'summary', rows)
+            family(f'{metric}_max', 'gauge', [
+                f"{metric}_max{_label_text(tuple(sorted(span['labels'].items())))} {span['max_s']:.6f}"
+                for span in spans
+            ])
+            errors = _metric_name(name) + '_errors_total'
+            family(errors, 'counter', [
+                f"{errors}{_label_text(tuple(sorted(span['labels'].items())))} {span['errors']}"
+                for span in spans
+            ])
+
+        return '\n'.join(lines) + '\n'
+
+    def write(self, output_dir: str) -> Tuple[str, str]:
+        """
+        Write the JSON run report and the Prometheus text file
+
+        Both files are replaced atomically, so a Prometheus textfile collector
+        pointed at ``output_dir`` never reads a half-written file.
+
+        :param output_dir: Directory to write to
+        :return: Paths of the JSON and Prometheus files
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        json_path = os.path.join(output_dir, METRICS_JSON_FILENAME)
+        prometheus_path = os.path.join(output_dir, METRICS_PROMETHEUS_FILENAME)
+
+        for path, content in ((json_path, json.dumps(self.snapshot(), indent=2)),
+                              (prometheus_path, self.prometheus_text())):
+            temporary = f'{path}.tmp'
+            with open(temporary, 'w') as f:
+                f.write(content)
+            os.replace(temporary, path)
+        return json_path, prometheus_path
+
+
+# Process-wide metrics used by the fetchers, cache, limiter, store, reports and email
+metrics = Metrics(enabled=os.environ.get('TRENDS_METRICS', '1').lower() not in ('0', 'false', 'no'))
+
+
+def record_response(response, *args, **kwargs):
+    """
+    requests response hook counting HTTP responses and bytes received
+
+    Pass ``requests_args={'hooks': {'response': record_response}}`` to a
+    pytrends session to count its traffic.
+    """
+    metrics.increment('http_responses', status=response.status_code)
+    metrics.increment('response_bytes', len(response.content))
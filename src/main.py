@@ -1,29 +1,402 @@
 import os
-from advanced_trends_fetcher import AdvancedTrendsFetcher
-from config import CONFIG
+import sys
+import logging
+from datetime import datetime
+import argparse
 
-def main():
+# Charts are only ever written to files, so never load an interactive backend
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+from config import CONFIG, REPORT_TYPES, WEEKLY_REPORT_DAY, MONTHLY_REPORT_DAY, METRICS_DIR
+from instrumentation import metrics
+
+# pandas, pytrends, matplotlib and xlsxwriter are imported by the commands that
+# need them, so cheap commands (help, send) start without loading them
+
+logger = logging.getLogger(__name__)
+
+def build_fetcher():
     """
-    Main entry point for Google Trends Tracker
+    Create a trends fetcher from the configuration
     """
-    # Initialize trends fetcher with configuration
-    trends_fetcher = AdvancedTrendsFetcher(
+    from advanced_trends_fetcher import AdvancedTrendsFetcher
+    
+    return AdvancedTrendsFetcher(
         regions=CONFIG['regions'],
-        output_dir=CONFIG['output_dir']
+        output_dir=CONFIG['output_dir'],
+        use_cache=CONFIG.get('use_cache', True),
+        max_workers=CONFIG.get('max_workers', 1),
+        chart_mode=CONFIG.get('chart_mode', 'parallel'),
+        compact_insights=CONFIG.get('compact_insights', False)
     )
-    
-    # Fetch keywords from configuration
-    keywords = CONFIG.get('keywords', [
-        'Tesla stock', 'Bitcoin', 'Ethereum', 
-        'Stock market', 'Cryptocurrency', 
+
+def configured_keywords():
+    """
+    Keywords to track, from the configuration
+    """
+    return CONFIG.get('keywords', [
+        'Tesla stock', 'Bitcoin', 'Ethereum',
+        'Stock market', 'Cryptocurrency',
         'Investment trends'
     ])
+
+def build_fetch_plan(report_types):
+    """
+    Plan the shared fetch of several report types from the configuration
+    """
+    from fetch_plan import FetchPlan
     
-    # Generate comprehensive report
-    trends_fetcher.generate_comprehensive_report(
+    return FetchPlan(
+        report_types,
+        keywords=configured_keywords(),
+        regions=CONFIG['regions'],
+        history_timeframe=CONFIG.get('timeframe', 'today 3-m'),
+        batch_size=CONFIG.get('batch_size', 1),
+        anchor_keyword=CONFIG.get('anchor_keyword'),
+        incremental=CONFIG.get('incremental', False),
+        related_queries=CONFIG.get('related_queries', True)
+    )
+
+def execute_fetch_plan(report_types, trends_fetcher=None):
+    """
+    Fetch the data of several report types once, in one shared plan
+    
+    :param report_types: Report types to fetch for
+    :param trends_fetcher: Fetcher to use (built from the configuration if None)
+    :return: Executed FetchPlan
+    """
+    plan = build_fetch_plan(report_types)
+    logger.info(f"Fetching {len(plan)} unique requests for {', '.join(plan.report_types)} "
+                f"({plan.requested} if fetched per report)")
+    return plan.execute(trends_fetcher or build_fetcher())
+
+def create_report(report_type, data=None):
+    """
+    Build the Excel report of one report type
+    
+    :param report_type: 'daily', 'weekly' or 'monthly'
+    :param data: Report data from FetchPlan.report_data (fetched if None)
+    :return: Path of the report, or None if it could not be created
+    """
+    from excel_generator import ExcelReportGenerator
+    
+    logger.info(f"Generating {report_type} report")
+    if data is None:
+        data = execute_fetch_plan([report_type]).report_data(report_type)
+    
+    report_path = ExcelReportGenerator().create_report(data, streaming=CONFIG.get('excel_streaming'))
+    if not report_path:
+        logger.error(f"Could not create the {report_type} report")
+    return report_path
+
+def generate_and_send_report(report_type, data=None, email_sender=None, background=False):
+    """
+    Build the Excel report of one report type and email it
+    
+    :param report_type: 'daily', 'weekly' or 'monthly'
+    :param data: Report data from FetchPlan.report_data (fetched if None)
+    :param email_sender: EmailSender whose pooled connection to use (a new one if None)
+    :param background: Queue the email on the sender's background thread instead of waiting
+    :return: True if the report was created and sent (or queued)
+    """
+    from email_sender import EmailSender
+    
+    if data is None:
+        data = execute_fetch_plan([report_type]).report_data(report_type)
+    
+    report_path = create_report(report_type, data)
+    if not report_path:
+        return False
+    
+    if email_sender is None:
+        with EmailSender() as email_sender:
+            return email_sender.send_report(report_path, report_type, breakouts=data.get('breakouts'))
+    
+    send = email_sender.send_report_async if background else email_sender.send_report
+    return send(report_path, report_type, breakouts=data.get('breakouts'))
+
+def generate_reports(report_types, send=True):
+    """
+    Fetch once for several report types, then build (and send) each report
+    
+    :param report_types: Report types to generate
+    :param send: Email the reports; otherwise they are only written to the output directory
+    :return: Dictionary of report type to whether it was created (and sent)
+    """
+    from email_sender import EmailSender
+    
+    plan = execute_fetch_plan(report_types)
+    
+    if not send:
+        return {
+            report_type: bool(create_report(report_type, plan.report_data(report_type)))
+            for report_type in plan.report_types
+        }
+    
+    # All reports go out over one SMTP connection
+    with EmailSender() as email_sender:
+        return {
+            report_type: generate_and_send_report(report_type, plan.report_data(report_type), email_sender)
+            for report_type in plan.report_types
+        }
+
+def requested_report_types(args):
+    """
+    Report types named with --type, plus the ones due today with --due
+    """
+    report_types = list(args.report_types or [])
+    if args.due:
+        from fetch_plan import due_report_types
+        report_types += due_report_types(datetime.now(), WEEKLY_REPORT_DAY, MONTHLY_REPORT_DAY)
+    return report_types
+
+def crawl_keywords(seeds):
+    """
+    Expand the watchlist through rising related queries, within the configured allowance
+    
+    :param seeds: Seed keywords
+    :return: Expanded keywords and the fetcher that crawled them
+    """
+    from watchlist_crawler import WatchlistCrawler
+    
+    trends_fetcher = build_fetcher()
+    crawler = WatchlistCrawler(
+        trends_fetcher,
+        timeframe=CONFIG.get('crawl_timeframe', 'now 7-d'),
+        max_depth=CONFIG.get('crawl_depth', 2),
+        max_requests=CONFIG.get('crawl_requests', 100),
+        max_keywords=CONFIG.get('crawl_max_keywords')
+    )
+    keywords = crawler.expand(seeds)
+    logger.info(f"Watchlist expanded from {len(seeds)} to {len(keywords)} keywords "
+                f"with {crawler.requests} requests")
+    return keywords, trends_fetcher
+
+def fetch_command(args):
+    """
+    Fetch data and write the CSV summaries, charts and store, without building reports
+    """
+    report_types = requested_report_types(args)
+    if report_types:
+        execute_fetch_plan(report_types)
+        return 0
+    
+    keywords = configured_keywords()
+    trends_fetcher = None
+    if args.crawl:
+        keywords, trends_fetcher = crawl_keywords(keywords)
+    
+    # Keyword x region cube with rank correlations and lead/lag between regions
+    if args.regional:
+        from regional_matrix import RegionalMatrix
+        matrix = RegionalMatrix(
+            trends_fetcher or build_fetcher(),
+            keywords,
+            timeframe=CONFIG.get('timeframe', 'today 3-m'),
+            anchor_keyword=CONFIG.get('anchor_keyword')
+        ).build()
+        for path in matrix.write():
+            logger.info(f"Saved {path}")
+        return 0
+    
+    # Large watchlists are split over worker processes
+    if args.shards > 1:
+        from sharded_runner import ShardedRunner
+        runner = ShardedRunner(
+            keywords,
+            timeframe=CONFIG.get('timeframe', 'today 3-m'),
+            shards=args.shards,
+            batch_size=CONFIG.get('batch_size', 1),
+            anchor_keyword=CONFIG.get('anchor_keyword'),
+            output_dir=CONFIG['output_dir'],
+            use_cache=CONFIG.get('use_cache', True),
+            chart_mode=CONFIG.get('chart_mode', 'parallel'),
+            compact_insights=CONFIG.get('compact_insights', False)
+        )
+        runner.run()
+        return 1 if runner.failures else 0
+    
+    # Comprehensive report of the configured (or crawled) keywords
+    (trends_fetcher or build_fetcher()).generate_comprehensive_report(
         keywords=keywords,
-        timeframe=CONFIG.get('timeframe', 'today 3-m')
+        timeframe=CONFIG.get('timeframe', 'today 3-m'),
+        batch_size=CONFIG.get('batch_size', 1),
+        anchor_keyword=CONFIG.get('anchor_keyword'),
+        incremental=CONFIG.get('incremental', False),
+        resume=not args.no_resume
     )
+    return 0
+
+def history_command(args):
+    """
+    Rebuild a multi-year daily history of the keywords from overlapping daily windows
+    """
+    from datetime import date, timedelta
+    from history_builder import HistoryBuilder
+    
+    if args.start:
+        start = datetime.strptime(args.start, '%Y-%m-%d').date()
+    else:
+        start = date.today() - timedelta(days=round(args.years * 365.25))
+    
+    builder = HistoryBuilder(
+        build_fetcher(),
+        configured_keywords(),
+        start,
+        batch_size=CONFIG.get('history_batch_size', 1)
+    )
+    history = builder.build(resume=not args.no_resume)
+    logger.info(f"Stored {len(history)} days of history for {len(history.columns)} keywords")
+    return 0 if len(history.columns) == len(builder.keywords) else 1
+
+def watch_command(args):
+    """
+    Poll near-real-time timeframes for the hot keywords and alert on spikes until interrupted
+    """
+    from realtime_watch import RealtimeWatch, print_alert, webhook_alert
+    
+    keywords = args.keywords or CONFIG.get('watch_keywords') or configured_keywords()[:5]
+    webhook = args.webhook or CONFIG.get('watch_webhook')
+    watch = RealtimeWatch(
+        build_fetcher(),
+        keywords,
+        requests_per_hour=CONFIG.get('watch_requests_per_hour'),
+        threshold=args.threshold,
+        batch_size=CONFIG.get('watch_batch_size', 1),
+        on_alert=webhook_alert(webhook) if webhook else print_alert
+    )
+    try:
+        watch.run()
+    except KeyboardInterrupt:
+        logger.info("Watch stopped")
+    return 0
+
+def report_command(args):
+    """
+    Fetch once for the requested reports, then build and send each of them
+    """
+    report_types = requested_report_types(args)
+    if not report_types:
+        logger.error("No report requested: pass --type or --due")
+        return 2
+    
+    results = generate_reports(report_types, send=not getattr(args, 'no_email', False))
+    return 0 if all(results.values()) else 1
+
+def send_command(args):
+    """
+    Email an Excel report that was already generated
+    """
+    from email_sender import EmailSender
+    
+    if not os.path.exists(args.report_path):
+        logger.error(f"Report not found: {args.report_path}")
+        return 1
+    
+    with EmailSender() as email_sender:
+        return 0 if email_sender.send_report(args.report_path, args.report_type) else 1
+
+def bench_command(argv):
+    """
+    Run the benchmark suite, which parses its own arguments
+    """
+    import benchmark
+    return benchmark.main(argv)
+
+def add_report_type_arguments(parser, default=None):
+    parser.add_argument('--type', dest='report_types', action='append', choices=REPORT_TYPES, default=default,
+                        help='Report to generate (repeat for several reports sharing one fetch)')
+    parser.add_argument('--due', action='store_true', default=default if default is not None else False,
+                        help='Every report due today (daily, plus weekly and monthly on their days)')
+
+def parse_args(argv=None):
+    """
+    Parse command line arguments
+    
+    Without a command, --type/--due generate and send reports (as the cron
+    job and workflows call it), and no arguments fetch the comprehensive report.
+    """
+    parser = argparse.ArgumentParser(description='Google Trends Tracker')
+    add_report_type_arguments(parser)
+    parser.set_defaults(shards=CONFIG.get('shards', 1), no_resume=False, crawl=False, regional=False)
+    commands = parser.add_subparsers(dest='command', metavar='command')
+    
+    # Flags given before the command are kept unless repeated after it
+    fetch_parser = commands.add_parser('fetch', help='Fetch data and write CSVs, charts and the store')
+    add_report_type_arguments(fetch_parser, default=argparse.SUPPRESS)
+    fetch_parser.add_argument('--shards', type=int, default=CONFIG.get('shards', 1),
+                              help='Worker processes splitting the configured keywords')
+    fetch_parser.add_argument('--no-resume', action='store_true',
+                              help='Ignore the progress of an interrupted fetch and start over')
+    fetch_parser.add_argument('--crawl', action='store_true',
+                              help='Expand the keywords through rising related queries first')
+    fetch_parser.add_argument('--regional', action='store_true',
+                              help='Compare the configured regions: rank correlations and lead/lag')
+    
+    history_parser = commands.add_parser('history', help='Rebuild multi-year daily history into the store')
+    history_parser.add_argument('--years', type=float, default=CONFIG.get('history_years', 5),
+                                help='Years of history to rebuild, up to today')
+    history_parser.add_argument('--start', help='First day (YYYY-MM-DD), instead of --years')
+    history_parser.add_argument('--no-resume', action='store_true',
+                                help='Ignore the windows of an interrupted build and start over')
+    
+    watch_parser = commands.add_parser('watch', help='Poll hourly timeframes and alert on spikes')
+    watch_parser.add_argument('--keyword', dest='keywords', action='append',
+                              help='Keyword to watch (repeat; defaults to watch_keywords)')
+    watch_parser.add_argument('--webhook', help='URL every alert is posted to as JSON')
+    watch_parser.add_argument('--threshold', type=float, default=CONFIG.get('watch_threshold', 4.0),
+                              help='Robust z-score at which a point counts as a spike')
+    
+    report_parser = commands.add_parser('report', help='Fetch once, then build and email Excel reports')
+    add_report_type_arguments(report_parser, default=argparse.SUPPRESS)
+    report_parser.add_argument('--no-email', action='store_true',
+                               help='Only write the reports to the output directory')
+    
+    send_parser = commands.add_parser('send', help='Email an Excel report that was already generated')
+    send_parser.add_argument('report_path', help='Path of the Excel report')
+    send_parser.add_argument('--type', dest='report_type', choices=REPORT_TYPES, default='daily',
+                             help='Report type named in the email')
+    
+    commands.add_parser('bench', add_help=False, help='Benchmark the pipeline (see bench --help)')
+    return parser.parse_args(argv)
+
+def run(args):
+    """
+    Run the command line request
+    
+    :param args: Parsed command line arguments
+    :return: Exit status
+    """
+    if args.command == 'fetch':
+        return fetch_command(args)
+    if args.command == 'send':
+        return send_command(args)
+    if args.command == 'history':
+        return history_command(args)
+    if args.command == 'watch':
+        return watch_command(args)
+    
+    # Flags without a command generate and send reports
+    if args.command == 'report' or args.report_types or args.due:
+        return report_command(args)
+    return fetch_command(args)
+
+def main(argv=None):
+    """
+    Main entry point for Google Trends Tracker
+    """
+    argv = sys.argv[1:] if argv is None else list(argv)
+    
+    # The benchmark runs its own processes and keeps its own results
+    if argv[:1] == ['bench']:
+        return bench_command(argv[1:])
+    
+    args = parse_args(argv)
+    try:
+        return run(args)
+    finally:
+        # Spans and counters of this run, for dashboards and alerting
+        metrics.write(METRICS_DIR)
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    sys.exit(main())
@@ -0,0 +1,313 @@
+import json
+import math
+import calendar
+import time
+import zlib
+import random
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+from urllib.parse import urlparse, parse_qs
+
+from pytrends.request import TrendReq, BASE_TRENDS_URL
+
+# Regions returned by the mock interest-by-region endpoint
+MOCK_REGIONS = [
+    ('California', 'US-CA'), ('Texas', 'US-TX'), ('New York', 'US-NY'), ('Florida', 'US-FL'),
+    ('Illinois', 'US-IL'), ('Washington', 'US-WA'), ('Massachusetts', 'US-MA'), ('Georgia', 'US-GA'),
+    ('Colorado', 'US-CO'), ('Oregon', 'US-OR'), ('Nevada', 'US-NV'), ('Arizona', 'US-AZ'),
+    ('Ohio', 'US-OH'), ('Michigan', 'US-MI'), ('Virginia', 'US-VA'), ('New Jersey', 'US-NJ'),
+]
+
+# Number of points and spacing for the relative timeframes Trends understands
+_TIMELINES = {
+    'now 1-H': (60, timedelta(minutes=1)),
+    'now 4-H': (240, timedelta(minutes=1)),
+    'now 1-d': (180, timedelta(minutes=8)),
+    'now 7-d': (168, timedelta(hours=1)),
+    'today 1-m': (30, timedelta(days=1)),
+    'today 3-m': (90, timedelta(days=1)),
+    'today 12-m': (52, timedelta(weeks=1)),
+    'today 5-y': (260, timedelta(weeks=1)),
+    'all': (240, timedelta(weeks=4)),
+}
+
+
+def _seed(*parts) -> int:
+    return zlib.crc32('|'.join(str(part) for part in parts).encode('utf-8'))
+
+
+def mock_timeline(timeframe: str, now: datetime = None) -> List[datetime]:
+    """
+    Return the timestamps Trends would report for a timeframe
+
+    :param timeframe: Relative timeframe or 'YYYY-MM-DD YYYY-MM-DD' range
+    :param now: Reference time for relative timeframes
+    :return: Ascending list of timestamps
+    """
+    if timeframe in _TIMELINES:
+        count, step = _TIMELINES[timeframe]
+        end = (now or datetime.utcnow()).replace(second=0, microsecond=0)
+        if step >= timedelta(days=1):
+            end = end.replace(hour=0, minute=0)
+        return [end - step * i for i in reversed(range(count))]
+
+    start, end = (datetime.strptime(part[:10], '%Y-%m-%d') for part in timeframe.split())
+    step = timedelta(days=1) if (end - start).days <= 270 else timedelta(weeks=1)
+    points = []
+    while start <= end:
+        points.append(start)
+        start += step
+    return points
+
+
+def mock_volume(keyword: str, geo: str, timestamp: datetime) -> float:
+    """
+    Deterministic synthetic search volume for a keyword at a point in time
+
+    Each keyword gets its own level, weekly seasonality and an occasional
+    spike, so anomaly detection and rescaling have something to find.
+    """
+    rng = random.Random(_seed(keyword, geo))
+    level = rng.uniform(10, 100)
+    phase = rng.uniform(0, 2 * math.pi)
+    day = calendar.timegm(timestamp.timetuple()) / 86400
+    volume = level * (1 + 0.25 * math.sin(2 * math.pi * day / 7 + phase))
+    if _seed(keyword, geo, timestamp.date()) % 47 == 0:
+        volume *= 2.5
+    return volume
+
+
+def _scaled(volumes: Dict[str, List[float]]) -> Dict[str, List[int]]:
+    """
+    Scale volumes so the largest value across all keywords is 100
+    """
+    peak = max((max(values) for values in volumes.values() if values), default=0) or 1
+    return {keyword: [int(round(value / peak * 100)) for value in values] for keyword, values in volumes.items()}
+
+
+class _MockTrendsHandler(BaseHTTPRequestHandler):
+    server_version = 'MockTrends/1.0'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._handle()
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+        self._handle()
+
+    def _handle(self):
+        mock = self.server.mock
+        parsed = urlparse(self.path)
+        params = {name: values[0] for name, values in parse_qs(parsed.query).items()}
+        path = parsed.path.rstrip('/')
+
+        if mock.latency:
+            time.sleep(mock.latency)
+
+        with mock.lock:
+            mock.request_count += 1
+            mock.requests[path] = mock.requests.get(path, 0) + 1
+            throttled = bool(mock.throttle_every) and mock.request_count % mock.throttle_every == 0
+
+        if throttled:
+            self._send(429, b'Too Many Requests', 'text/plain', {'Retry-After': str(mock.retry_after)})
+            return
+
+        if path.endswith('/explore') and not path.endswith('/api/explore'):
+            self._send(200, b'<html></html>', 'text/html', {'Set-Cookie': 'NID=mock-nid; Path=/'})
+        elif path.endswith('/api/explore'):
+            self._send_json(4, mock.explore(json.loads(params['req'])))
+        elif path.endswith('/widgetdata/multiline'):
+            self._send_json(5, mock.multiline(json.loads(params['req'])))
+        elif path.endswith('/widgetdata/comparedgeo'):
+            self._send_json(5, mock.comparedgeo(json.loads(params['req'])))
+        elif path.endswith('/widgetdata/relatedsearches'):
+            self._send_json(5, mock.relatedsearches(json.loads(params['req'])))
+        elif path.endswith('/hottrends/visualize/internal/data'):
+            self._send_json(0, mock.hottrends())
+        else:
+            self._send(404, b'Not Found', 'text/plain')
+
+    def _send_json(self, garbage: int, payload):
+        prefix = ")]}',\n"[:garbage]
+        self._send(200, (prefix + json.dumps(payload)).encode('utf-8'), 'application/json; charset=utf-8')
+
+    def _send(self, status: int, body: bytes, content_type: str, headers: Dict[str, str] = None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class MockTrendsServer:
+    def __init__(self,
+                 host: str = '127.0.0.1',
+                 port: int = 0,
+                 latency: float = 0.0,
+                 throttle_every: int = 0,
+                 retry_after: int = 1,
+                 trending_regions: List[str] = None):
+        """
+        Local stand-in for the Google Trends endpoints used by the fetchers
+
+        Serves deterministic synthetic data in the same wire format as
+        Google (including the anti-JSON-hijacking prefixes) so fetchers can
+        run offline. Every request is counted, and the server can add latency
+        or answer every Nth request with a 429.
+
+        :param host: Interface to bind
+        :param port: Port to bind (0 picks a free port)
+        :param latency: Seconds to wait before answering each request
+        :param throttle_every: Answer every Nth request with 429 (0 disables)
+        :param retry_after: Retry-After seconds sent with 429 responses
+        :param trending_regions: Region keys served by the trending searches endpoint
+        """
+        self.latency = latency
+        self.throttle_every = throttle_every
+        self.retry_after = retry_after
+        self.trending_regions = trending_regions or ['united_states', 'united_kingdom', 'canada', 'US', 'GB', 'CA']
+        self.request_count = 0
+        self.requests: Dict[str, int] = {}
+        self.lock = threading.Lock()
+
+        self._httpd = ThreadingHTTPServer((host, port), _MockTrendsHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.mock = self
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        """
+        URL to use in place of https://trends.google.com/trends
+        """
+        host, port = self._httpd.server_address[:2]
+        return f'http://{host}:{port}/trends'
+
+    def start(self) -> 'MockTrendsServer':
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> 'MockTrendsServer':
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def reset_counts(self):
+        with self.lock:
+            self.request_count = 0
+            self.requests = {}
+
+    # Endpoint payloads
+
+    def explore(self, req: dict) -> dict:
+        items = req['comparisonItem']
+        keywords = [item['keyword'] for item in items]
+        timeframe = items[0]['time'] if items else 'today 3-m'
+        geo = items[0].get('geo', '') if items else ''
+        token = f'token-{_seed(keywords, timeframe, geo)}'
+        shared = {'keywords': keywords, 'time': timeframe, 'geo': geo}
+
+        widgets = [
+            {'id': 'TIMESERIES', 'token': token, 'request': dict(shared)},
+            {'id': 'GEO_MAP', 'token': token, 'request': dict(shared, resolution='COUNTRY')},
+        ]
+        for index, keyword in enumerate(keywords):
+            restriction = {'complexKeywordsRestriction': {'keyword': [{'type': 'BROAD', 'value': keyword}]}}
+            widgets.append({
+                'id': f'RELATED_QUERIES_{index}', 'token': token,
+                'request': dict(shared, keywords=[keyword], restriction=restriction),
+            })
+            widgets.append({
+                'id': f'RELATED_TOPICS_{index}', 'token': token,
+                'request': dict(shared, keywords=[keyword], restriction=restriction),
+            })
+        return {'widgets': widgets}
+
+    def multiline(self, req: dict) -> dict:
+        timeline = mock_timeline(req['time'])
+        volumes = {keyword: [mock_volume(keyword, req['geo'], point) for point in timeline]
+                   for keyword in req['keywords']}
+        scaled = _scaled(volumes)
+
+        timeline_data = []
+        for index, point in enumerate(timeline):
+            entry = {
+                'time': str(calendar.timegm(point.timetuple())),
+                'formattedTime': point.strftime('%b %d, %Y'),
+                'value': [scaled[keyword][index] for keyword in req['keywords']],
+            }
+            if index == len(timeline) - 1:
+                entry['isPartial'] = True
+            timeline_data.append(entry)
+        return {'default': {'timelineData': timeline_data, 'averages': []}}
+
+    def comparedgeo(self, req: dict) -> dict:
+        volumes = {}
+        for keyword in req['keywords']:
+            rng = random.Random(_seed(keyword, req['geo'], 'regions'))
+            volumes[keyword] = [rng.uniform(1, 100) for _ in MOCK_REGIONS]
+        scaled = _scaled(volumes)
+
+        geo_map = [{
+            'geoCode': code,
+            'geoName': name,
+            'value': [scaled[keyword][index] for keyword in req['keywords']],
+            'hasData': [True for _ in req['keywords']],
+        } for index, (name, code) in enumerate(MOCK_REGIONS)]
+        return {'default': {'geoMapData': geo_map}}
+
+    def relatedsearches(self, req: dict) -> dict:
+        keyword = req['keywords'][0]
+        rng = random.Random(_seed(keyword, req['time'], 'related'))
+        top = [{'query': f'{keyword} {suffix}', 'value': 100 - 8 * index}
+               for index, suffix in enumerate(['price', 'news', 'today', 'forecast', 'chart'])]
+        rising = [{'query': f'{keyword} {suffix}', 'value': rng.randint(50, 5000)}
+                  for suffix in ['etf', 'prediction', 'crash', 'earnings']]
+        return {'default': {'rankedList': [{'rankedKeyword': top}, {'rankedKeyword': rising}]}}
+
+    def hottrends(self) -> dict:
+        return {region: [f'{region} trending {index}' for index in range(20)] for region in self.trending_regions}
+
+
+def mock_trend_req(base_url: str) -> type:
+    """
+    Build a TrendReq subclass that talks to a mock server instead of Google
+
+    :param base_url: Server URL replacing https://trends.google.com/trends
+    :return: TrendReq subclass
+    """
+    class MockTrendReq(TrendReq):
+        def GetGoogleCookie(self):
+            return {'NID': 'mock-nid'}
+
+        def _get_data(self, url, *args, **kwargs):
+            # pytrends reads its URLs through the TrendReq name, so rewrite them here
+            return super()._get_data(url.replace(BASE_TRENDS_URL, base_url), *args, **kwargs)
+
+    return MockTrendReq
+
+
+if __name__ == '__main__':
+    with MockTrendsServer(port=8765) as server:
+        print(f"Mock Google Trends server running at {server.base_url}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
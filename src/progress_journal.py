@@ -0,0 +1,153 @@
+import os
+import json
+import pickle
+import hashlib
+import shutil
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterator, List
+
+# Append-only log of completed units inside a journal directory
+JOURNAL_FILENAME = 'journal.jsonl'
+
+# Directory holding the pickled result of each unit
+RESULTS_DIRNAME = 'units'
+
+
+def run_key(*parts: Any) -> str:
+    """
+    Identify a run by its parameters, so a journal is only reused by the same run
+
+    :param parts: JSON-serializable run parameters (keywords, timeframe, ...)
+    :return: Hex digest
+    """
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:16]
+
+
+class ProgressJournal:
+    def __init__(self, directory: str, key: str):
+        """
+        Durable record of the units of work a run has completed
+
+        Each completed unit (a keyword, a keyword batch, a region) is pickled
+        to its own file, which is moved into place atomically, and only then
+        appended to an fsynced JSON-lines journal. A run that dies part way
+        keeps everything recorded before the crash; a torn last line is
+        ignored. The journal belongs to one run key: opening it with another
+        key (different keywords, timeframe or day) starts it over.
+
+        :param directory: Directory of the journal and its unit results
+        :param key: Run key from run_key()
+        """
+        self.directory = directory
+        self.key = key
+        self._path = os.path.join(directory, JOURNAL_FILENAME)
+        self._results_dir = os.path.join(directory, RESULTS_DIRNAME)
+        self._files: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+        if not self._load():
+            self.clear()
+
+    @staticmethod
+    def _unit_key(unit: Any) -> str:
+        # Tuples and lists serialize alike, so a batch keeps its key across restarts
+        return json.dumps(unit)
+
+    def _load(self) -> bool:
+        try:
+            with open(self._path) as f:
+                lines = f.read().splitlines()
+        except FileNotFoundError:
+            return False
+
+        entries = []
+        for line in lines:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                # The write of the last line was cut short
+                continue
+
+        if not entries or entries[0].get('run') != self.key:
+            return False
+
+        for entry in entries[1:]:
+            if 'unit' in entry and os.path.exists(os.path.join(self._results_dir, entry['file'])):
+                self._files[self._unit_key(entry['unit'])] = entry['file']
+        return True
+
+    def _append(self, entry: Dict[str, Any]):
+        with open(self._path, 'a') as f:
+            f.write(json.dumps(entry) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def __len__(self) -> int:
+        return len(self._files)
+
+    def __contains__(self, unit: Any) -> bool:
+        return self._unit_key(unit) in self._files
+
+    def __iter__(self) -> Iterator[Any]:
+        return (json.loads(key) for key in self._files)
+
+    def record(self, unit: Any, result: Any):
+        """
+        Save a completed unit and its result
+
+        Safe to call from several fetch threads at once.
+
+        :param unit: JSON-serializable unit (e.g. a keyword or a list of keywords)
+        :param result: Picklable result of the unit
+        """
+        key = self._unit_key(unit)
+        filename = hashlib.sha256(key.encode('utf-8')).hexdigest()[:24] + '.pkl'
+        path = os.path.join(self._results_dir, filename)
+
+        temporary = f'{path}.tmp'
+        with open(temporary, 'wb') as f:
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, path)
+
+        with self._lock:
+            self._append({'unit': unit, 'file': filename, 'at': datetime.now().isoformat(timespec='seconds')})
+            self._files[key] = filename
+
+    def load(self, unit: Any) -> Any:
+        """
+        Result of a completed unit
+
+        :param unit: Unit passed to record()
+        :return: The recorded result
+        """
+        with open(os.path.join(self._results_dir, self._files[self._unit_key(unit)]), 'rb') as f:
+            return pickle.load(f)
+
+    def pending(self, units: List[Any]) -> List[Any]:
+        """
+        Units not completed yet, in the given order
+
+        :param units: Every unit of the run
+        :return: Units still to do
+        """
+        return [unit for unit in units if unit not in self]
+
+    def clear(self):
+        """
+        Forget every completed unit and start a new journal for the run key
+        """
+        shutil.rmtree(self._results_dir, ignore_errors=True)
+        os.makedirs(self._results_dir, exist_ok=True)
+        self._files = {}
+        with open(self._path, 'w') as f:
+            f.write(json.dumps({'run': self.key, 'created': datetime.now().isoformat(timespec='seconds')}) + '\n')
+
+    def remove(self):
+        """
+        Delete the journal once the run it tracks has finished
+        """
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self._files = {}
@@ -0,0 +1,315 @@
+import os
+import sys
+import json
+from datetime import date
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import pandas as pd
+
+# File holding the query graph between runs, under the output directory
+QUERY_GRAPH_FILENAME = 'query_graph.json'
+
+# Kinds of related searches Google Trends returns for a keyword
+RELATED_KINDS = ('top', 'rising')
+
+# Columns of the frame returned by QueryGraph.new_queries
+NEW_QUERY_COLUMNS = ['query', 'seeds', 'first_seen', 'value']
+
+# An edge: seed keyword id, related query id, kind id
+Edge = Tuple[int, int, int]
+
+
+def related_labels(frame: pd.DataFrame) -> Optional[pd.Series]:
+    """
+    Text of every row of a related queries or related topics frame
+
+    Related queries have a ``query`` column; related topics are identified
+    by ``topic_title`` instead.
+    """
+    for column in ('query', 'topic_title'):
+        if column in frame.columns:
+            return frame[column]
+    return None
+
+
+def _plain(value: Any) -> Any:
+    # numpy scalars are not JSON serializable
+    return value.item() if hasattr(value, 'item') else value
+
+
+class QueryGraph:
+    def __init__(self):
+        """
+        Deduplicated graph of seed keywords and their related searches
+
+        Every string (keyword, query, kind) is interned once and referred to
+        by id. An edge links a seed keyword to a related query of one kind
+        ('top' or 'rising', or e.g. 'rising_topics') and keeps the value
+        Trends gave it on every day it was seen. An inverted index maps each
+        query to the seeds that share it, and the day every query was first
+        seen is indexed as well, so "which seeds share this rising query" and
+        "new rising queries since yesterday" are dictionary lookups instead
+        of scans over nested DataFrames.
+        """
+        self._strings: List[str] = []
+        self._ids: Dict[str, int] = {}
+        # Edge -> [(day ordinal, value), ...], oldest first, one entry per day
+        self._history: Dict[Edge, List[Tuple[int, Any]]] = {}
+        # (kind, query) -> seeds, and (kind, seed) -> queries in the order last seen
+        self._seeds: Dict[Tuple[int, int], Set[int]] = {}
+        self._queries: Dict[Tuple[int, int], Dict[int, None]] = {}
+        # (kind, query) -> day first seen, and (kind, day) -> queries first seen that day
+        self._first_seen: Dict[Tuple[int, int], int] = {}
+        self._new_by_day: Dict[Tuple[int, int], Set[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._history)
+
+    def intern(self, text: str) -> int:
+        """
+        Id of a string, adding it on first use
+
+        :param text: Keyword, query or kind
+        :return: Id
+        """
+        string_id = self._ids.get(text)
+        if string_id is None:
+            string_id = self._ids[text] = len(self._strings)
+            self._strings.append(sys.intern(text))
+        return string_id
+
+    def string(self, string_id: int) -> str:
+        """
+        String of an id returned by intern()
+        """
+        return self._strings[string_id]
+
+    def add(self, seed: str, query: str, kind: str, value: Any, observed: date = None):
+        """
+        Record one related search of a seed keyword
+
+        :param seed: Seed keyword
+        :param query: Related query (or topic title)
+        :param kind: 'top', 'rising', ...
+        :param value: Value Trends gave the query
+        :param observed: Day it was seen (defaults to today); seeing it again
+                         the same day replaces the value
+        """
+        day = (observed or date.today()).toordinal()
+        seed_id, query_id, kind_id = self.intern(seed), self.intern(query), self.intern(kind)
+        edge = (seed_id, query_id, kind_id)
+
+        history = self._history.get(edge)
+        if history is None:
+            history = self._history[edge] = []
+            self._seeds.setdefault((kind_id, query_id), set()).add(seed_id)
+
+        if history and history[-1][0] == day:
+            history[-1] = (day, _plain(value))
+        elif not history or history[-1][0] < day:
+            history.append((day, _plain(value)))
+        else:
+            # An older observation arriving late; keep one entry per day, in day order
+            days = dict(history)
+            days[day] = _plain(value)
+            history[:] = sorted(days.items())
+
+        queries = self._queries.setdefault((kind_id, seed_id), {})
+        queries.pop(query_id, None)
+        queries[query_id] = None
+
+        first_seen = self._first_seen.get((kind_id, query_id))
+        if first_seen is None or day < first_seen:
+            if first_seen is not None:
+                self._new_by_day[(kind_id, first_seen)].discard(query_id)
+            self._first_seen[(kind_id, query_id)] = day
+            self._new_by_day.setdefault((kind_id, day), set()).add(query_id)
+
+    def add_related(self,
+                    related: Dict[str, Dict[str, Optional[pd.DataFrame]]],
+                    observed: date = None,
+                    suffix: str = ''):
+        """
+        Record the related searches returned by a fetcher
+
+        :param related: Keyword -> {'top': DataFrame, 'rising': DataFrame}
+                        (frames may be None when Trends has none)
+        :param observed: Day they were fetched (defaults to today)
+        :param suffix: Appended to the kinds, e.g. '_topics' for related topics
+        """
+        for seed, frames in related.items():
+            for kind in RELATED_KINDS:
+                frame = frames.get(kind) if frames else None
+                if not isinstance(frame, pd.DataFrame) or frame.empty or 'value' not in frame.columns:
+                    continue
+                labels = related_labels(frame)
+                if labels is None:
+                    continue
+                for query, value in zip(labels.tolist(), frame['value'].tolist()):
+                    if isinstance(query, str):
+                        self.add(seed, query, kind + suffix, value, observed)
+
+    def seeds_for(self, query: str, kind: str = 'rising') -> List[str]:
+        """
+        Seed keywords that share a related query
+
+        :param query: Related query
+        :param kind: 'top', 'rising', ...
+        :return: Seed keywords, sorted
+        """
+        key = (self._ids.get(kind), self._ids.get(query))
+        return sorted(self._strings[seed_id] for seed_id in self._seeds.get(key, ()))
+
+    def queries_for(self, seed: str, kind: str = 'rising') -> List[str]:
+        """
+        Related queries of a seed keyword, most recently seen last
+
+        :param seed: Seed keyword
+        :param kind: 'top', 'rising', ...
+        :return: Queries
+        """
+        key = (self._ids.get(kind), self._ids.get(seed))
+        return [self._strings[query_id] for query_id in self._queries.get(key, ())]
+
+    def shared_queries(self, kind: str = 'rising', min_seeds: int = 2) -> Dict[str, List[str]]:
+        """
+        Related queries shared by several seed keywords
+
+        :param kind: 'top', 'rising', ...
+        :param min_seeds: Minimum number of seeds sharing a query
+        :return: Query -> seed keywords, most shared first
+        """
+        kind_id = self._ids.get(kind)
+        shared = [(query_id, seeds) for (edge_kind, query_id), seeds in self._seeds.items()
+                  if edge_kind == kind_id and len(seeds) >= min_seeds]
+        shared.sort(key=lambda item: -len(item[1]))
+        return {self._strings[query_id]: sorted(self._strings[seed_id] for seed_id in seeds)
+                for query_id, seeds in shared}
+
+    def new_queries(self, since: date, kind: str = 'rising') -> pd.DataFrame:
+        """
+        Related queries seen for the first time after a day
+
+        :param since: Last day already reported (e.g. yesterday)
+        :param kind: 'top', 'rising', ...
+        :return: Frame with the NEW_QUERY_COLUMNS, highest latest value first;
+                 ``value`` is the highest latest value over the seeds
+        """
+        kind_id = self._ids.get(kind)
+        days = sorted(day for edge_kind, day in self._new_by_day if edge_kind == kind_id and day > since.toordinal())
+        rows = []
+        for day in days:
+            for query_id in self._new_by_day[(kind_id, day)]:
+                seeds = self._seeds[(kind_id, query_id)]
+                value = max(self._history[(seed_id, query_id, kind_id)][-1][1] for seed_id in seeds)
+                rows.append({
+                    'query': self._strings[query_id],
+                    'seeds': ', '.join(sorted(self._strings[seed_id] for seed_id in seeds)),
+                    'first_seen': date.fromordinal(day),
+                    'value': value,
+                })
+
+        frame = pd.DataFrame(rows, columns=NEW_QUERY_COLUMNS)
+        return frame.sort_values('value', ascending=False, kind='stable').reset_index(drop=True)
+
+    def history(self, seed: str, query: str, kind: str = 'rising') -> pd.Series:
+        """
+        Values of one edge over time
+
+        :param seed: Seed keyword
+        :param query: Related query
+        :param kind: 'top', 'rising', ...
+        :return: Series indexed by day
+        """
+        edge = (self._ids.get(seed), self._ids.get(query), self._ids.get(kind))
+        entries = self._history.get(edge, [])
+        return pd.Series([value for _, value in entries],
+                         index=pd.DatetimeIndex([date.fromordinal(day) for day, _ in entries], name='date'),
+                         name=query, dtype='float64')
+
+    def related_frames(self, seed: str, suffix: str = '') -> Dict[str, pd.DataFrame]:
+        """
+        Latest related searches of a seed, in the form the Excel report takes
+
+        Only queries seen on the seed's last day are listed, in the order
+        Trends ranked them.
+
+        :param seed: Seed keyword
+        :param suffix: Kind suffix used in add_related
+        :return: {'top': DataFrame, 'rising': DataFrame} with query and value columns
+        """
+        frames = {}
+        seed_id = self._ids.get(seed)
+        for kind in RELATED_KINDS:
+            kind_id = self._ids.get(kind + suffix)
+            query_ids = list(self._queries.get((kind_id, seed_id), ()))
+            last_days = [self._history[(seed_id, query_id, kind_id)][-1][0] for query_id in query_ids]
+            query_ids = [query_id for query_id, day in zip(query_ids, last_days) if day == max(last_days)]
+            frames[kind] = pd.DataFrame({
+                'query': [self._strings[query_id] for query_id in query_ids],
+                'value': [self._history[(seed_id, query_id, kind_id)][-1][1] for query_id in query_ids],
+            })
+        return frames
+
+    def save(self, path: str):
+        """
+        Write the graph to a JSON file, replacing it atomically
+
+        :param path: File path
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Edges are listed in the order they were last seen, so load() restores that order
+        state = {
+            'strings': self._strings,
+            'edges': [[seed_id, query_id, kind_id, self._history[(seed_id, query_id, kind_id)]]
+                      for (kind_id, seed_id), queries in self._queries.items() for query_id in queries],
+        }
+        temporary = f'{path}.tmp'
+        with open(temporary, 'w') as f:
+            json.dump(state, f, separators=(',', ':'))
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'QueryGraph':
+        """
+        Restore a graph saved with save(), or start an empty one
+
+        :param path: File path
+        :return: QueryGraph
+        """
+        graph = cls()
+        if not os.path.exists(path):
+            return graph
+
+        with open(path) as f:
+            state = json.load(f)
+
+        for text in state['strings']:
+            graph.intern(text)
+        for seed_id, query_id, kind_id, history in state['edges']:
+            seed, query, kind = graph._strings[seed_id], graph._strings[query_id], graph._strings[kind_id]
+            for day, value in history:
+                graph.add(seed, query, kind, value, date.fromordinal(day))
+        return graph
+
+
+def update_query_graph(related: Dict[str, Dict[str, Optional[pd.DataFrame]]],
+                       path: str,
+                       observed: date = None,
+                       suffix: str = '') -> QueryGraph:
+    """
+    Add freshly fetched related searches to the persisted graph and save it again
+
+    :param related: Keyword -> {'top': DataFrame, 'rising': DataFrame}
+    :param path: Graph file
+    :param observed: Day they were fetched (defaults to today)
+    :param suffix: Kind suffix, e.g. '_topics' for related topics
+    :return: The updated graph
+    """
+    graph = QueryGraph.load(path)
+    graph.add_related(related, observed, suffix)
+    graph.save(path)
+    return graph
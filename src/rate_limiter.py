@@ -0,0 +1,367 @@
+import time
+import random
+import asyncio
+import logging
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+import requests
+
+from instrumentation import metrics
+
+# HTTP status codes treated as throttling or transient server errors
+THROTTLE_STATUS_CODES = (429,)
+TRANSIENT_STATUS_CODES = (500, 502, 503, 504)
+
+# Network errors worth retrying
+TRANSIENT_ERRORS = (
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+    ConnectionError,
+    TimeoutError,
+    asyncio.TimeoutError,
+)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a Retry-After header value
+
+    :param value: Header value, either delay seconds or an HTTP date
+    :return: Delay in seconds, or None if the value is missing or invalid
+    """
+    if not value:
+        return None
+
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def _response_of(error: Exception) -> Optional[Any]:
+    """
+    Return the HTTP response attached to a pytrends or requests error
+    """
+    return getattr(error, 'response', None)
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float = 1.0):
+        """
+        Token bucket refilled continuously at ``rate`` tokens per second
+
+        :param rate: Refill rate in tokens per second
+        :param capacity: Maximum number of tokens (burst size)
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = None
+
+    def reserve(self, now: float) -> float:
+        """
+        Take one token and return how long the caller must wait for it
+
+        :param now: Current monotonic time
+        :return: Delay in seconds before the reserved token is available
+        """
+        if self.updated is not None:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+
+class AdaptiveRateLimiter:
+    def __init__(self,
+                 rate: float = 1.0,
+                 min_rate: float = 0.05,
+                 max_rate: float = 5.0,
+                 burst: float = 1.0,
+                 increase: float = 0.05,
+                 decrease: float = 0.5,
+                 max_retries: int = 4,
+                 base_delay: float = 2.0,
+                 max_delay: float = 120.0,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        """
+        Shared, thread-safe rate limiter for Google Trends endpoints
+
+        Every endpoint gets its own token bucket. The bucket's rate grows
+        additively while requests succeed and is cut multiplicatively when
+        Google throttles, so the limiter settles just under the allowed
+        request rate. A 429 also pauses every endpoint until its Retry-After
+        (or the exponential backoff delay) has passed.
+
+        :param rate: Initial requests per second for each endpoint
+        :param min_rate: Lower bound for adaptive rates
+        :param max_rate: Upper bound for adaptive rates
+        :param burst: Bucket capacity (requests allowed back to back)
+        :param increase: Rate added after each successful request
+        :param decrease: Factor applied to the rate after throttling
+        :param max_retries: Retries per call before giving up
+        :param base_delay: First backoff delay in seconds
+        :param max_delay: Upper bound for backoff delays in seconds
+        :param clock: Monotonic clock, injectable for tests
+        :param sleep: Sleep function, injectable for tests
+        """
+        self.initial_rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.increase = increase
+        self.decrease = decrease
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.clock = clock
+        self.sleep = sleep
+
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+
+    def _bucket(self, endpoint: str) -> TokenBucket:
+        bucket = self._buckets.get(endpoint)
+        if bucket is None:
+            bucket = TokenBucket(self.initial_rate, self.burst)
+            self._buckets[endpoint] = bucket
+        return bucket
+
+    def rate(self, endpoint: str) -> float:
+        """
+        Return the current request rate of an endpoint
+
+        :param endpoint: Endpoint name
+        :return: Requests per second
+        """
+        with self._lock:
+            return self._bucket(endpoint).rate
+
+    def acquire(self, endpoint: str) -> float:
+        """
+        Block until a request to ``endpoint`` is allowed
+
+        :param endpoint: Endpoint name
+        :return: Seconds spent waiting
+        """
+        wait = self.reserve(endpoint)
+        if wait > 0:
+            self.sleep(wait)
+        return wait
+
+    def reserve(self, endpoint: str) -> float:
+        """
+        Reserve a request slot without blocking
+
+        :param endpoint: Endpoint name
+        :return: Seconds the caller must wait before sending the request
+        """
+        with self._lock:
+            now = self.clock()
+            pause = max(0.0, self._paused_until - now)
+            return pause + self._bucket(endpoint).reserve(now + pause)
+
+    def record_success(self, endpoint: str):
+        """
+        Speed an endpoint up after a successful request
+
+        :param endpoint: Endpoint name
+        """
+        with self._lock:
+            bucket = self._bucket(endpoint)
+            bucket.rate = min(self.max_rate, bucket.rate + self.increase)
+
+    def record_throttle(self, endpoint: str, retry_after: float = None):
+        """
+        Slow an endpoint down after Google throttled it
+
+        :param endpoint: Endpoint name
+        :param retry_after: Server-requested delay in seconds, if any
+        """
+        with self._lock:
+            bucket = self._bucket(endpoint)
+            bucket.rate = max(self.min_rate, bucket.rate * self.decrease)
+            if retry_after:
+                self._paused_until = max(self._paused_until, self.clock() + retry_after)
+
+    def backoff_delay(self, attempt: int) -> float:
+        """
+        Exponential backoff with jitter
+
+        :param attempt: Zero-based retry attempt
+        :return: Delay in seconds
+        """
+        delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    @staticmethod
+    def classify(error: Exception) -> Tuple[str, Optional[float]]:
+        """
+        Classify a request error
+
+        :param error: Exception raised by pytrends, requests or aiohttp
+        :return: ('throttled' | 'transient' | 'fatal', Retry-After seconds)
+        """
+        response = _response_of(error)
+        if response is not None:
+            status = getattr(response, 'status_code', None)
+            headers = getattr(response, 'headers', None) or {}
+        else:
+            # aiohttp.ClientResponseError carries status and headers itself
+            status = getattr(error, 'status', None)
+            headers = getattr(error, 'headers', None) or {}
+
+        if status in THROTTLE_STATUS_CODES:
+            return 'throttled', parse_retry_after(headers.get('Retry-After'))
+        if status in TRANSIENT_STATUS_CODES:
+            return 'transient', None
+        if isinstance(error, TRANSIENT_ERRORS):
+            return 'transient', None
+        return 'fatal', None
+
+    @staticmethod
+    def _count_error(endpoint: str, kind: str):
+        metrics.increment('request_errors', endpoint=endpoint, kind=kind)
+        if kind == 'throttled':
+            metrics.increment('throttled', endpoint=endpoint)
+
+    def call(self, endpoint: str, func: Callable, *args, **kwargs) -> Any:
+        """
+        Run ``func`` under the limiter, retrying throttled and transient errors
+
+        :param endpoint: Endpoint name used for budgeting
+        :param func: Callable performing the request
+        :return: Whatever ``func`` returns
+        """
+        attempt = 0
+        while True:
+            metrics.observe('rate_limit_wait', self.acquire(endpoint), endpoint=endpoint)
+            metrics.increment('requests', endpoint=endpoint)
+            try:
+                with metrics.span('request', endpoint=endpoint):
+                    result = func(*args, **kwargs)
+            except Exception as e:
+                kind, retry_after = self.classify(e)
+                self._count_error(endpoint, kind)
+                if kind == 'fatal' or attempt >= self.max_retries:
+                    raise
+
+                if kind == 'throttled':
+                    self.record_throttle(endpoint, retry_after)
+                delay = max(retry_after or 0.0, self.backoff_delay(attempt))
+                self.logger.warning(f"{endpoint} {kind} ({e}); retrying in {delay:.1f}s")
+                metrics.increment('retries', endpoint=endpoint)
+                self.sleep(delay)
+                attempt += 1
+                continue
+
+            self.record_success(endpoint)
+            return result
+
+    async def acall(self, endpoint: str, func: Callable[..., Awaitable], *args, **kwargs) -> Any:
+        """
+        Asyncio counterpart of call(): await ``func`` under the limiter
+
+        :param endpoint: Endpoint name used for budgeting
+        :param func: Coroutine function performing the request
+        :return: Whatever ``func`` returns
+        """
+        attempt = 0
+        while True:
+            wait = self.reserve(endpoint)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            metrics.observe('rate_limit_wait', wait, endpoint=endpoint)
+            metrics.increment('requests', endpoint=endpoint)
+            try:
+                with metrics.span('request', endpoint=endpoint):
+                    result = await func(*args, **kwargs)
+            except Exception as e:
+                kind, retry_after = self.classify(e)
+                self._count_error(endpoint, kind)
+                if kind == 'fatal' or attempt >= self.max_retries:
+                    raise
+
+                if kind == 'throttled':
+                    self.record_throttle(endpoint, retry_after)
+                delay = max(retry_after or 0.0, self.backoff_delay(attempt))
+                self.logger.warning(f"{endpoint} {kind} ({e}); retrying in {delay:.1f}s")
+                metrics.increment('retries', endpoint=endpoint)
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+
+            self.record_success(endpoint)
+            return result
+
+
+class RetryQueue:
+    def __init__(self, max_attempts: int = 2):
+        """
+        Queue of work items that failed and should be retried later
+
+        :param max_attempts: Retries allowed per item before it is given up
+        """
+        self.max_attempts = max_attempts
+        self._items: Deque[Any] = deque()
+        self._attempts: Dict[Any, int] = {}
+        self.errors: Dict[Any, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def push(self, item: Any, error: Exception = None) -> bool:
+        """
+        Queue a failed item for another attempt
+
+        :param item: Hashable work item (e.g. keyword or tuple of keywords)
+        :param error: Error that made the item fail
+        :return: True if queued, False if it ran out of attempts
+        """
+        if error is not None:
+            self.errors[item] = str(error)
+
+        attempts = self._attempts.get(item, 0)
+        if attempts >= self.max_attempts:
+            return False
+
+        self._attempts[item] = attempts + 1
+        self._items.append(item)
+        return True
+
+    def pop(self) -> Any:
+        """
+        Take the oldest queued item
+
+        :return: Work item
+        """
+        item = self._items.popleft()
+        self.errors.pop(item, None)
+        return item
+
+    def exhausted(self) -> List[Any]:
+        """
+        Return items that failed and ran out of attempts
+
+        :return: List of work items
+        """
+        return [item for item in self.errors if item not in self._items]
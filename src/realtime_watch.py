@@ -0,0 +1,344 @@
+import json
+import time
+import threading
+import urllib.request
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import metrics
+from series_stitching import overlap_scale
+from advanced_trends_fetcher import MAX_PAYLOAD_KEYWORDS
+
+# Near-real-time timeframes polled by the watch, with the seconds between polls of each
+WATCH_INTERVALS = {
+    'now 1-H': 60,
+    'now 4-H': 5 * 60,
+    'now 1-d': 8 * 60,
+}
+
+# Points kept per keyword and timeframe (a day of minutes)
+RING_CAPACITY = 1440
+
+# Requests one payload costs per poll: the explore request and interest over time
+REQUESTS_PER_PAYLOAD = 2
+
+# Fields of an alert passed to the callback
+ALERT_FIELDS = ['keyword', 'timeframe', 'time', 'value', 'baseline', 'score']
+
+
+class RingBuffer:
+    def __init__(self, capacity: int = RING_CAPACITY):
+        """
+        Fixed-size buffer of the latest timestamped points of one series
+
+        Times and values live in two preallocated arrays; once full, every
+        new point overwrites the oldest, so memory stays constant however
+        long the watch runs.
+
+        :param capacity: Points kept
+        """
+        self.capacity = capacity
+        self.times = np.zeros(capacity, dtype='datetime64[s]')
+        self.values = np.zeros(capacity)
+        self._start = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def last_time(self) -> Optional[np.datetime64]:
+        if not self._size:
+            return None
+        return self.times[(self._start + self._size - 1) % self.capacity]
+
+    def _order(self) -> np.ndarray:
+        return (self._start + np.arange(self._size)) % self.capacity
+
+    def clear(self):
+        self._start = 0
+        self._size = 0
+
+    def extend(self, times: np.ndarray, values: np.ndarray):
+        """
+        Append points, oldest first, dropping the oldest kept points when full
+        """
+        for point_time, value in zip(times[-self.capacity:], values[-self.capacity:]):
+            position = (self._start + self._size) % self.capacity
+            self.times[position] = point_time
+            self.values[position] = value
+            if self._size < self.capacity:
+                self._size += 1
+            else:
+                self._start = (self._start + 1) % self.capacity
+
+    def to_series(self) -> pd.Series:
+        """
+        Kept points, oldest first
+
+        :return: Series indexed by time
+        """
+        order = self._order()
+        return pd.Series(self.values[order], index=pd.DatetimeIndex(self.times[order], name='date'))
+
+    def merge(self, window: pd.Series, min_overlap: int = 3) -> pd.Series:
+        """
+        Add the points of a freshly polled window that are not kept yet
+
+        Consecutive polls overlap, and every poll is scaled to its own peak.
+        The window is rescaled onto the buffer by least squares over the
+        shared timestamps, and only points after the last kept one are
+        appended, so no point is counted twice. A window that shares too
+        little with the buffer (after a pause longer than the window) starts
+        the buffer over.
+
+        A window landing in an empty or restarted buffer only seeds it: its
+        points are history, not news, so none of them is returned.
+
+        :param window: Complete points of the new window, indexed by time
+        :param min_overlap: Minimum shared points to align the window
+        :return: Points after the buffer's previous last point, on its scale
+                 (empty when the window seeded the buffer)
+        """
+        window = window.dropna()
+        if window.empty:
+            return window
+
+        seeded = True
+        if self._size:
+            scale = overlap_scale(self.to_series(), window, min_overlap)
+            if scale is None:
+                self.clear()
+            else:
+                last_time = pd.Timestamp(self.last_time)
+                window = window[window.index > last_time] * scale
+                seeded = False
+
+        times = pd.DatetimeIndex(window.index).to_numpy().astype('datetime64[s]')
+        self.extend(times, window.to_numpy(dtype='float64'))
+        return window.iloc[:0] if seeded else window
+
+
+def print_alert(alert: dict):
+    """
+    Default alert callback: print the alert
+    """
+    print(f"Spike in {alert['keyword']} ({alert['timeframe']}) at {alert['time']}: "
+          f"{alert['value']:.1f} against {alert['baseline']:.1f} (score {alert['score']:.1f})")
+
+
+def webhook_alert(url: str, timeout: float = 5.0) -> Callable[[dict], None]:
+    """
+    Alert callback that posts every alert as JSON to a webhook
+
+    Delivery errors are printed rather than raised, so an unreachable
+    webhook never stops the watch.
+
+    :param url: Webhook URL (e.g. a local chat or pager relay)
+    :param timeout: Seconds to wait for the webhook
+    :return: Callback for RealtimeWatch
+    """
+    def send(alert: dict):
+        request = urllib.request.Request(
+            url, data=json.dumps(alert).encode('utf-8'),
+            headers={'Content-Type': 'application/json'}, method='POST'
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                response.read()
+        except Exception as e:
+            print(f"Could not deliver alert for {alert['keyword']} to {url}: {e}")
+
+    return send
+
+
+class RealtimeWatch:
+    def __init__(self,
+                 fetcher,
+                 keywords: List[str],
+                 timeframes: List[str] = None,
+                 intervals: Dict[str, float] = None,
+                 requests_per_hour: float = None,
+                 capacity: int = RING_CAPACITY,
+                 threshold: float = 4.0,
+                 warmup: int = 30,
+                 min_scale: float = 1.0,
+                 batch_size: int = 1,
+                 on_alert: Callable[[dict], None] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Long-running near-real-time watch over a hot subset of keywords
+
+        Every timeframe ('now 1-H', 'now 4-H', 'now 1-d') is polled on its own
+        interval through the fetcher's rate limiter, skipping the response
+        cache. Complete points of each poll are merged into a RingBuffer per
+        keyword and timeframe, so overlapping polls never count a point
+        twice. The first poll (and the first after a gap the buffer cannot
+        bridge) only seeds the buffer; from then on each point newer than
+        the previous poll's is scored against the buffer before it (robust
+        z-score: distance from the median in scaled MADs); when a score
+        crosses ``threshold`` the alert callback fires right away, once per
+        spike, and re-arms when the series drops back below it.
+
+        With ``requests_per_hour`` set, intervals are stretched evenly until
+        the planned polls fit the budget.
+
+        :param fetcher: AdvancedTrendsFetcher whose sessions and rate limiter are used
+        :param keywords: Keywords to watch
+        :param timeframes: Timeframes to poll (defaults to WATCH_INTERVALS)
+        :param intervals: Seconds between polls per timeframe (defaults to WATCH_INTERVALS)
+        :param requests_per_hour: Request budget of the watch
+        :param capacity: Points kept per keyword and timeframe
+        :param threshold: Score at which a point counts as a spike
+        :param warmup: Points a buffer needs before its scores count
+        :param min_scale: Lower bound for deviations
+        :param batch_size: Number of keywords per payload
+        :param on_alert: Called with every alert dict (defaults to print_alert)
+        :param clock: Monotonic clock, injectable for tests
+        """
+        self.fetcher = fetcher
+        self.keywords = list(dict.fromkeys(keywords))
+        self.timeframes = list(timeframes or WATCH_INTERVALS)
+        self.capacity = capacity
+        self.threshold = threshold
+        self.warmup = warmup
+        self.min_scale = min_scale
+        self.on_alert = on_alert or print_alert
+        self.clock = clock
+
+        per_payload = max(1, min(batch_size, MAX_PAYLOAD_KEYWORDS))
+        self.batches = [tuple(self.keywords[i:i + per_payload]) for i in range(0, len(self.keywords), per_payload)]
+
+        intervals = intervals or WATCH_INTERVALS
+        self.intervals = {timeframe: float(intervals.get(timeframe, WATCH_INTERVALS.get(timeframe, 300)))
+                          for timeframe in self.timeframes}
+        needed = self.requests_per_hour()
+        if requests_per_hour is not None and needed > requests_per_hour:
+            stretch = needed / requests_per_hour
+            self.intervals = {timeframe: interval * stretch for timeframe, interval in self.intervals.items()}
+            print(f"Polls need {needed:.0f} requests an hour; intervals stretched {stretch:.1f}x "
+                  f"to fit {requests_per_hour:.0f}")
+
+        self.buffers: Dict[Tuple[str, str], RingBuffer] = {
+            (keyword, timeframe): RingBuffer(capacity) for keyword in self.keywords for timeframe in self.timeframes
+        }
+        # Series currently above the threshold, which do not alert again until they drop below it
+        self._spiking = set()
+        self._stop = threading.Event()
+
+    def requests_per_hour(self) -> float:
+        """
+        Requests the planned polls make in an hour
+        """
+        return sum(3600 / interval * len(self.batches) * REQUESTS_PER_PAYLOAD
+                   for interval in self.intervals.values())
+
+    def series(self, keyword: str, timeframe: str) -> pd.Series:
+        """
+        Points kept for a keyword and timeframe, oldest first
+
+        :param keyword: Keyword
+        :param timeframe: Polled timeframe
+        :return: Series indexed by time, on the scale of the buffer's first poll
+        """
+        return self.buffers[(keyword, timeframe)].to_series()
+
+    def _score(self, buffer: RingBuffer, appended: pd.Series) -> np.ndarray:
+        """
+        Robust z-score of each appended point against the points kept before it
+        """
+        kept = buffer.to_series().to_numpy()
+        history = kept[:len(kept) - len(appended)]
+        scores = np.zeros(len(appended))
+        for position, value in enumerate(appended.to_numpy(dtype='float64')):
+            if len(history) >= self.warmup:
+                median = np.median(history)
+                mad = np.median(np.abs(history - median))
+                scores[position] = (value - median) / max(1.4826 * mad, self.min_scale)
+            history = np.append(history[-(self.capacity - 1):], value)
+        return scores
+
+    def poll(self, timeframe: str) -> List[dict]:
+        """
+        Poll one timeframe for every keyword, merge the new points and raise alerts
+
+        :param timeframe: Timeframe to poll
+        :return: Alerts raised by this poll
+        """
+        fetcher = self.fetcher
+
+        def fetch_batch(batch):
+            return fetcher._fetch_frame('interest_over_time', list(batch), timeframe, fresh=True)
+
+        with metrics.span('stage', stage='watch'):
+            frames = fetcher._run_with_retries(self.batches, fetch_batch, f'{timeframe} watch', fetcher.max_workers)
+
+        alerts = []
+        for batch, frame in frames.items():
+            if frame.empty:
+                continue
+            complete = ~frame['isPartial'].astype(bool) if 'isPartial' in frame.columns \
+                else pd.Series(True, index=frame.index)
+            for keyword in batch:
+                if keyword not in frame.columns:
+                    continue
+                key = (keyword, timeframe)
+                buffer = self.buffers[key]
+                appended = buffer.merge(frame.loc[complete, keyword].astype('float64'))
+                if appended.empty:
+                    continue
+
+                history = buffer.to_series().to_numpy()[:len(buffer) - len(appended)]
+                if not len(history):
+                    continue
+                baseline = float(np.median(history))
+                for point_time, value, score in zip(appended.index, appended.to_numpy(), self._score(buffer, appended)):
+                    if score < self.threshold:
+                        self._spiking.discard(key)
+                        continue
+                    if key in self._spiking:
+                        continue
+                    self._spiking.add(key)
+                    alerts.append({
+                        'keyword': keyword,
+                        'timeframe': timeframe,
+                        'time': pd.Timestamp(point_time).isoformat(),
+                        'value': float(value),
+                        'baseline': baseline,
+                        'score': float(score),
+                    })
+
+        for alert in alerts:
+            metrics.increment('watch_alerts')
+            self.on_alert(alert)
+        return alerts
+
+    def run(self, max_polls: int = None):
+        """
+        Poll every timeframe on its interval until stop() is called
+
+        :param max_polls: Stop after this many polls (runs until stopped if None)
+        """
+        print(f"Watching {len(self.keywords)} keyword(s) on {', '.join(self.timeframes)} "
+              f"({self.requests_per_hour():.0f} requests an hour)")
+        next_poll = {timeframe: self.clock() for timeframe in self.timeframes}
+        polls = 0
+        while not self._stop.is_set():
+            now = self.clock()
+            for timeframe in self.timeframes:
+                if next_poll[timeframe] > now or self._stop.is_set():
+                    continue
+                self.poll(timeframe)
+                next_poll[timeframe] = now + self.intervals[timeframe]
+                polls += 1
+                if max_polls is not None and polls >= max_polls:
+                    return
+            self._stop.wait(max(0.0, min(next_poll.values()) - self.clock()))
+
+    def stop(self):
+        """
+        Make run() return after the poll in progress
+        """
+        self._stop.set()
@@ -0,0 +1,310 @@
+import os
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import metrics
+from advanced_trends_fetcher import MAX_PAYLOAD_KEYWORDS, combine_region_frames, plan_keyword_batches
+
+# Files written by RegionalMatrix.write, under the output directory
+REGIONAL_CORRELATION_FILENAME = 'regional_rank_correlation.csv'
+REGIONAL_LEAD_LAG_FILENAME = 'regional_lead_lag.csv'
+
+# Columns of the frame returned by RegionalMatrix.lead_lag
+LEAD_LAG_COLUMNS = ['keyword', 'leader', 'follower', 'lag', 'lead_time', 'correlation']
+
+
+def _rank(values: np.ndarray) -> np.ndarray:
+    """
+    Average ranks along the last axis, NaN kept as NaN
+    """
+    shape = values.shape
+    flat = values.reshape(-1, shape[-1])
+    ranks = pd.DataFrame(flat.T).rank(axis=0, method='average').to_numpy().T
+    return ranks.reshape(shape)
+
+
+def _standardize(values: np.ndarray) -> np.ndarray:
+    """
+    Center and scale along the last axis, ignoring NaN; missing points become 0
+    """
+    with np.errstate(invalid='ignore', divide='ignore'):
+        centered = values - np.nanmean(values, axis=-1, keepdims=True)
+        scaled = centered / np.sqrt(np.nanmean(centered ** 2, axis=-1, keepdims=True))
+    return np.nan_to_num(scaled, nan=0.0, posinf=0.0, neginf=0.0)
+
+
+def _finite_mean(values: np.ndarray, axis: int) -> np.ndarray:
+    """
+    Mean over the finite values along an axis, NaN where there are none
+
+    Unlike np.nanmean, an all-NaN slice gives NaN without a RuntimeWarning.
+    """
+    finite = np.isfinite(values)
+    total = np.where(finite, values, 0.0).sum(axis=axis, keepdims=True)
+    count = finite.sum(axis=axis, keepdims=True)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return total / count
+
+
+def _pairwise_correlation(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """
+    Correlation of every region of x with every region of y, per keyword
+
+    :param x: Standardized values, keyword x region x time
+    :param y: Standardized values, same shape as x
+    :return: keyword x region x region
+    """
+    norms = np.sqrt(np.einsum('krt,krt->kr', x, x)[:, :, None] * np.einsum('kst,kst->ks', y, y)[:, None, :])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.nan_to_num(np.einsum('krt,kst->krs', x, y) / norms)
+
+
+class RegionalMatrix:
+    def __init__(self,
+                 fetcher,
+                 keywords: List[str],
+                 regions: List[str] = None,
+                 timeframe: str = 'today 3-m',
+                 anchor_keyword: str = None,
+                 batch_size: int = MAX_PAYLOAD_KEYWORDS):
+        """
+        Keyword x region x time cube on one comparable scale
+
+        Each region's interest over time is fetched with ``geo`` set to the
+        region, keywords batched under a shared anchor exactly as
+        analyze_keyword_demographics does, so the whole cube takes one
+        payload per region and batch plus one worldwide payload per batch.
+        Country scores take one more payload per keyword: in a batched
+        payload they would be each keyword's share of the batch, not its own
+        interest.
+        Trends scales every region to its own peak, so build() puts the
+        cube back on one scale: each series is divided by its mean and
+        multiplied by the keyword's worldwide mean interest (comparable across
+        keywords through the anchor) and by the region's weight, its worldwide
+        interest-by-country score relative to the keyword's average over the
+        regions. Equal values then mean equal interest, whatever the region
+        or keyword.
+
+        :param fetcher: AdvancedTrendsFetcher whose cache, limiter and store are used
+        :param keywords: Keywords to compare
+        :param regions: Region codes (defaults to the fetcher's regions, e.g. ['US', 'GB'])
+        :param timeframe: Google Trends timeframe
+        :param anchor_keyword: Keyword shared by every batch (defaults to the first keyword)
+        :param batch_size: Number of keywords per payload, anchor included
+        """
+        self.fetcher = fetcher
+        self.keywords = list(dict.fromkeys(keywords))
+        self.regions = list(regions or fetcher.regions)
+        self.timeframe = timeframe
+        self.anchor, self.batches = plan_keyword_batches(self.keywords, batch_size, anchor_keyword)
+
+        # Filled in by build()
+        self.index = pd.DatetimeIndex([], name='date')
+        self.cube = np.empty((len(self.keywords), len(self.regions), 0))
+        self.weights = pd.DataFrame(np.nan, index=self.keywords, columns=self.regions)
+
+    def _kw_list(self, batch: Tuple[str, ...]) -> List[str]:
+        return [self.anchor] + [keyword for keyword in batch if keyword != self.anchor]
+
+    def _fetch(self) -> Tuple[Dict[Tuple[str, Tuple[str, ...]], pd.DataFrame],
+                              Dict[Tuple[str, ...], Tuple[pd.DataFrame, pd.DataFrame]]]:
+        fetcher = self.fetcher
+
+        def fetch_regional(item):
+            region, batch = item
+            kw_list = self._kw_list(batch)
+            print(f"Fetching {region} for: {', '.join(kw_list)}")
+            return fetcher._fetch_frame('interest_over_time', kw_list, self.timeframe, geo=region)
+
+        def country_scores(keyword):
+            frame = fetcher._fetch_frame(
+                'interest_by_region', [keyword], self.timeframe, resolution='COUNTRY', inc_geo_code=True
+            )
+            return frame.set_index('geoCode') if 'geoCode' in frame.columns else pd.DataFrame()
+
+        def fetch_worldwide(batch):
+            kw_list = self._kw_list(batch)
+            print(f"Fetching worldwide for: {', '.join(kw_list)}")
+            # The anchor's own scores only once, with the first batch
+            scored = kw_list if batch == self.batches[0] else list(batch)
+            by_country = combine_region_frames([country_scores(keyword) for keyword in scored])
+            return by_country, fetcher._fetch_frame('interest_over_time', kw_list, self.timeframe)
+
+        items = [(region, batch) for region in self.regions for batch in self.batches]
+        regional = fetcher._run_with_retries(
+            items, fetch_regional, 'regional interest', fetcher.max_workers,
+            journal_scope=f'regional {self.timeframe} {self.anchor}'
+        )
+        worldwide = fetcher._run_with_retries(
+            self.batches, fetch_worldwide, 'worldwide interest', fetcher.max_workers,
+            journal_scope=f'worldwide {self.timeframe} {self.anchor}'
+        )
+        return regional, worldwide
+
+    def build(self) -> 'RegionalMatrix':
+        """
+        Fetch every region and normalize the cube
+
+        :return: self
+        """
+        with metrics.span('stage', stage='regional_matrix'):
+            regional, worldwide = self._fetch()
+
+        positions = {keyword: position for position, keyword in enumerate(self.keywords)}
+        region_positions = {region: position for position, region in enumerate(self.regions)}
+
+        # Union of the dates every payload returned
+        frames = [frame for frame in regional.values() if not frame.empty]
+        index = frames[0].index if frames else pd.DatetimeIndex([], name='date')
+        for frame in frames[1:]:
+            if not frame.index.equals(index):
+                index = index.union(frame.index)
+        self.index = index
+
+        # Raw cube; any per-payload scale cancels in the division by each series' mean below
+        cube = np.full((len(self.keywords), len(self.regions), len(index)), np.nan)
+        for (region, batch), frame in regional.items():
+            if frame.empty:
+                continue
+            frame = frame.reindex(index)
+            for keyword in self._kw_list(batch):
+                if keyword in positions and keyword in frame.columns:
+                    cube[positions[keyword], region_positions[region]] = frame[keyword].to_numpy(dtype='float64')
+
+        # Worldwide level of every keyword (comparable through the anchor) and country weights
+        level = np.full(len(self.keywords), np.nan)
+        scores = np.full((len(self.keywords), len(self.regions)), np.nan)
+        reference = None
+        for batch, (by_country, over_time) in worldwide.items():
+            kw_list = self._kw_list(batch)
+            if not over_time.empty and self.anchor in over_time.columns:
+                anchor_mean = over_time[self.anchor].mean()
+                if anchor_mean > 0:
+                    reference = reference or anchor_mean
+                    for keyword in kw_list:
+                        if keyword in positions:
+                            level[positions[keyword]] = over_time[keyword].mean() * reference / anchor_mean
+
+            for keyword in kw_list:
+                if keyword in positions and keyword in by_country.columns:
+                    scores[positions[keyword]] = by_country[keyword].reindex(self.regions).to_numpy(dtype='float64')
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            weights = scores / _finite_mean(scores, axis=1)
+        missing = ~np.isfinite(weights)
+        if missing.any():
+            print(f"No country score for {int(missing.sum())} keyword/region pair(s); weighting them as average")
+            weights[missing] = 1.0
+        self.weights = pd.DataFrame(weights, index=self.keywords, columns=self.regions)
+
+        # One scale: series mean -> worldwide level x region weight
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = _finite_mean(cube, axis=2)
+            normalized = cube / means * (level[:, None, None] * weights[:, :, None])
+        self.cube = np.where(np.isfinite(normalized), normalized, np.where(means == 0, 0.0, np.nan))
+        return self
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        The normalized cube as a wide frame
+
+        :return: Frame indexed by date with (keyword, region) columns
+        """
+        columns = pd.MultiIndex.from_product([self.keywords, self.regions], names=['keyword', 'region'])
+        return pd.DataFrame(self.cube.reshape(-1, len(self.index)).T, index=self.index, columns=columns)
+
+    def rank_correlation(self, changes: bool = False) -> pd.DataFrame:
+        """
+        Spearman rank correlation between regions, for every keyword at once
+
+        Points a region is missing are left out of its ranks.
+
+        :param changes: Correlate period-over-period changes instead of levels
+        :return: Frame indexed by (keyword, region) with one column per region
+        """
+        values = np.diff(self.cube, axis=2) if changes else self.cube
+        ranks = _standardize(_rank(values))
+        correlation = _pairwise_correlation(ranks, ranks)
+
+        index = pd.MultiIndex.from_product([self.keywords, self.regions], names=['keyword', 'region'])
+        return pd.DataFrame(correlation.reshape(-1, len(self.regions)), index=index, columns=self.regions)
+
+    def lead_lag(self, max_lag: int = 7, changes: bool = True) -> pd.DataFrame:
+        """
+        Lag at which each region's interest best predicts another's
+
+        Every keyword and region pair is correlated at every lag from
+        -max_lag to max_lag in one einsum per lag. By default the
+        period-over-period changes are compared, so a shared trend does not
+        pass for a lead.
+
+        :param max_lag: Largest lag tried, in periods of the timeframe
+        :param changes: Correlate changes instead of levels
+        :return: Frame with the LEAD_LAG_COLUMNS, one row per keyword and region
+                 pair, strongest correlation first; ``leader`` moves ``lag``
+                 periods (``lead_time``) before ``follower``
+        """
+        values = np.diff(self.cube, axis=2) if changes else self.cube
+        length = values.shape[2]
+        lags = [lag for lag in range(0, max_lag + 1) if length - lag > 2]
+        if not lags or len(self.regions) < 2:
+            return pd.DataFrame(columns=LEAD_LAG_COLUMNS)
+
+        # by_lag[lag][k, a, b]: correlation of region a at t with region b at t + lag
+        by_lag = np.stack([
+            _pairwise_correlation(_standardize(values[:, :, :length - lag]), _standardize(values[:, :, lag:]))
+            for lag in lags
+        ])
+
+        step = pd.Series(self.index).diff().median() if len(self.index) > 1 else pd.NaT
+        upper = np.triu_indices(len(self.regions), k=1)
+        rows = []
+        for keyword_position, keyword in enumerate(self.keywords):
+            for a, b in zip(*upper):
+                # a leading b at lag L is by_lag[L, k, a, b]; b leading a is by_lag[L, k, b, a]
+                forward = by_lag[:, keyword_position, a, b]
+                backward = by_lag[:, keyword_position, b, a]
+                best_forward, best_backward = forward.argmax(), backward.argmax()
+                if forward[best_forward] >= backward[best_backward]:
+                    leader, follower, lag, correlation = a, b, lags[best_forward], forward[best_forward]
+                else:
+                    leader, follower, lag, correlation = b, a, lags[best_backward], backward[best_backward]
+                rows.append({
+                    'keyword': keyword,
+                    'leader': self.regions[leader],
+                    'follower': self.regions[follower],
+                    'lag': lag,
+                    'lead_time': step * lag if lag else pd.Timedelta(0),
+                    'correlation': round(float(correlation), 4),
+                })
+
+        frame = pd.DataFrame(rows, columns=LEAD_LAG_COLUMNS)
+        return frame.sort_values('correlation', ascending=False, kind='stable').reset_index(drop=True)
+
+    def write(self, output_dir: str = None, max_lag: int = 7) -> Tuple[str, str]:
+        """
+        Store the regional series and save the correlations and lead/lag table
+
+        The cube goes to the fetcher's store with ``geo`` set to each region.
+
+        :param output_dir: Directory of the CSV files (defaults to the fetcher's)
+        :param max_lag: Largest lag tried by lead_lag
+        :return: Paths of the rank correlation and lead/lag CSV files
+        """
+        output_dir = output_dir or self.fetcher.output_dir
+        if self.fetcher.store is not None:
+            for region_position, region in enumerate(self.regions):
+                series = {
+                    keyword: pd.DataFrame({keyword: self.cube[keyword_position, region_position]},
+                                          index=self.index).dropna()
+                    for keyword_position, keyword in enumerate(self.keywords)
+                }
+                self.fetcher.store.write_time_series(series, self.timeframe, geo=region)
+
+        correlation_path = os.path.join(output_dir, REGIONAL_CORRELATION_FILENAME)
+        self.rank_correlation().to_csv(correlation_path)
+        lead_lag_path = os.path.join(output_dir, REGIONAL_LEAD_LAG_FILENAME)
+        self.lead_lag(max_lag).to_csv(lead_lag_path, index=False)
+        return correlation_path, lead_lag_path
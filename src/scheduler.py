@@ -1,67 +1,289 @@
 import os
-import time
-import schedule
+import json
 import logging
-from datetime import datetime
+import calendar
 import threading
-from config import DAILY_REPORT_TIME, WEEKLY_REPORT_DAY, WEEKLY_REPORT_TIME, MONTHLY_REPORT_DAY, MONTHLY_REPORT_TIME
-from main import generate_and_send_report
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from functools import partial
+from config import (
+    DAILY_REPORT_TIME, WEEKLY_REPORT_DAY, WEEKLY_REPORT_TIME, MONTHLY_REPORT_DAY, MONTHLY_REPORT_TIME,
+    SCHEDULER_MAX_WORKERS, SCHEDULER_SHARE_MINUTES, METRICS_DIR
+)
+from main import execute_fetch_plan, generate_and_send_report
+from email_sender import EmailSender
+from instrumentation import metrics
+
+LOG_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "logs")
+os.makedirs(LOG_DIR, exist_ok=True)
 
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     handlers=[
-        logging.FileHandler(os.path.join(os.path.dirname(os.path.dirname(__file__)), "logs", "scheduler.log")),
+        logging.FileHandler(os.path.join(LOG_DIR, "scheduler.log")),
         logging.StreamHandler()
     ]
 )
 
 logger = logging.getLogger(__name__)
 
-def run_threaded(job_func, *args, **kwargs):
-    """
-    Run a job in a separate thread to avoid blocking the scheduler.
-    """
-    job_thread = threading.Thread(target=job_func, args=args, kwargs=kwargs)
-    job_thread.start()
+# Last run of each report type, kept across restarts for catch-up
+STATE_FILE = os.path.join(LOG_DIR, "scheduler_state.json")
+
+# Longest single sleep, so wall clock changes (DST, NTP) are picked up
+MAX_SLEEP_SECONDS = 3600
+
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+
+
+class ReportJob:
+    def __init__(self, report_type, time_of_day, weekday=None, month_day=None):
+        """
+        A report that fires at a fixed local time.
+
+        Args:
+            report_type (str): 'daily', 'weekly' or 'monthly'
+            time_of_day (str): Time as HH:MM
+            weekday (str): Only fire on this day of the week
+            month_day (int): Only fire on this day of the month (clamped to the month's length)
+        """
+        self.report_type = report_type
+        self.time_of_day = datetime.strptime(time_of_day, '%H:%M').time()
+        self.weekday = WEEKDAYS.index(weekday.lower()) if weekday else None
+        self.month_day = month_day
+
+    def _occurrence_on(self, day):
+        if self.weekday is not None and day.weekday() != self.weekday:
+            return None
+        if self.month_day is not None and day.day != min(self.month_day, calendar.monthrange(day.year, day.month)[1]):
+            return None
+        return datetime.combine(day, self.time_of_day)
 
-def schedule_reports():
+    def previous_run(self, moment):
+        """
+        Latest time the job was due at or before ``moment``.
+        """
+        for offset in range(32):
+            occurrence = self._occurrence_on(moment.date() - timedelta(days=offset))
+            if occurrence is not None and occurrence <= moment:
+                return occurrence
+        return None
+
+    def next_run(self, moment):
+        """
+        First time the job is due after ``moment``.
+        """
+        for offset in range(33):
+            occurrence = self._occurrence_on(moment.date() + timedelta(days=offset))
+            if occurrence is not None and occurrence > moment:
+                return occurrence
+        return None
+
+
+def default_jobs():
     """
-    Schedule daily, weekly, and monthly reports.
+    Daily, weekly and monthly report jobs from the configuration.
     """
-    # Schedule daily report
-    schedule.every().day.at(DAILY_REPORT_TIME).do(run_threaded, generate_and_send_report, "daily")
-    logger.info(f"Daily report scheduled for {DAILY_REPORT_TIME}")
-    
-    # Schedule weekly report
-    schedule.every().monday.at(WEEKLY_REPORT_TIME).do(run_threaded, generate_and_send_report, "weekly")
-    logger.info(f"Weekly report scheduled for {WEEKLY_REPORT_DAY} at {WEEKLY_REPORT_TIME}")
-    
-    # Schedule monthly report (on specified day of month)
-    def monthly_job():
-        # Check if today is the specified day of the month
-        if datetime.now().day == MONTHLY_REPORT_DAY:
-            generate_and_send_report("monthly")
-    
-    # Check daily at the specified time if it's the monthly report day
-    schedule.every().day.at(MONTHLY_REPORT_TIME).do(run_threaded, monthly_job)
-    logger.info(f"Monthly report scheduled for day {MONTHLY_REPORT_DAY} at {MONTHLY_REPORT_TIME}")
+    return [
+        ReportJob('daily', DAILY_REPORT_TIME),
+        ReportJob('weekly', WEEKLY_REPORT_TIME, weekday=WEEKLY_REPORT_DAY),
+        ReportJob('monthly', MONTHLY_REPORT_TIME, month_day=MONTHLY_REPORT_DAY),
+    ]
+
+
+class ReportScheduler:
+    def __init__(self,
+                 jobs=None,
+                 state_path=STATE_FILE,
+                 max_workers=SCHEDULER_MAX_WORKERS,
+                 share_window=timedelta(minutes=SCHEDULER_SHARE_MINUTES),
+                 run_report=None,
+                 fetch=execute_fetch_plan,
+                 clock=datetime.now):
+        """
+        Run report jobs on time, without overlap, and catch up after downtime.
+
+        The scheduler sleeps until the next job is due instead of polling.
+        Due jobs run on a fixed-size thread pool; a report type that is still
+        running is not started again, and only one job fetches from Google
+        at a time. Jobs due together fetch their data once through a shared
+        FetchPlan, and a job firing within ``share_window`` of a plan that
+        covered its requests reuses it. The last run of each report type is
+        saved to ``state_path``, so a job missed while the process was down
+        runs once on the next start. Emails go out in the background over
+        one pooled SMTP connection, so a slow mail server does not hold up
+        the next report.
+
+        Args:
+            jobs (list): ReportJob objects (defaults to default_jobs())
+            state_path (str): JSON file with the last run of each report type
+            max_workers (int): Report jobs that may run at once
+            share_window (timedelta): How long fetched data is reused
+            run_report (callable): Called as run_report(report_type, data)
+                (defaults to generate_and_send_report with background delivery)
+            fetch (callable): Called as fetch(report_types), returns an executed FetchPlan
+            clock (callable): Returns the current local time
+        """
+        self.jobs = jobs if jobs is not None else default_jobs()
+        self.state_path = state_path
+        self.share_window = share_window
+        self.email_sender = None
+        if run_report is None:
+            self.email_sender = EmailSender()
+            run_report = partial(generate_and_send_report, email_sender=self.email_sender, background=True)
+        self.run_report = run_report
+        self.fetch = fetch
+        self.clock = clock
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='report')
+        self._running = set()
+        self._lock = threading.Lock()
+        self._fetch_lock = threading.Lock()
+        self._shared = None
+        self._stop = threading.Event()
+        self.last_runs = self._load_state()
+
+    def _load_state(self):
+        try:
+            with open(self.state_path) as f:
+                return {report_type: datetime.fromisoformat(value) for report_type, value in json.load(f).items()}
+        except FileNotFoundError:
+            return {}
+        except (ValueError, TypeError) as e:
+            logger.warning(f"Ignoring unreadable scheduler state {self.state_path}: {e}")
+            return {}
+
+    def _save_state(self):
+        temporary = f"{self.state_path}.tmp"
+        with open(temporary, 'w') as f:
+            json.dump({report_type: value.isoformat() for report_type, value in self.last_runs.items()}, f, indent=2)
+        os.replace(temporary, self.state_path)
+
+    def due_jobs(self, now):
+        """
+        Jobs due at or before ``now`` that have not run since they were due.
+        """
+        due = []
+        for job in self.jobs:
+            previous = job.previous_run(now)
+            last_run = self.last_runs.get(job.report_type)
+            if previous is not None and (last_run is None or last_run < previous):
+                due.append(job)
+        return due
+
+    def next_wakeup(self, now):
+        """
+        Time the next job is due.
+        """
+        upcoming = [run for run in (job.next_run(now) for job in self.jobs) if run is not None]
+        return min(upcoming) if upcoming else now + timedelta(seconds=MAX_SLEEP_SECONDS)
+
+    def run_pending(self):
+        """
+        Start every due job that is not already running, as one group.
+
+        Returns:
+            Future of the group, or None if nothing was started
+        """
+        now = self.clock()
+        with self._lock:
+            report_types = [job.report_type for job in self.due_jobs(now) if job.report_type not in self._running]
+            if not report_types:
+                return None
+
+            self._running.update(report_types)
+            for report_type in report_types:
+                self.last_runs[report_type] = now
+            self._save_state()
+
+        logger.info(f"Starting {', '.join(report_types)} report(s)")
+        return self._executor.submit(self._run_group, report_types)
+
+    def _shared_plan(self, report_types):
+        # One fetch at a time; a recent plan covering these reports is reused
+        with self._fetch_lock:
+            if self._shared is not None:
+                fetched_at, plan = self._shared
+                if self.clock() - fetched_at <= self.share_window and plan.covers(report_types):
+                    logger.info(f"Reusing data fetched at {fetched_at:%H:%M:%S} for {', '.join(report_types)}")
+                    return plan
+
+            plan = self.fetch(report_types)
+            self._shared = (self.clock(), plan)
+            return plan
+
+    def _run_group(self, report_types):
+        try:
+            plan = self._shared_plan(report_types)
+            for report_type in report_types:
+                try:
+                    if self.run_report(report_type, plan.report_data(report_type)):
+                        logger.info(f"{report_type.capitalize()} report done")
+                    else:
+                        logger.error(f"{report_type.capitalize()} report failed")
+                except Exception as e:
+                    logger.error(f"Error running {report_type} report: {str(e)}")
+        except Exception as e:
+            logger.error(f"Error fetching data for {', '.join(report_types)} report(s): {str(e)}")
+        finally:
+            with self._lock:
+                self._running.difference_update(report_types)
+            self._write_metrics()
+
+    def _write_metrics(self):
+        # Counters accumulate over the scheduler's lifetime, like a Prometheus exporter's
+        try:
+            metrics.write(METRICS_DIR)
+        except OSError as e:
+            logger.warning(f"Could not write run metrics: {str(e)}")
+
+    def run(self):
+        """
+        Run jobs until stop() is called.
+        """
+        # Without saved state there is nothing to catch up on: start from now
+        now = self.clock()
+        with self._lock:
+            for job in self.jobs:
+                self.last_runs.setdefault(job.report_type, now)
+            self._save_state()
+
+        for job in self.jobs:
+            logger.info(f"{job.report_type.capitalize()} report next due {job.next_run(now):%Y-%m-%d %H:%M}")
+
+        try:
+            while not self._stop.is_set():
+                self.run_pending()
+                now = self.clock()
+                delay = (self.next_wakeup(now) - now).total_seconds()
+                self._stop.wait(min(max(delay, 0.0), MAX_SLEEP_SECONDS))
+        finally:
+            self._executor.shutdown(wait=True)
+            if self.email_sender is not None:
+                self.email_sender.close()
+
+    def stop(self):
+        """
+        Wake the scheduler up and make run() return once running jobs finish.
+        """
+        self._stop.set()
+
 
 def run_scheduler():
     """
     Run the scheduler continuously.
     """
-    schedule_reports()
-    
+    scheduler = ReportScheduler()
+
     logger.info("Scheduler started")
     logger.info("Press Ctrl+C to exit")
-    
+
     try:
-        while True:
-            schedule.run_pending()
-            time.sleep(60)  # Check every minute
+        scheduler.run()
     except KeyboardInterrupt:
+        scheduler.stop()
         logger.info("Scheduler stopped")
 
 if __name__ == "__main__":
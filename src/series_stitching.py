@@ -0,0 +1,88 @@
+import re
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+# Relative timeframes that Google Trends returns at daily resolution, in days
+DAILY_TIMEFRAME_DAYS = {
+    'today 1-m': 30,
+    'today 3-m': 90,
+}
+
+# Longest explicit date range Google Trends still returns at daily resolution
+MAX_DAILY_RANGE_DAYS = 269
+
+_DATE_RANGE = re.compile(r'^(\d{4}-\d{2}-\d{2}) (\d{4}-\d{2}-\d{2})$')
+
+
+def timeframe_window_days(timeframe: str) -> Optional[int]:
+    """
+    Return the length in days of a daily-resolution timeframe
+
+    :param timeframe: Google Trends timeframe
+    :return: Number of days, or None if the timeframe is not returned daily
+    """
+    timeframe = timeframe.strip()
+    if timeframe in DAILY_TIMEFRAME_DAYS:
+        return DAILY_TIMEFRAME_DAYS[timeframe]
+
+    match = _DATE_RANGE.match(timeframe)
+    if match:
+        start, end = (datetime.strptime(part, '%Y-%m-%d').date() for part in match.groups())
+        days = (end - start).days + 1
+        if 0 < days <= MAX_DAILY_RANGE_DAYS:
+            return days
+    return None
+
+
+def date_range_timeframe(start: date, end: date) -> str:
+    """
+    Format an explicit Google Trends date range timeframe
+
+    :param start: First day
+    :param end: Last day
+    :return: Timeframe string such as '2024-01-01 2024-03-31'
+    """
+    return f"{start:%Y-%m-%d} {end:%Y-%m-%d}"
+
+
+def overlap_scale(reference: pd.Series, new: pd.Series, min_overlap: int = 3) -> Optional[float]:
+    """
+    Least-squares factor that maps ``new`` onto the scale of ``reference``
+
+    Minimizes sum((reference - scale * new) ** 2) over the dates both series
+    share. Missing and all-zero overlaps carry no information.
+
+    :param reference: Series already on the target scale
+    :param new: Series to rescale
+    :param min_overlap: Minimum number of shared points
+    :return: Scale factor, or None if the overlap is too short or all zeros
+    """
+    reference, new = reference.align(new, join='inner')
+    mask = reference.notna().to_numpy() & new.notna().to_numpy()
+    if mask.sum() < min_overlap:
+        return None
+
+    ref_values = reference.to_numpy(dtype='float64')[mask]
+    new_values = new.to_numpy(dtype='float64')[mask]
+    denominator = np.dot(new_values, new_values)
+    if denominator == 0 or not ref_values.any():
+        return None
+    return float(np.dot(ref_values, new_values) / denominator)
+
+
+def stitch(reference: pd.Series, new: pd.Series, scale: float) -> pd.Series:
+    """
+    Extend ``reference`` with the points of ``new`` that come after it
+
+    :param reference: Stored series on the target scale
+    :param new: Newly fetched series, overlapping the end of ``reference``
+    :param scale: Factor mapping ``new`` onto the reference scale
+    :return: Combined series on the reference scale
+    """
+    if reference.empty:
+        return new * scale
+    newer = new[new.index > reference.index.max()] * scale
+    return pd.concat([reference, newer]).sort_index()
@@ -0,0 +1,311 @@
+import os
+import queue
+import shutil
+import multiprocessing
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from rate_limiter import AdaptiveRateLimiter
+from trends_store import TrendsStore
+from chart_renderer import CHART_MODES, regional_chart_jobs, render_charts
+from progress_journal import ProgressJournal, run_key
+from advanced_trends_fetcher import (
+    STORE_DIRNAME, AdvancedTrendsFetcher, plan_keyword_batches, split_batch_frames,
+    build_demographic_insights, write_summary_report, write_breakouts
+)
+
+# Directory of the per-shard checkpoint journals inside the output directory
+CHECKPOINT_DIRNAME = 'shard_checkpoints'
+
+# How often the writer checks on shards while no results arrive
+RESULT_POLL_SECONDS = 1.0
+
+# A unit of work: the keywords of one payload (the anchor is added when fetching)
+Unit = Tuple[str, ...]
+
+
+def plan_units(keywords: List[str],
+               batch_size: int,
+               anchor_keyword: str = None) -> Tuple[Optional[str], List[Unit]]:
+    """
+    Split keywords into payload units
+
+    :param keywords: Keywords to fetch
+    :param batch_size: Number of keywords per payload (1 disables batching)
+    :param anchor_keyword: Keyword shared by every batch (defaults to the first keyword)
+    :return: Anchor keyword (None without batching) and the units
+    """
+    if batch_size > 1:
+        return plan_keyword_batches(keywords, batch_size, anchor_keyword)
+    return None, [(keyword,) for keyword in dict.fromkeys(keywords)]
+
+
+def deal_units(units: List[Unit], shards: int) -> List[List[Unit]]:
+    """
+    Deal units round-robin over shards, so every shard gets a similar share
+
+    :param units: Units in plan order
+    :param shards: Number of shards
+    :return: Units of each shard
+    """
+    return [units[shard::shards] for shard in range(shards)]
+
+
+def _run_shard(shard: int,
+               units: List[Unit],
+               anchor: Optional[str],
+               anchor_unit: Optional[Unit],
+               timeframe: str,
+               options: Dict[str, Any],
+               results: multiprocessing.Queue):
+    """
+    Worker process: fetch the shard's units and stream each one to the writer
+
+    The anchor's regions are only fetched with ``anchor_unit``.
+    """
+    rate = options['rate']
+    fetcher = AdvancedTrendsFetcher(
+        regions=[],
+        output_dir=options['output_dir'],
+        use_cache=options['use_cache'],
+        rate_limiter=AdaptiveRateLimiter(rate=rate, min_rate=min(0.05, rate), max_rate=options['max_rate']),
+        max_item_retries=options['max_item_retries'],
+        chart_mode='skip',
+        session_class=options['session_class']
+    )
+
+    def fetch_unit(unit):
+        kw_list = [anchor] + list(unit) if anchor is not None else list(unit)
+        print(f"[shard {shard}] Fetching data for: {', '.join(kw_list)}")
+        region_keywords = kw_list if unit == anchor_unit else list(unit)
+        results.put(('unit', shard, unit, fetcher.fetch_payload_frames(kw_list, timeframe, region_keywords)))
+        return True
+
+    fetcher._run_with_retries(units, fetch_unit, 'demographics')
+    results.put(('done', shard, None, dict(fetcher.failures)))
+
+
+class ShardedRunner:
+    def __init__(self,
+                 keywords: List[str],
+                 timeframe: str = 'today 3-m',
+                 shards: int = 4,
+                 batch_size: int = 1,
+                 anchor_keyword: str = None,
+                 output_dir: str = 'trends_output',
+                 rate: float = 1.0,
+                 max_rate: float = 5.0,
+                 use_cache: bool = True,
+                 max_item_retries: int = 2,
+                 max_restarts: int = 2,
+                 chart_mode: str = 'parallel',
+                 chart_workers: int = None,
+                 session_class: type = None,
+                 compact_insights: bool = False,
+                 mp_context: multiprocessing.context.BaseContext = None):
+        """
+        Fetch a large keyword list across several worker processes
+
+        Payload units are dealt round-robin over ``shards`` processes. Each
+        worker has its own pytrends session and an equal share of the global
+        ``rate``/``max_rate`` request budget, and streams every finished unit
+        through a queue to this process, the only writer. The writer records
+        each unit in its shard's checkpoint journal as it arrives, so a shard
+        that crashes is restarted (up to ``max_restarts`` times) with only the
+        units it had not finished, and an interrupted run started again the
+        same day resumes from the journals. Once every shard is done the writer
+        rescales the batches onto one anchor, exactly as a single fetcher
+        would, and writes the store, the summary, the breakouts and charts.
+
+        :param keywords: Keywords to analyze
+        :param timeframe: Google Trends timeframe
+        :param shards: Number of worker processes
+        :param batch_size: Number of keywords per payload (1 disables batching)
+        :param anchor_keyword: Keyword shared by every batch (defaults to the first keyword)
+        :param output_dir: Directory to save output files
+        :param rate: Initial requests per second per endpoint, shared by all shards
+        :param max_rate: Upper bound of the adaptive rate, shared by all shards
+        :param use_cache: Whether workers use the response cache under output_dir
+        :param max_item_retries: Extra attempts for a unit that failed
+        :param max_restarts: Times a crashed shard is started again
+        :param chart_mode: 'parallel' renders charts after fetching, 'lazy' keeps them
+                           in pending_charts, 'skip' disables them
+        :param chart_workers: Processes used to render charts (defaults to the CPU count)
+        :param session_class: pytrends session class used by workers (defaults to TrendReq)
+        :param compact_insights: Return demographic insights as CompactInsights
+        :param mp_context: multiprocessing context (defaults to the platform default)
+        """
+        if chart_mode not in CHART_MODES:
+            raise ValueError(f"chart_mode must be one of {CHART_MODES}")
+
+        self.keywords = list(dict.fromkeys(keywords))
+        self.timeframe = timeframe
+        self.shards = max(1, shards)
+        self.batch_size = batch_size
+        self.anchor_keyword = anchor_keyword
+        self.output_dir = output_dir
+        self.max_restarts = max_restarts
+        self.chart_mode = chart_mode
+        self.chart_workers = chart_workers
+        self.compact_insights = compact_insights
+        self.mp_context = mp_context or multiprocessing.get_context()
+        self.options = {
+            'output_dir': output_dir,
+            'rate': rate / self.shards,
+            'max_rate': max_rate / self.shards,
+            'use_cache': use_cache,
+            'max_item_retries': max_item_retries,
+            'session_class': session_class,
+        }
+
+        os.makedirs(output_dir, exist_ok=True)
+        self.store = TrendsStore(os.path.join(output_dir, STORE_DIRNAME))
+
+        # Units that failed in their shard, mapped to the last error
+        self.failures = {}
+        self.pending_charts = []
+        # Unit fetching the anchor's regions, set by run()
+        self._anchor_unit = None
+        self.summary = pd.DataFrame()
+        self.breakouts = pd.DataFrame()
+
+    def _journals(self) -> List[ProgressJournal]:
+        key = run_key(self.keywords, self.timeframe, self.batch_size, self.anchor_keyword,
+                      self.shards, date.today().isoformat())
+        return [
+            ProgressJournal(os.path.join(self.output_dir, CHECKPOINT_DIRNAME, f'shard-{shard}'), key)
+            for shard in range(self.shards)
+        ]
+
+    def _start(self, shard, units, anchor, results):
+        process = self.mp_context.Process(
+            target=_run_shard,
+            args=(shard, units, anchor, self._anchor_unit, self.timeframe, self.options, results),
+            name=f'trends-shard-{shard}',
+            daemon=True
+        )
+        process.start()
+        return process
+
+    def run(self) -> Dict[str, Any]:
+        """
+        Fetch every keyword, then write the store, summary and breakouts
+
+        :return: Dictionary of demographic insights
+        """
+        anchor, units = plan_units(self.keywords, self.batch_size, self.anchor_keyword)
+        # The anchor's own regions come with the first unit, if it was requested at all
+        self._anchor_unit = units[0] if anchor is not None and anchor in self.keywords and units else None
+        assigned = deal_units(units, self.shards)
+        journals = self._journals()
+
+        resumed = sum(len(journal) for journal in journals)
+        if resumed:
+            print(f"Resuming: {resumed} of {len(units)} units already fetched")
+
+        results = self.mp_context.Queue()
+        processes = {}
+        restarts = {}
+        received = {}
+        self.failures = {}
+
+        for shard, shard_units in enumerate(assigned):
+            pending = journals[shard].pending(shard_units)
+            if pending:
+                processes[shard] = self._start(shard, pending, anchor, results)
+
+        while processes:
+            try:
+                kind, shard, unit, payload = results.get(timeout=RESULT_POLL_SECONDS)
+            except queue.Empty:
+                self._check_shards(processes, restarts, assigned, journals, anchor, results)
+                continue
+
+            if kind == 'unit':
+                journals[shard].record(unit, payload)
+                received[unit] = payload
+            elif kind == 'done':
+                self.failures.update(payload)
+                processes.pop(shard).join()
+                print(f"Shard {shard} finished")
+
+        insights = self._assemble(anchor, units, assigned, journals, received)
+
+        # Journals are only needed until every unit has been fetched once
+        if not self.failures:
+            shutil.rmtree(os.path.join(self.output_dir, CHECKPOINT_DIRNAME), ignore_errors=True)
+        return insights
+
+    def _check_shards(self, processes, restarts, assigned, journals, anchor, results):
+        # A shard that exited without reporting done has crashed
+        for shard, process in list(processes.items()):
+            if process.is_alive():
+                continue
+
+            process.join()
+            pending = journals[shard].pending(assigned[shard])
+            if pending and restarts.get(shard, 0) < self.max_restarts:
+                restarts[shard] = restarts.get(shard, 0) + 1
+                print(f"Shard {shard} exited with code {process.exitcode}; "
+                      f"restarting with {len(pending)} unit(s) left")
+                processes[shard] = self._start(shard, pending, anchor, results)
+                continue
+
+            for unit in pending:
+                self.failures[unit] = f"shard {shard} exited with code {process.exitcode}"
+            print(f"Giving up on shard {shard} with {len(pending)} unit(s) left")
+            del processes[shard]
+
+    def _assemble(self, anchor, units, assigned, journals, received) -> Dict[str, Any]:
+        # Units are combined in plan order, so batches are scaled onto the first one
+        owner = {unit: shard for shard, shard_units in enumerate(assigned) for unit in shard_units}
+        frames = {}
+        reference = {}
+        for unit in units:
+            journal = journals[owner[unit]]
+            if unit in received:
+                interest_by_region, interest_over_time = received[unit]
+            elif unit in journal:
+                interest_by_region, interest_over_time = journal.load(unit)
+            else:
+                continue
+
+            if anchor is None:
+                frames[unit[0]] = (interest_by_region, interest_over_time)
+                continue
+
+            kw_list = [anchor] + list(unit)
+            unit_frames = split_batch_frames(
+                kw_list, anchor, self.keywords, interest_by_region, interest_over_time, reference
+            )
+            for keyword, keyword_frames in unit_frames.items():
+                frames.setdefault(keyword, keyword_frames)
+
+        demographic_insights = build_demographic_insights(
+            {keyword: frames[keyword] for keyword in self.keywords if keyword in frames},
+            self.compact_insights
+        )
+
+        self.store.write_insights(demographic_insights, self.timeframe)
+        self.summary = write_summary_report(demographic_insights, self.output_dir)
+        self.breakouts = write_breakouts(demographic_insights, self.output_dir, self.timeframe)
+
+        if self.chart_mode != 'skip':
+            self.pending_charts.extend(regional_chart_jobs(demographic_insights, self.output_dir, self.timeframe))
+            if self.chart_mode == 'parallel':
+                self.render_pending_charts()
+
+        print(f"Fetched {len(demographic_insights)} of {len(self.keywords)} keywords "
+              f"over {self.shards} shard(s)")
+        return demographic_insights
+
+    def render_pending_charts(self) -> List[str]:
+        """
+        Render the regional interest charts queued by run()
+
+        :return: Paths of the charts that were written
+        """
+        jobs, self.pending_charts = self.pending_charts, []
+        return render_charts(jobs, self.chart_workers)
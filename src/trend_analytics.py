@@ -0,0 +1,186 @@
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+
+from compact_series import CompactInsights
+
+# Points compared by the momentum metric (last N against the N before)
+MOMENTUM_WINDOW = 7
+
+# Regions listed per keyword in summaries
+TOP_REGIONS = 5
+
+# Columns of the frame returned by summarize_trends
+SUMMARY_COLUMNS = ['peak', 'latest', 'mean', 'momentum', 'z_score', 'top_regions']
+
+
+def _stack_columns(columns: Dict[str, pd.Series], keywords: List[str]) -> pd.DataFrame:
+    """
+    Stack series into one float64 frame with a column per keyword
+
+    Series fetched for the same payloads share their index, so the common
+    case is a plain column_stack; other series are aligned on the union.
+    """
+    if not columns:
+        return pd.DataFrame(np.empty((0, len(keywords))), columns=keywords)
+
+    series = list(columns.values())
+    index = series[0].index
+    if not all(item.index.equals(index) for item in series[1:]):
+        index = index.append([item.index for item in series[1:]]).unique()
+        series = [item[~item.index.duplicated()].reindex(index) for item in series]
+
+    values = np.full((len(index), len(keywords)), np.nan)
+    positions = {keyword: position for position, keyword in enumerate(keywords)}
+    stacked = np.column_stack([item.to_numpy(dtype='float64') for item in series])
+    values[:, [positions[keyword] for keyword in columns]] = stacked
+    return pd.DataFrame(values, index=index, columns=keywords)
+
+
+def stack_time_series(demographic_insights: Dict[str, Any], complete_only: bool = False) -> pd.DataFrame:
+    """
+    Align every keyword's interest over time into one wide frame
+
+    :param demographic_insights: Dictionary of demographic insights
+    :param complete_only: Leave points flagged isPartial out (NaN)
+    :return: Frame indexed by date with one float column per keyword
+    """
+    if isinstance(demographic_insights, CompactInsights):
+        return demographic_insights.stacked_time_series(complete_only)
+
+    columns = {}
+    for keyword, insights in demographic_insights.items():
+        time_series = insights['time_series']
+        if not time_series.empty and keyword in time_series.columns:
+            column = time_series[keyword]
+            if complete_only and 'isPartial' in time_series.columns:
+                column = column.where(~time_series['isPartial'].astype(bool))
+            columns[keyword] = column
+
+    return _stack_columns(columns, list(demographic_insights)).sort_index()
+
+
+def stack_regions(demographic_insights: Dict[str, Any]) -> pd.DataFrame:
+    """
+    Align every keyword's regional scores into one wide frame
+
+    :param demographic_insights: Dictionary of demographic insights
+    :return: Frame indexed by region with one float column per keyword
+    """
+    if isinstance(demographic_insights, CompactInsights):
+        return demographic_insights.stacked_regions()
+
+    columns = {}
+    for keyword, insights in demographic_insights.items():
+        top_regions = insights['top_regions']
+        if not top_regions.empty and keyword in top_regions.columns:
+            columns[keyword] = top_regions[keyword]
+
+    return _stack_columns(columns, list(demographic_insights))
+
+
+def top_k_labels(frame: pd.DataFrame, k: int = TOP_REGIONS) -> pd.Series:
+    """
+    Labels of the k highest rows of every column, best first
+
+    :param frame: Wide frame (rows are labels, columns are keywords)
+    :param k: Number of labels per column
+    :return: Series of lists of labels, indexed by column
+    """
+    if frame.empty:
+        return pd.Series([[] for _ in frame.columns], index=frame.columns, dtype=object)
+
+    values = frame.to_numpy(dtype='float64')
+    k = min(k, len(frame))
+    # A stable sort on the negated scores keeps ties in row order, like nlargest
+    order = np.argsort(-np.nan_to_num(values, nan=-np.inf), axis=0, kind='stable')[:k]
+    ranked = np.take_along_axis(values, order, axis=0)
+    labels = frame.index.to_numpy(dtype=object)[order]
+
+    valid = ~np.isnan(ranked)
+    return pd.Series([labels[valid[:, col], col].tolist() for col in range(values.shape[1])],
+                     index=frame.columns, dtype=object)
+
+
+def _column_means(block: np.ndarray) -> np.ndarray:
+    """
+    Mean of every column, ignoring NaN (NaN where a column has no values)
+    """
+    counts = (~np.isnan(block)).sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, np.nansum(block, axis=0) / counts, np.nan)
+
+
+def summarize_trends(series: pd.DataFrame,
+                     regions: pd.DataFrame = None,
+                     window: int = MOMENTUM_WINDOW,
+                     top_k: int = TOP_REGIONS) -> pd.DataFrame:
+    """
+    Compute summary metrics for every keyword at once
+
+    Metrics per keyword column:
+      peak      - highest value
+      latest    - last observed value
+      mean      - average value
+      momentum  - mean of the last ``window`` points minus the mean of the
+                  ``window`` points before them
+      z_score   - how far the latest value is from the mean, in standard deviations
+      top_regions - the ``top_k`` highest regions, best first
+
+    :param series: Wide frame (date x keyword) from stack_time_series
+    :param regions: Optional wide frame (region x keyword) from stack_regions
+    :param window: Points per momentum window
+    :param top_k: Regions listed per keyword
+    :return: Frame indexed by keyword with the SUMMARY_COLUMNS
+    """
+    keywords = series.columns
+    values = series.to_numpy(dtype='float64')
+    summary = pd.DataFrame(np.nan, index=keywords, columns=SUMMARY_COLUMNS[:-1])
+
+    if len(values):
+        observed = ~np.isnan(values)
+        counts = observed.sum(axis=0)
+        has_data = counts > 0
+        columns = np.arange(values.shape[1])
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            peak = np.where(observed, values, -np.inf).max(axis=0)
+            mean = np.nansum(values, axis=0) / counts
+            std = np.sqrt(np.nansum((values - mean) ** 2, axis=0) / counts)
+
+            # Index of the last observed point of every column
+            last_index = len(values) - 1 - observed[::-1].argmax(axis=0)
+            latest = values[last_index, columns]
+
+            recent = _column_means(values[-window:])
+            previous = _column_means(values[-2 * window:-window] if len(values) > window else values[:0])
+
+            summary['peak'] = np.where(has_data, peak, np.nan)
+            summary['latest'] = np.where(has_data, latest, np.nan)
+            summary['mean'] = np.where(has_data, mean, np.nan)
+            summary['momentum'] = recent - previous
+            summary['z_score'] = np.where(has_data, np.where(std > 0, (latest - mean) / std, 0.0), np.nan)
+
+    if regions is not None:
+        summary['top_regions'] = top_k_labels(regions.reindex(columns=keywords), top_k)
+    else:
+        summary['top_regions'] = pd.Series([[] for _ in keywords], index=keywords, dtype=object)
+    return summary
+
+
+def summarize_insights(demographic_insights: Dict[str, Any],
+                       window: int = MOMENTUM_WINDOW,
+                       top_k: int = TOP_REGIONS) -> pd.DataFrame:
+    """
+    Summary metrics for a demographic analysis
+
+    :param demographic_insights: Dictionary of demographic insights
+    :param window: Points per momentum window
+    :param top_k: Regions listed per keyword
+    :return: Frame indexed by keyword with the SUMMARY_COLUMNS
+    """
+    return summarize_trends(stack_time_series(demographic_insights),
+                            stack_regions(demographic_insights),
+                            window=window,
+                            top_k=top_k)
@@ -0,0 +1,234 @@
+import os
+import re
+import json
+import time
+import pickle
+import sqlite3
+import hashlib
+import threading
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+import pandas as pd
+
+from instrumentation import metrics
+
+# Time-to-live (seconds) for each Google Trends timeframe granularity.
+# Short windows change quickly, long windows barely move between runs.
+TIMEFRAME_TTLS = {
+    'now 1-H': 5 * 60,
+    'now 4-H': 10 * 60,
+    'now 1-d': 30 * 60,
+    'now 7-d': 2 * 60 * 60,
+    'today 1-m': 6 * 60 * 60,
+    'today 3-m': 12 * 60 * 60,
+    'today 12-m': 24 * 60 * 60,
+    'today 5-y': 7 * 24 * 60 * 60,
+    'all': 7 * 24 * 60 * 60,
+}
+
+# TTL for payloads without a timeframe (e.g. trending searches)
+DEFAULT_TTL = 30 * 60
+
+# TTL for explicit date ranges that end before today; these never change
+CLOSED_RANGE_TTL = 30 * 24 * 60 * 60
+
+# Seconds a connection waits for another process's write lock (shards share the file)
+BUSY_TIMEOUT_SECONDS = 30
+
+_DATE_RANGE = re.compile(r'^(\d{4}-\d{2}-\d{2})(?:T\d{2})? (\d{4}-\d{2}-\d{2})(?:T\d{2})?$')
+
+
+def ttl_for_timeframe(timeframe: Optional[str]) -> int:
+    """
+    Return the cache TTL in seconds for a Google Trends timeframe
+
+    :param timeframe: Google Trends timeframe (e.g. 'now 1-d', 'today 3-m',
+                      '2024-01-01 2024-06-30') or None
+    :return: TTL in seconds
+    """
+    if not timeframe:
+        return DEFAULT_TTL
+
+    timeframe = timeframe.strip()
+    if timeframe in TIMEFRAME_TTLS:
+        return TIMEFRAME_TTLS[timeframe]
+
+    match = _DATE_RANGE.match(timeframe)
+    if match:
+        end = datetime.strptime(match.group(2), '%Y-%m-%d').date()
+        if end < datetime.now().date():
+            return CLOSED_RANGE_TTL
+        return TIMEFRAME_TTLS['today 3-m']
+
+    return DEFAULT_TTL
+
+
+class TrendsCache:
+    def __init__(self,
+                 path: str,
+                 max_entries: int = 5000):
+        """
+        Persistent SQLite cache for pytrends responses
+
+        Entries are keyed on the endpoint plus the normalized payload, expire
+        after a TTL chosen from the payload's timeframe and are evicted in
+        least-recently-used order once ``max_entries`` is exceeded. The file
+        is opened in WAL mode, so shard processes sharing it read while one
+        of them writes and wait up to BUSY_TIMEOUT_SECONDS for the write lock.
+
+        :param path: Path of the SQLite database file
+        :param max_entries: Maximum number of cached responses to keep
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_SECONDS, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS responses ('
+            ' key TEXT PRIMARY KEY,'
+            ' endpoint TEXT NOT NULL,'
+            ' payload TEXT NOT NULL,'
+            ' expires_at REAL NOT NULL,'
+            ' last_access REAL NOT NULL,'
+            ' data BLOB NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)')
+        self._conn.commit()
+
+    @staticmethod
+    def normalize_payload(payload: Dict[str, Any]) -> str:
+        """
+        Serialize a payload into a canonical string
+
+        Keyword order is kept because it determines the column order of the
+        returned frames; whitespace and geo casing are normalized.
+
+        :param payload: Payload parameters
+        :return: Canonical JSON string
+        """
+        normalized = {}
+        for name, value in payload.items():
+            if value is None:
+                continue
+            if name == 'kw_list':
+                value = [str(keyword).strip() for keyword in value]
+            elif name == 'geo':
+                value = str(value).strip().upper()
+            elif isinstance(value, str):
+                value = value.strip()
+            normalized[name] = value
+        return json.dumps(normalized, sort_keys=True)
+
+    def make_key(self, endpoint: str, payload: Dict[str, Any]) -> str:
+        """
+        Build the cache key for an endpoint and payload
+
+        :param endpoint: pytrends method name
+        :param payload: Payload parameters
+        :return: Hex digest identifying the request
+        """
+        raw = f'{endpoint}:{self.normalize_payload(payload)}'
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get(self, endpoint: str, payload: Dict[str, Any]) -> Optional[pd.DataFrame]:
+        """
+        Look up a cached response
+
+        :param endpoint: pytrends method name
+        :param payload: Payload parameters
+        :return: Cached frame, or None on a miss or expired entry
+        """
+        with metrics.span('cache_lookup', endpoint=endpoint):
+            frame = self._get(self.make_key(endpoint, payload))
+        metrics.increment('cache_hits' if frame is not None else 'cache_misses', endpoint=endpoint)
+        return frame
+
+    def _get(self, key: str) -> Optional[pd.DataFrame]:
+        now = time.time()
+
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT data, expires_at FROM responses WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            data, expires_at = row
+            if expires_at <= now:
+                self._conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+                self._conn.commit()
+                return None
+
+            self._conn.execute('UPDATE responses SET last_access = ? WHERE key = ?', (now, key))
+            self._conn.commit()
+
+        return pickle.loads(data)
+
+    def set(self,
+            endpoint: str,
+            payload: Dict[str, Any],
+            frame: pd.DataFrame,
+            ttl: int = None):
+        """
+        Store a response
+
+        :param endpoint: pytrends method name
+        :param payload: Payload parameters
+        :param frame: Response to cache
+        :param ttl: Time-to-live in seconds (defaults to the payload's timeframe TTL)
+        """
+        if ttl is None:
+            ttl = ttl_for_timeframe(payload.get('timeframe'))
+
+        now = time.time()
+        key = self.make_key(endpoint, payload)
+        data = pickle.dumps(frame, protocol=pickle.HIGHEST_PROTOCOL)
+
+        with metrics.span('cache_write', endpoint=endpoint), self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO responses (key, endpoint, payload, expires_at, last_access, data) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (key, endpoint, self.normalize_payload(payload), now + ttl, now, sqlite3.Binary(data))
+            )
+            self._evict(now)
+            self._conn.commit()
+        metrics.increment('cache_bytes_written', len(data))
+
+    def _evict(self, now: float):
+        """
+        Drop expired entries and trim the cache to ``max_entries`` (LRU)
+
+        :param now: Current timestamp
+        """
+        self._conn.execute('DELETE FROM responses WHERE expires_at <= ?', (now,))
+
+        count = self._conn.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                'DELETE FROM responses WHERE key IN '
+                '(SELECT key FROM responses ORDER BY last_access ASC LIMIT ?)',
+                (excess,)
+            )
+
+    def clear(self):
+        """
+        Remove every cached response
+        """
+        with self._lock:
+            self._conn.execute('DELETE FROM responses')
+            self._conn.commit()
+
+    def close(self):
+        """
+        Close the underlying database connection
+        """
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,278 @@
+import os
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+from urllib.parse import quote
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from pyarrow import fs
+
+from instrumentation import metrics
+
+# Columns of the two datasets kept by the store
+TIME_SERIES_SCHEMA = pa.schema([
+    ('keyword', pa.string()),
+    ('geo', pa.string()),
+    ('date', pa.timestamp('us')),
+    ('value', pa.float64()),
+    ('is_partial', pa.bool_()),
+    ('fetched_at', pa.timestamp('us')),
+])
+
+REGIONS_SCHEMA = pa.schema([
+    ('keyword', pa.string()),
+    ('geo', pa.string()),
+    ('region', pa.string()),
+    ('value', pa.float64()),
+    ('fetched_at', pa.timestamp('us')),
+])
+
+# Partition columns, encoded in the directory layout
+PARTITIONING = ds.partitioning(
+    pa.schema([('timeframe', pa.string()), ('fetch_date', pa.string())]),
+    flavor='hive',
+)
+
+
+class TrendsStore:
+    def __init__(self, root: str):
+        """
+        Append-only columnar store for fetched Google Trends data
+
+        Time series and regional scores go into two Parquet datasets,
+        partitioned by timeframe and fetch date, with keyword and geo as
+        columns. Every write adds a new file and never rewrites old ones, so
+        the store keeps the full fetch history. Reads go through memory-mapped
+        Arrow datasets and return pandas frames.
+
+        :param root: Directory holding the datasets
+        """
+        self.root = root
+        self._filesystem = fs.LocalFileSystem(use_mmap=True)
+        os.makedirs(root, exist_ok=True)
+
+    def _dataset_dir(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    def _write(self,
+               name: str,
+               table: pa.Table,
+               timeframe: str,
+               fetched_at: datetime):
+        if table.num_rows == 0:
+            return
+
+        # Same layout the hive partitioning reads back (values are URI-encoded)
+        partition_dir = os.path.join(
+            self._dataset_dir(name),
+            f"timeframe={quote(timeframe, safe='')}",
+            f"fetch_date={fetched_at.strftime('%Y-%m-%d')}",
+        )
+        os.makedirs(partition_dir, exist_ok=True)
+
+        filename = f"part-{fetched_at.strftime('%H%M%S')}-{uuid.uuid4().hex[:8]}.parquet"
+        path = os.path.join(partition_dir, filename)
+        # Sorting by keyword keeps row-group statistics useful for keyword filters
+        with metrics.span('store_write', dataset=name):
+            pq.write_table(table.sort_by([('keyword', 'ascending')]), path)
+        metrics.increment('store_rows_written', table.num_rows, dataset=name)
+        metrics.increment('bytes_written', os.path.getsize(path), kind='store')
+
+    def write_insights(self,
+                       demographic_insights: Dict[str, Any],
+                       timeframe: str,
+                       geo: str = '',
+                       fetched_at: datetime = None):
+        """
+        Append the time series and top regions of a demographic analysis
+
+        :param demographic_insights: Dictionary of demographic insights
+        :param timeframe: Google Trends timeframe the insights were fetched for
+        :param geo: Geographic restriction of the payloads ('' for worldwide)
+        :param fetched_at: Fetch time (defaults to now, UTC)
+        """
+        fetched_at = (fetched_at or datetime.now(timezone.utc)).replace(tzinfo=None)
+
+        series = {}
+        regions = {}
+        for keyword, insights in demographic_insights.items():
+            time_series = insights['time_series']
+            if not time_series.empty and keyword in time_series.columns:
+                series[keyword] = time_series
+
+            top_regions = insights['top_regions']
+            if not top_regions.empty and keyword in top_regions.columns:
+                regions[keyword] = top_regions[keyword]
+
+        self.write_time_series(series, timeframe, geo, fetched_at)
+        self.write_regions(regions, timeframe, geo, fetched_at)
+
+    def write_time_series(self,
+                          series: Dict[str, pd.DataFrame],
+                          timeframe: str,
+                          geo: str = '',
+                          fetched_at: datetime = None):
+        """
+        Append interest over time frames
+
+        :param series: Mapping of keyword to an interest over time frame
+                       (a column named after the keyword, optionally isPartial)
+        :param timeframe: Google Trends timeframe the series were fetched for
+        :param geo: Geographic restriction of the payloads
+        :param fetched_at: Fetch time (defaults to now, UTC)
+        """
+        fetched_at = (fetched_at or datetime.now(timezone.utc)).replace(tzinfo=None)
+        if not series:
+            return
+
+        columns = {name: [] for name in TIME_SERIES_SCHEMA.names}
+        for keyword, frame in series.items():
+            size = len(frame)
+            columns['keyword'].append(pd.Series([keyword] * size))
+            columns['geo'].append(pd.Series([geo] * size))
+            columns['date'].append(pd.Series(pd.DatetimeIndex(frame.index)))
+            columns['value'].append(frame[keyword].astype('float64').reset_index(drop=True))
+            partial = frame['isPartial'] if 'isPartial' in frame.columns else pd.Series(False, index=frame.index)
+            columns['is_partial'].append(partial.astype(bool).reset_index(drop=True))
+            columns['fetched_at'].append(pd.Series([fetched_at] * size))
+
+        arrays = [pa.Array.from_pandas(pd.concat(columns[field.name], ignore_index=True), type=field.type)
+                  for field in TIME_SERIES_SCHEMA]
+        self._write('time_series', pa.Table.from_arrays(arrays, schema=TIME_SERIES_SCHEMA), timeframe, fetched_at)
+
+    def write_regions(self,
+                      regions: Dict[str, pd.Series],
+                      timeframe: str,
+                      geo: str = '',
+                      fetched_at: datetime = None):
+        """
+        Append regional interest scores
+
+        :param regions: Mapping of keyword to interest score per region
+        :param timeframe: Google Trends timeframe the scores were fetched for
+        :param geo: Geographic restriction of the payloads
+        :param fetched_at: Fetch time (defaults to now, UTC)
+        """
+        fetched_at = (fetched_at or datetime.now(timezone.utc)).replace(tzinfo=None)
+        if not regions:
+            return
+
+        frame = pd.concat(
+            [pd.DataFrame({'keyword': keyword, 'geo': geo, 'region': scores.index.astype(str),
+                           'value': scores.to_numpy(dtype='float64')})
+             for keyword, scores in regions.items()],
+            ignore_index=True,
+        )
+        frame['fetched_at'] = fetched_at
+        table = pa.Table.from_pandas(frame, schema=REGIONS_SCHEMA, preserve_index=False)
+        self._write('regions', table, timeframe, fetched_at)
+
+    def _read(self,
+              name: str,
+              keywords: Optional[List[str]],
+              geo: Optional[str],
+              timeframe: Optional[str],
+              extra_filter: Optional[ds.Expression] = None) -> pd.DataFrame:
+        directory = self._dataset_dir(name)
+        if not os.path.isdir(directory):
+            return pd.DataFrame()
+
+        dataset = ds.dataset(directory, format='parquet', partitioning=PARTITIONING, filesystem=self._filesystem)
+
+        expression = extra_filter
+        for condition in (
+            ds.field('keyword').isin(list(keywords)) if keywords is not None else None,
+            ds.field('geo') == geo if geo is not None else None,
+            ds.field('timeframe') == timeframe if timeframe is not None else None,
+        ):
+            if condition is not None:
+                expression = condition if expression is None else expression & condition
+
+        return dataset.to_table(filter=expression).to_pandas()
+
+    def read_time_series(self,
+                         keywords: List[str] = None,
+                         geo: str = None,
+                         timeframe: str = None,
+                         start: Any = None,
+                         end: Any = None,
+                         latest_only: bool = True) -> pd.DataFrame:
+        """
+        Query stored time series points in long format
+
+        :param keywords: Keywords to return (all if None)
+        :param geo: Geographic restriction to match (all if None)
+        :param timeframe: Timeframe to match (all if None)
+        :param start: Earliest date to return
+        :param end: Latest date to return
+        :param latest_only: Keep only the most recently fetched value of each point
+        :return: Frame with keyword, geo, timeframe, fetch_date, date, value,
+                 is_partial and fetched_at columns
+        """
+        expression = None
+        if start is not None:
+            expression = ds.field('date') >= pa.scalar(pd.Timestamp(start).to_pydatetime(), pa.timestamp('us'))
+        if end is not None:
+            condition = ds.field('date') <= pa.scalar(pd.Timestamp(end).to_pydatetime(), pa.timestamp('us'))
+            expression = condition if expression is None else expression & condition
+
+        frame = self._read('time_series', keywords, geo, timeframe, expression)
+        if frame.empty:
+            return frame
+
+        frame = frame.sort_values(['keyword', 'geo', 'timeframe', 'date', 'fetched_at'])
+        if latest_only:
+            frame = frame.drop_duplicates(['keyword', 'geo', 'timeframe', 'date'], keep='last')
+        return frame.reset_index(drop=True)
+
+    def time_series_frame(self,
+                          keywords: List[str] = None,
+                          geo: str = '',
+                          timeframe: str = None,
+                          start: Any = None,
+                          end: Any = None) -> pd.DataFrame:
+        """
+        Query stored time series as a wide frame (date x keyword)
+
+        :param keywords: Keywords to return (all if None)
+        :param geo: Geographic restriction to match
+        :param timeframe: Timeframe to match (all if None; latest fetch wins)
+        :param start: Earliest date to return
+        :param end: Latest date to return
+        :return: Frame indexed by date with one column per keyword
+        """
+        frame = self.read_time_series(keywords, geo, timeframe, start, end)
+        if frame.empty:
+            return frame
+
+        frame = frame.sort_values('fetched_at').drop_duplicates(['keyword', 'date'], keep='last')
+        wide = frame.pivot(index='date', columns='keyword', values='value').sort_index()
+        wide.columns.name = None
+        return wide
+
+    def read_regions(self,
+                     keywords: List[str] = None,
+                     geo: str = None,
+                     timeframe: str = None,
+                     latest_only: bool = True) -> pd.DataFrame:
+        """
+        Query stored regional interest scores in long format
+
+        :param keywords: Keywords to return (all if None)
+        :param geo: Geographic restriction to match (all if None)
+        :param timeframe: Timeframe to match (all if None)
+        :param latest_only: Keep only each keyword's most recent fetch
+        :return: Frame with keyword, geo, timeframe, fetch_date, region, value
+                 and fetched_at columns
+        """
+        frame = self._read('regions', keywords, geo, timeframe)
+        if frame.empty:
+            return frame
+
+        if latest_only:
+            latest = frame.groupby(['keyword', 'geo', 'timeframe'])['fetched_at'].transform('max')
+            frame = frame[frame['fetched_at'] == latest]
+        return frame.sort_values(['keyword', 'value'], ascending=[True, False]).reset_index(drop=True)
@@ -0,0 +1,168 @@
+import os
+import re
+import heapq
+import itertools
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from advanced_trends_fetcher import MAX_PAYLOAD_KEYWORDS
+from query_graph import QUERY_GRAPH_FILENAME, QueryGraph
+
+# Discovered keywords written next to the reports
+EXPANSION_FILENAME = 'watchlist_expansion.csv'
+
+# Columns of the frame returned by WatchlistCrawler.crawl
+EXPANSION_COLUMNS = ['keyword', 'depth', 'score', 'parent', 'expanded']
+
+
+def term_key(term: str) -> str:
+    """
+    Key under which a term counts as seen: case and spacing are ignored
+
+    :param term: Keyword or query
+    :return: Normalized term
+    """
+    return re.sub(r'\s+', ' ', term).strip().casefold()
+
+
+def payload_cost(terms: int) -> int:
+    """
+    Requests the related queries of one uncached payload need when nothing is retried
+
+    :param terms: Keywords in the payload
+    :return: One explore request plus one related searches request per keyword
+    """
+    return 1 + terms
+
+
+class WatchlistCrawler:
+    def __init__(self,
+                 fetcher,
+                 timeframe: str = 'now 7-d',
+                 max_depth: int = 2,
+                 max_requests: int = 100,
+                 max_keywords: int = None,
+                 per_term: int = 5,
+                 min_rise: float = 0,
+                 graph_path: str = None):
+        """
+        Expand a watchlist breadth-first through rising related queries
+
+        Starting from the seed keywords, every term's rising queries become
+        candidates one level deeper. Levels are crawled in order; within a
+        level a heap frontier fetches the candidates with the highest rise
+        value first, up to five per payload. A seen-set keyed on the
+        normalized term keeps a query that several terms share from being
+        queued twice. Requests go through the fetcher, so they share its
+        cache and rate limiter. Every payload is charged the requests it
+        actually made, counted by the fetcher's response hook for this crawl
+        alone (fetcher.count_responses), so retries and requeued attempts
+        count, cached payloads cost nothing and concurrent fetches elsewhere
+        in the process are not charged; the
+        crawl stops once the next payload (an explore request plus one
+        related searches request per keyword) would no longer fit in
+        ``max_requests``.
+
+        :param fetcher: AdvancedTrendsFetcher used for related queries
+        :param timeframe: Google Trends timeframe of the rising queries
+        :param max_depth: Levels of queries below the seeds
+        :param max_requests: Request allowance of the whole crawl
+        :param max_keywords: Stop once this many keywords (seeds included) are known
+        :param per_term: Rising queries taken from each crawled term
+        :param min_rise: Minimum rise value of a candidate
+        :param graph_path: Query graph the fetched related queries are added to
+                           (defaults to query_graph.json in the fetcher's output_dir)
+        """
+        self.fetcher = fetcher
+        self.timeframe = timeframe
+        self.max_depth = max_depth
+        self.max_requests = max_requests
+        self.max_keywords = max_keywords
+        self.per_term = per_term
+        self.min_rise = min_rise
+        self.graph_path = graph_path or os.path.join(fetcher.output_dir, QUERY_GRAPH_FILENAME)
+
+        # Requests spent by the last crawl
+        self.requests = 0
+        self.graph: Optional[QueryGraph] = None
+
+    def crawl(self, seeds: List[str]) -> pd.DataFrame:
+        """
+        Crawl from the seeds until the depth, keyword or request limit is reached
+
+        :param seeds: Seed keywords
+        :return: Frame with the EXPANSION_COLUMNS, seeds first, then discovered
+                 keywords in the order they were found
+        """
+        self.requests = 0
+        self.graph = QueryGraph.load(self.graph_path)
+
+        # Frontier entries: (depth, -score, order, term); the counter keeps ties first-come
+        order = itertools.count()
+        frontier = []
+        found: Dict[str, dict] = {}
+        seen = set()
+
+        def discover(term, depth, score, parent):
+            key = term_key(term)
+            if not key or key in seen:
+                return
+            # Seeds are always kept; discovered terms only while there is room
+            if parent is not None and self.max_keywords is not None and len(found) >= self.max_keywords:
+                return
+            seen.add(key)
+            found[term] = {'keyword': term, 'depth': depth, 'score': score if parent is not None else None,
+                           'parent': parent, 'expanded': False}
+            if depth < self.max_depth:
+                heapq.heappush(frontier, (depth, -score, next(order), term))
+
+        for seed in seeds:
+            discover(seed, 0, float('inf'), None)
+
+        while frontier:
+            remaining = self.max_requests - self.requests
+            size = min(MAX_PAYLOAD_KEYWORDS, remaining - payload_cost(0))
+            if size < 1:
+                print(f"Request allowance of {self.max_requests} spent with {len(frontier)} term(s) left")
+                break
+
+            # Best candidates of the shallowest level only, so the crawl stays breadth-first
+            depth = frontier[0][0]
+            batch = []
+            while frontier and len(batch) < size and frontier[0][0] == depth:
+                batch.append(heapq.heappop(frontier)[3])
+
+            with self.fetcher.count_responses() as responses:
+                related = self.fetcher.fetch_related_queries(batch, self.timeframe, batch_size=len(batch))
+            self.requests += responses[0]
+            self.graph.add_related(related)
+
+            for term in batch:
+                rising = (related.get(term) or {}).get('rising')
+                found[term]['expanded'] = term in related
+                if not isinstance(rising, pd.DataFrame) or rising.empty:
+                    continue
+
+                candidates = rising[rising['value'] >= self.min_rise]
+                candidates = candidates.sort_values('value', ascending=False, kind='stable').head(self.per_term)
+                for query, value in zip(candidates['query'], candidates['value']):
+                    discover(query, depth + 1, float(value), term)
+
+        self.graph.save(self.graph_path)
+
+        expansion = pd.DataFrame(list(found.values()), columns=EXPANSION_COLUMNS)
+        print(f"Crawled {int(expansion['expanded'].sum())} term(s) with {self.requests} request(s); "
+              f"{int((expansion['depth'] > 0).sum())} keyword(s) discovered")
+        return expansion
+
+    def expand(self, seeds: List[str]) -> List[str]:
+        """
+        Crawl and save the expansion to watchlist_expansion.csv
+
+        :param seeds: Seed keywords
+        :return: Seeds followed by the discovered keywords
+        """
+        expansion = self.crawl(seeds)
+        expansion.to_csv(os.path.join(self.fetcher.output_dir, EXPANSION_FILENAME), index=False)
+        return expansion['keyword'].tolist()
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+
+from anomaly_detection import AnomalyDetector, anomaly_state_path, detect_breakouts
+
+DATES = pd.date_range('2024-01-01', periods=60, name='date')
+
+
+def quiet_series(length: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return 50 + rng.integers(-3, 4, size=length).astype('float64')
+
+
+def test_state_round_trip_resumes_where_it_stopped(tmp_path):
+    frame = pd.DataFrame({'a': quiet_series(60, 0), 'b': quiet_series(60, 1)}, index=DATES)
+    path = str(tmp_path / 'state.npz')
+
+    detector = AnomalyDetector()
+    detector.update(frame.iloc[:40])
+    detector.save(path)
+    restored = AnomalyDetector.load(path)
+
+    assert restored.keys == ['a', 'b']
+    for name in ('count', 'mean', 'var', 'median', 'mad', 'seasonal', 'last_seen', 'tail_values'):
+        np.testing.assert_array_equal(getattr(restored, name), getattr(detector, name))
+
+    # Feeding the overlapping window again only scores the new dates, exactly as without the restart
+    resumed = restored.update(frame)['score']
+    continued = detector.update(frame)['score']
+    assert resumed.iloc[:40].isna().all().all()
+    pd.testing.assert_frame_equal(resumed, continued)
+
+
+def test_spike_is_reported_once_across_runs(tmp_path):
+    values = quiet_series(60, 2)
+    values[-1] = 100.0
+    frame = pd.DataFrame({'spiky': values, 'quiet': quiet_series(60, 3)}, index=DATES)
+    path = anomaly_state_path(str(tmp_path), 'today 3-m')
+
+    first = detect_breakouts(frame, path)
+    second = detect_breakouts(frame, path)
+
+    assert first['term'].tolist() == ['spiky']
+    assert first['date'].iloc[0] == DATES[-1]
+    assert second.empty
+    assert path != anomaly_state_path(str(tmp_path), 'now 7-d')
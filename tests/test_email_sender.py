@@ -0,0 +1,100 @@
+import socket
+import smtplib
+
+import pytest
+from aiosmtpd.controller import Controller
+
+from email_sender import EmailSender, is_retryable
+
+
+class Handler:
+    def __init__(self):
+        # Replies to the next DATA commands, '250 OK' once they run out
+        self.replies = []
+        self.connections = 0
+        self.received = []
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        self.connections += 1
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        reply = self.replies.pop(0) if self.replies else '250 OK'
+        if reply.startswith('250'):
+            self.received.append(envelope)
+        return reply
+
+
+def free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+
+@pytest.fixture
+def smtp():
+    handler = Handler()
+    controller = Controller(handler, hostname='127.0.0.1', port=free_port())
+    controller.start()
+    yield handler, controller.port
+    controller.stop()
+
+
+@pytest.fixture
+def report(tmp_path):
+    path = tmp_path / 'report.xlsx'
+    path.write_bytes(b'report')
+    return str(path)
+
+
+def make_sender(port, **kwargs):
+    options = dict(sender='reports@example.com', password='', recipients='a@example.com, b@example.com',
+                   smtp_server='127.0.0.1', smtp_port=port, use_tls=False, retry_delay=0.01, timeout=5.0)
+    options.update(kwargs)
+    return EmailSender(**options)
+
+
+def test_messages_share_one_pooled_connection(smtp, report):
+    handler, port = smtp
+    with make_sender(port) as sender:
+        assert sender.send_report(report, 'daily')
+        assert sender.send_report(report, 'weekly')
+
+    assert handler.connections == 1
+    assert len(handler.received) == 2
+    assert handler.received[0].rcpt_tos == ['a@example.com', 'b@example.com']
+
+
+def test_transient_reply_is_retried(smtp, report):
+    handler, port = smtp
+    handler.replies = ['451 Try again later']
+    with make_sender(port) as sender:
+        assert sender.send_report_async(report, 'daily')
+        sender.stop(wait=True)
+        assert sender.failed == []
+
+    assert len(handler.received) == 1
+
+
+def test_permanent_reply_fails_without_retrying(smtp, report):
+    handler, port = smtp
+    handler.replies = ['554 Message rejected'] * 4
+    with make_sender(port, retry_delay=60.0) as sender:
+        assert sender.send_report_async(report, 'daily')
+        # Would block for minutes if the rejection were retried
+        sender.stop(wait=True)
+        assert len(sender.failed) == 1
+
+    assert handler.replies == ['554 Message rejected'] * 3
+    assert handler.received == []
+
+
+def test_only_transient_errors_are_retryable():
+    assert is_retryable(smtplib.SMTPServerDisconnected('gone'))
+    assert is_retryable(ConnectionRefusedError())
+    assert is_retryable(smtplib.SMTPDataError(451, b'Try again later'))
+    assert not is_retryable(smtplib.SMTPDataError(554, b'Message rejected'))
+    assert not is_retryable(smtplib.SMTPAuthenticationError(535, b'Bad credentials'))
+    assert is_retryable(smtplib.SMTPRecipientsRefused({'a@example.com': (450, b'Mailbox busy')}))
+    assert not is_retryable(smtplib.SMTPRecipientsRefused({'a@example.com': (550, b'No such user')}))
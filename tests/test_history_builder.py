@@ -0,0 +1,55 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from history_builder import chain_windows, plan_windows
+
+
+def window_frame(start: date, days: int, interest: np.ndarray, peak: float, partial_last: bool = False) -> pd.DataFrame:
+    # Trends scales every window so its own peak is 100
+    index = pd.date_range(start, periods=days, name='date')
+    offset = (start - date(2020, 1, 1)).days
+    values = interest[offset:offset + days]
+    frame = pd.DataFrame({'kw': values * 100 / peak}, index=index)
+    frame['isPartial'] = False
+    if partial_last:
+        frame.iloc[-1, frame.columns.get_loc('isPartial')] = True
+    return frame
+
+
+def test_plan_windows_cover_the_span_with_overlaps():
+    start, end = date(2020, 1, 1), date(2022, 12, 31)
+
+    windows = plan_windows(start, end, window_days=200, overlap_days=30)
+
+    assert windows[0][0] == start
+    assert windows[-1] == (end - timedelta(days=199), end)
+    for (first_start, first_end), (second_start, second_end) in zip(windows, windows[1:]):
+        assert first_start < second_start
+        assert (first_end - second_start).days + 1 >= 30
+    assert all((window_end - window_start).days + 1 == 200 for window_start, window_end in windows)
+
+
+def test_plan_windows_rejects_an_overlap_as_long_as_the_window():
+    with pytest.raises(ValueError):
+        plan_windows(date(2020, 1, 1), date(2021, 1, 1), window_days=30, overlap_days=30)
+
+
+def test_chain_windows_puts_every_window_on_the_oldest_scale():
+    interest = 50 + 40 * np.sin(np.arange(400) / 15.0)
+    plan = plan_windows(date(2020, 1, 1), date(2020, 1, 1) + timedelta(days=399), window_days=150, overlap_days=40)
+    windows = []
+    for position, (window_start, window_end) in enumerate(plan):
+        days = (window_end - window_start).days + 1
+        offset = (window_start - date(2020, 1, 1)).days
+        windows.append(window_frame(window_start, days, interest, interest[offset:offset + days].max(),
+                                    partial_last=position == len(plan) - 1))
+
+    chained = chain_windows(windows, 'kw')
+
+    expected = interest * 100 / interest[:150].max()
+    assert len(chained) == 400
+    np.testing.assert_allclose(chained['kw'].to_numpy(), expected)
+    assert chained['isPartial'].tolist() == [False] * 399 + [True]
@@ -0,0 +1,39 @@
+import json
+
+import pandas as pd
+
+from progress_journal import JOURNAL_FILENAME, ProgressJournal, run_key
+
+
+def test_reopened_journal_resumes_recorded_units(tmp_path):
+    directory = str(tmp_path / 'journal')
+    key = run_key(['Bitcoin', 'Tesla'], 'today 3-m')
+    frame = pd.DataFrame({'Bitcoin': [1, 2, 3]})
+
+    journal = ProgressJournal(directory, key)
+    journal.record(('Bitcoin', 'Tesla'), frame)
+    journal.record('US', {'rows': 3})
+
+    reopened = ProgressJournal(directory, key)
+    assert len(reopened) == 2
+    # A batch recorded as a tuple is found again as the list JSON gives back
+    assert ['Bitcoin', 'Tesla'] in reopened
+    pd.testing.assert_frame_equal(reopened.load(['Bitcoin', 'Tesla']), frame)
+    assert reopened.pending(['US', 'GB', ['Bitcoin', 'Tesla']]) == ['GB']
+
+
+def test_torn_last_line_is_ignored(tmp_path):
+    directory = str(tmp_path / 'journal')
+    journal = ProgressJournal(directory, 'run')
+    journal.record('US', 1)
+    with open(tmp_path / 'journal' / JOURNAL_FILENAME, 'a') as f:
+        f.write(json.dumps({'unit': 'GB', 'file': 'x.pkl'})[:10])
+
+    assert ProgressJournal(directory, 'run').pending(['US', 'GB']) == ['GB']
+
+
+def test_another_run_key_starts_over(tmp_path):
+    directory = str(tmp_path / 'journal')
+    ProgressJournal(directory, run_key('yesterday')).record('US', 1)
+
+    assert len(ProgressJournal(directory, run_key('today'))) == 0
@@ -0,0 +1,32 @@
+from datetime import date
+
+import pandas as pd
+
+from query_graph import QueryGraph
+
+MONDAY, TUESDAY = date(2024, 3, 4), date(2024, 3, 5)
+
+
+def related(*rows):
+    return {'top': None, 'rising': pd.DataFrame(rows, columns=['query', 'value'])}
+
+
+def test_new_queries_lists_only_queries_first_seen_after_the_day(tmp_path):
+    graph = QueryGraph()
+    graph.add_related({'bitcoin': related(('btc price', 300), ('halving', 150))}, observed=MONDAY)
+    graph.add_related({
+        'bitcoin': related(('btc price', 400), ('etf approval', 900)),
+        'ethereum': related(('etf approval', 1200), ('halving', 50)),
+    }, observed=TUESDAY)
+
+    new = graph.new_queries(since=MONDAY)
+
+    assert new['query'].tolist() == ['etf approval']
+    assert new.loc[0, 'seeds'] == 'bitcoin, ethereum'
+    assert new.loc[0, 'first_seen'] == TUESDAY
+    assert new.loc[0, 'value'] == 1200
+    assert graph.seeds_for('halving') == ['bitcoin', 'ethereum']
+
+    path = str(tmp_path / 'graph.json')
+    graph.save(path)
+    pd.testing.assert_frame_equal(QueryGraph.load(path).new_queries(since=MONDAY), new)
@@ -0,0 +1,114 @@
+import pytest
+import requests
+
+from mock_trends_server import MockTrendsServer, mock_trend_req
+from rate_limiter import AdaptiveRateLimiter, RetryQueue
+from advanced_trends_fetcher import AdvancedTrendsFetcher
+
+# Endpoint of the mock server that needs no request parameters
+TRENDING_PATH = '/hottrends/visualize/internal/data'
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def get(url: str):
+    response = requests.get(url, timeout=5)
+    response.raise_for_status()
+    return response.json()
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def make_limiter(clock, **kwargs):
+    options = dict(rate=1.0, increase=0.5, decrease=0.5, base_delay=0.01, max_delay=0.02,
+                   clock=clock, sleep=clock.sleep)
+    options.update(kwargs)
+    return AdaptiveRateLimiter(**options)
+
+
+def test_rate_grows_additively_and_halves_on_throttle(clock):
+    with MockTrendsServer(throttle_every=3, retry_after=0) as server:
+        limiter = make_limiter(clock)
+        url = server.base_url + TRENDING_PATH
+
+        limiter.call('trending', get, url)
+        limiter.call('trending', get, url)
+        assert limiter.rate('trending') == pytest.approx(2.0)
+
+        # Third request is answered with 429: the rate is cut, the retry succeeds
+        limiter.call('trending', get, url)
+        assert limiter.rate('trending') == pytest.approx(2.0 * 0.5 + 0.5)
+        assert server.request_count == 4
+
+
+def test_retry_waits_for_retry_after(clock):
+    with MockTrendsServer(throttle_every=1, retry_after=7) as server:
+        limiter = make_limiter(clock, max_retries=1)
+        url = server.base_url + TRENDING_PATH
+        sent = []
+
+        def timed_get():
+            sent.append(clock.now)
+            return get(url)
+
+        with pytest.raises(requests.HTTPError):
+            limiter.call('trending', timed_get)
+
+        # The retry waited out Retry-After rather than the much shorter backoff
+        assert server.request_count == 2
+        assert sent[1] - sent[0] >= 7
+
+
+def test_fatal_errors_are_not_retried(clock):
+    with MockTrendsServer() as server:
+        limiter = make_limiter(clock)
+
+        with pytest.raises(requests.HTTPError):
+            limiter.call('missing', get, server.base_url + '/no/such/endpoint')
+        assert server.request_count == 1
+
+
+def test_retry_queue_gives_up_after_max_attempts():
+    queue = RetryQueue(max_attempts=2)
+    assert queue.push('bitcoin', RuntimeError('429'))
+    assert queue.pop() == 'bitcoin'
+    assert queue.push('bitcoin', RuntimeError('429'))
+    assert queue.pop() == 'bitcoin'
+    assert not queue.push('bitcoin', RuntimeError('429 again'))
+    assert queue.exhausted() == ['bitcoin']
+    assert queue.errors['bitcoin'] == '429 again'
+
+
+def test_throttled_items_are_requeued_and_fetched(tmp_path, clock):
+    with MockTrendsServer(throttle_every=4, retry_after=0) as server:
+        # No retries inside the limiter, so every 429 fails the item and sends it to the retry queue
+        fetcher = AdvancedTrendsFetcher(
+            regions=['US'],
+            output_dir=str(tmp_path),
+            use_cache=False,
+            chart_mode='skip',
+            session_class=mock_trend_req(server.base_url),
+            rate_limiter=make_limiter(clock, rate=100.0, max_retries=0),
+            max_item_retries=3
+        )
+        keywords = ['Bitcoin', 'Ethereum', 'Tesla stock']
+
+        frames = fetcher._fetch_single_frames(keywords, 'today 3-m')
+
+        assert list(frames) == keywords
+        assert fetcher.failures == {}
+        assert all(not time_frame.empty for _, time_frame in frames.values())
@@ -0,0 +1,38 @@
+import pandas as pd
+
+from realtime_watch import RingBuffer
+
+TIMES = pd.date_range('2024-01-01 12:00', periods=12, freq='min', name='date')
+
+
+def test_merge_seeds_then_returns_only_new_points_on_the_buffer_scale():
+    buffer = RingBuffer(capacity=100)
+
+    seeded = buffer.merge(pd.Series([10.0, 20.0, 30.0, 40.0, 50.0, 60.0], index=TIMES[:6]))
+    assert seeded.empty
+    assert len(buffer) == 6
+
+    # The next poll overlaps the last four points and was scaled to a peak twice as high
+    appended = buffer.merge(pd.Series([15.0, 20.0, 25.0, 30.0, 35.0, 40.0], index=TIMES[2:8]))
+
+    assert appended.tolist() == [70.0, 80.0]
+    assert appended.index.equals(TIMES[6:8])
+    assert buffer.to_series().tolist() == [10.0, 20.0, 30.0, 40.0, 50.0, 60.0, 70.0, 80.0]
+
+
+def test_merge_after_a_gap_starts_the_buffer_over():
+    buffer = RingBuffer(capacity=100)
+    buffer.merge(pd.Series([10.0, 20.0, 30.0], index=TIMES[:3]))
+
+    restarted = buffer.merge(pd.Series([5.0, 6.0, 7.0], index=TIMES[9:12]))
+
+    assert restarted.empty
+    assert buffer.to_series().index.equals(TIMES[9:12])
+
+
+def test_full_buffer_keeps_the_latest_points():
+    buffer = RingBuffer(capacity=4)
+    buffer.extend(TIMES[:6].to_numpy(), [1.0, 2.0, 3.0, 4.0, 5.0, 6.0])
+
+    assert buffer.to_series().tolist() == [3.0, 4.0, 5.0, 6.0]
+    assert pd.Timestamp(buffer.last_time) == TIMES[5]
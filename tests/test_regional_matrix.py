@@ -0,0 +1,83 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from regional_matrix import RegionalMatrix
+
+DATES = pd.date_range('2024-01-01', periods=30, name='date')
+
+# Worldwide interest-by-country scores of each keyword fetched alone; 'b' has none for GB, 'c' none at all
+COUNTRY_SCORES = {'a': {'US': 80, 'GB': 40}, 'b': {'US': 50}, 'c': {}}
+
+# Worldwide mean interest of each keyword, in the payload that shares the anchor 'a'
+WORLDWIDE_MEANS = {'a': 10.0, 'b': 20.0, 'c': 5.0}
+
+
+class FakeFetcher:
+    regions = ['US', 'GB']
+    max_workers = 1
+    store = None
+    output_dir = '.'
+
+    def _run_with_retries(self, items, fetch_item, description, max_workers, journal_scope=None):
+        return {item: fetch_item(item) for item in items}
+
+    def _fetch_frame(self, endpoint, kw_list, timeframe, geo='', **params):
+        if endpoint == 'interest_by_region':
+            (keyword,) = kw_list
+            scores = COUNTRY_SCORES[keyword]
+            return pd.DataFrame({'geoCode': list(scores), keyword: list(scores.values())},
+                                index=pd.Index(list(scores), name='geoName'))
+
+        steps = np.arange(len(DATES), dtype='float64')
+        if geo:
+            # Each region on its own arbitrary scale
+            columns = {keyword: (position + 1) * (5 + np.sin(steps + position)) * (3 if geo == 'GB' else 1)
+                       for position, keyword in enumerate(kw_list)}
+        else:
+            columns = {keyword: np.full(len(DATES), WORLDWIDE_MEANS[keyword]) for keyword in kw_list}
+        frame = pd.DataFrame(columns, index=DATES)
+        frame['isPartial'] = False
+        return frame
+
+
+def make_matrix(keywords, regions, cube):
+    matrix = RegionalMatrix.__new__(RegionalMatrix)
+    matrix.keywords = keywords
+    matrix.regions = regions
+    matrix.index = pd.date_range('2024-01-01', periods=cube.shape[2], name='date')
+    matrix.cube = cube
+    return matrix
+
+
+def test_build_puts_every_series_on_the_worldwide_scale():
+    with warnings.catch_warnings():
+        warnings.simplefilter('error', RuntimeWarning)
+        matrix = RegionalMatrix(FakeFetcher(), ['a', 'b', 'c']).build()
+
+    means = pd.DataFrame(matrix.cube.mean(axis=2), index=matrix.keywords, columns=matrix.regions)
+    # Series mean = keyword level x country score relative to the keyword's average over the regions
+    assert means.loc['a', 'US'] == pytest.approx(10.0 * 80 / 60)
+    assert means.loc['a', 'GB'] == pytest.approx(10.0 * 40 / 60)
+    # A region without a country score is weighted as average
+    assert means.loc['b', 'US'] == pytest.approx(20.0)
+    assert means.loc['b', 'GB'] == pytest.approx(20.0)
+    assert means.loc['c'].tolist() == pytest.approx([5.0, 5.0])
+
+
+def test_lead_lag_finds_the_leading_region_and_its_lag():
+    rng = np.random.default_rng(0)
+    length, lag = 200, 3
+    base = np.cumsum(rng.normal(size=length + lag))
+    leader = base[lag:]
+    follower = base[:-lag]
+    cube = np.stack([np.stack([follower + rng.normal(scale=0.05, size=length),
+                               leader + rng.normal(scale=0.05, size=length)])])
+    matrix = make_matrix(['x'], ['B', 'A'], cube)
+
+    row = matrix.lead_lag(max_lag=6).iloc[0]
+    assert (row['leader'], row['follower'], row['lag']) == ('A', 'B', lag)
+    assert row['lead_time'] == pd.Timedelta(days=lag)
+    assert row['correlation'] > 0.9
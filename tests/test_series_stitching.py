@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from series_stitching import overlap_scale, stitch
+
+DATES = pd.date_range('2024-01-01', periods=10, name='date')
+
+
+def test_overlap_scale_recovers_the_factor_between_fetches():
+    reference = pd.Series(np.arange(1.0, 9.0), index=DATES[:8])
+    # The same interest fetched again later, scaled to a different peak
+    new = pd.Series(np.arange(4.0, 11.0) / 2.5, index=DATES[3:])
+
+    assert overlap_scale(reference, new) == pytest.approx(2.5)
+
+
+def test_overlap_scale_needs_a_usable_overlap():
+    reference = pd.Series([5.0, 6.0, 7.0], index=DATES[:3])
+
+    assert overlap_scale(reference, pd.Series([1.0, 2.0], index=DATES[1:3])) is None
+    assert overlap_scale(reference, pd.Series([0.0, 0.0, 0.0], index=DATES[:3])) is None
+    assert overlap_scale(pd.Series([0.0, 0.0, 0.0], index=DATES[:3]), reference) is None
+
+
+def test_stitch_appends_only_the_newer_points_rescaled():
+    reference = pd.Series([10.0, 20.0, 30.0], index=DATES[:3])
+    new = pd.Series([99.0, 15.0, 20.0, 25.0], index=DATES[1:5])
+
+    stitched = stitch(reference, new, 2.0)
+
+    assert stitched.tolist() == [10.0, 20.0, 30.0, 40.0, 50.0]
+    assert stitched.index.equals(DATES[:5])